@@ -0,0 +1,113 @@
+from collections import defaultdict
+
+from .models import WebsiteRecord, Execution, Link
+
+
+class BatchLoader:
+    """
+    Loads objects by key in batches and caches them for one request.
+
+    Keys are queued with `want` as soon as they are known, e.g. for every
+    page of a list before its first item is resolved. The first `load` of
+    a key that is not cached fetches all queued keys with a single call of
+    the batch function.
+    """
+
+    def __init__(self, batch_load):
+        """
+        Initialize the BatchLoader object.
+
+        Args:
+            batch_load: Function taking a list of keys and returning a dict
+                mapping each key to its value. Missing keys map to None.
+        """
+        self.batch_load = batch_load
+        self.cache = {}
+        self.queue = set()
+
+    def want(self, keys):
+        """
+        Queue keys to be fetched with the next batch.
+
+        Args:
+            keys: The keys that will be loaded later.
+        """
+        self.queue.update(key for key in keys if key not in self.cache)
+
+    def load(self, key):
+        """
+        Return the value of a key, fetching the queued keys if it is not cached.
+
+        Args:
+            key: The key to load.
+
+        Returns:
+            The value of the key.
+        """
+        if key not in self.cache:
+            self.queue.add(key)
+            keys, self.queue = list(self.queue), set()
+            values = self.batch_load(keys)
+            self.cache.update((key, values.get(key)) for key in keys)
+        return self.cache[key]
+
+
+class GraphLoaders:
+    """
+    Request-scoped loaders of the owners, executions and outgoing links of
+    crawled pages, so that a graph query runs a constant number of SQL
+    queries whatever the number of nodes.
+    """
+
+    def __init__(self):
+        """
+        Initialize the GraphLoaders object.
+        """
+        self.owners = BatchLoader(self.load_owners)
+        self.executions = BatchLoader(self.load_executions)
+        self.links = BatchLoader(self.load_links)
+
+    def want_pages(self, pages):
+        """
+        Queue the executions and links of crawled pages about to be resolved.
+
+        Args:
+            pages: The CrawledPage instances.
+        """
+        self.executions.want(page.execution_id for page in pages)
+        self.links.want(page.id for page in pages)
+
+    def load_owners(self, website_record_ids):
+        return WebsiteRecord.objects.in_bulk(website_record_ids)
+
+    def load_executions(self, execution_ids):
+        executions = Execution.objects.only('id', 'website_record_id').in_bulk(execution_ids)
+        self.owners.want(execution.website_record_id for execution in executions.values())
+        return executions
+
+    def load_links(self, page_ids):
+        links = defaultdict(list)
+        for link in Link.objects.filter(from_page_id__in=page_ids).select_related('to_page'):
+            links[link.from_page_id].append(link.to_page)
+        # The linked pages are nodes as well, which may be resolved next
+        for pages in links.values():
+            self.want_pages(pages)
+        return {page_id: links[page_id] for page_id in page_ids}
+
+
+def get_loaders(context):
+    """
+    Return the loaders of a GraphQL request, creating them on first use.
+
+    Args:
+        context: The context of the GraphQL request, i.e. the HttpRequest.
+
+    Returns:
+        The GraphLoaders of the request.
+    """
+    loaders = getattr(context, 'graph_loaders', None)
+    if loaders is None:
+        loaders = GraphLoaders()
+        if context is not None:
+            context.graph_loaders = loaders
+    return loaders
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.1 on 2026-10-18 02:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0014_alter_websiterecord_url_alter_link_unique_together"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="crawledpage",
+            name="etag",
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="crawledpage",
+            name="last_modified",
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="crawledpage",
+            name="status_code",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
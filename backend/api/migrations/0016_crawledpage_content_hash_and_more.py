@@ -0,0 +1,28 @@
+# Generated by Django 4.2.1 on 2026-10-18 02:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0015_crawledpage_etag_crawledpage_last_modified_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="crawledpage",
+            name="content_hash",
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+        migrations.AddField(
+            model_name="execution",
+            name="num_pages_reprocessed",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="execution",
+            name="num_pages_skipped",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
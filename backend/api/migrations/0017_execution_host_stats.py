@@ -0,0 +1,18 @@
+# Generated by Django 4.2.1 on 2026-10-18 02:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0016_crawledpage_content_hash_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="execution",
+            name="host_stats",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
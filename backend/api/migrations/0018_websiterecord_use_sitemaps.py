@@ -0,0 +1,18 @@
+# Generated by Django 4.2.1 on 2026-10-18 02:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0017_execution_host_stats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="websiterecord",
+            name="use_sitemaps",
+            field=models.BooleanField(default=False),
+        ),
+    ]
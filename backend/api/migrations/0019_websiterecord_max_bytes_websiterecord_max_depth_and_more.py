@@ -0,0 +1,48 @@
+# Generated by Django 4.2.1 on 2026-10-18 02:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0018_websiterecord_use_sitemaps"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="websiterecord",
+            name="max_bytes",
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="websiterecord",
+            name="max_depth",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="websiterecord",
+            name="max_duration",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="websiterecord",
+            name="max_pages",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name="execution",
+            name="status",
+            field=models.TextField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("running", "Running"),
+                    ("completed", "Completed"),
+                    ("budget_exhausted", "Budget exhausted"),
+                    ("failed", "Failed"),
+                ],
+                default="pending",
+                max_length=20,
+            ),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.1 on 2026-10-18 02:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0019_websiterecord_max_bytes_websiterecord_max_depth_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CrawlCheckpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("data", models.BinaryField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("num_queued", models.PositiveIntegerField(default=0)),
+                ("num_seen", models.PositiveIntegerField(default=0)),
+                ("size", models.PositiveIntegerField(default=0)),
+                ("duration_ms", models.PositiveIntegerField(default=0)),
+                (
+                    "execution",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="checkpoint",
+                        to="api.execution",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.1 on 2026-10-18 02:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0020_crawlcheckpoint"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="execution",
+            name="status",
+            field=models.TextField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("running", "Running"),
+                    ("completed", "Completed"),
+                    ("budget_exhausted", "Budget exhausted"),
+                    ("cancelled", "Cancelled"),
+                    ("failed", "Failed"),
+                ],
+                default="pending",
+                max_length=20,
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.1 on 2026-10-18 02:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0021_alter_execution_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="execution",
+            name="num_bytes",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="execution",
+            name="num_pages_failed",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="execution",
+            name="num_pages_queued",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="execution",
+            name="pages_per_second",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="execution",
+            name="progress_updated_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
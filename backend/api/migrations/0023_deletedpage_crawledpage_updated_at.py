@@ -0,0 +1,45 @@
+# Generated by Django 4.2.1 on 2026-10-18 02:53
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_crawl_time(apps, schema_editor):
+    """
+    Start the change history of the existing pages at their last crawl.
+    """
+    CrawledPage = apps.get_model("api", "CrawledPage")
+    CrawledPage.objects.update(updated_at=F("crawl_time"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0022_execution_num_bytes_execution_num_pages_failed_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DeletedPage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("url", models.TextField()),
+                ("website_record_id", models.IntegerField(db_index=True)),
+                ("deleted_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="crawledpage",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(copy_crawl_time, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 4.2.1 on 2026-10-18 02:57
+
+from django.db import migrations, models
+from django.db.models import Count, F, Q
+from django.db.models.lookups import IsNull
+
+from webcrawler.normalization import compute_url_hash
+
+
+def hash_urls(apps, schema_editor):
+    """
+    Compute the URL hash of the existing pages.
+    """
+    CrawledPage = apps.get_model("api", "CrawledPage")
+    pages = []
+    for page in CrawledPage.objects.only("id", "url").iterator(chunk_size=2000):
+        page.url_hash = compute_url_hash(page.url)
+        pages.append(page)
+        if len(pages) >= 2000:
+            CrawledPage.objects.bulk_update(pages, ["url_hash"])
+            pages = []
+    CrawledPage.objects.bulk_update(pages, ["url_hash"])
+
+
+def merge_duplicate_pages(apps, schema_editor):
+    """
+    Merge the pages sharing a URL hash into the most recently crawled one,
+    moving their incoming and outgoing links to it. Links between the merged
+    pages are deleted rather than turned into links of the page to itself.
+    """
+    CrawledPage = apps.get_model("api", "CrawledPage")
+    Link = apps.get_model("api", "Link")
+    duplicates = (
+        CrawledPage.objects.values("url_hash")
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+        .values_list("url_hash", flat=True)
+    )
+    for url_hash in list(duplicates):
+        # Prefer pages that were fetched over pages only known as link targets
+        kept, *merged = CrawledPage.objects.filter(url_hash=url_hash).order_by(
+            IsNull(F("status_code"), True), "-crawl_time", "-id"
+        )
+        merged_ids = {page.id for page in merged}
+        page_ids = merged_ids | {kept.id}
+        links = Link.objects.filter(
+            Q(from_page_id__in=merged_ids) | Q(to_page_id__in=merged_ids)
+        )
+        moved = {
+            (
+                kept.id if link.from_page_id in merged_ids else link.from_page_id,
+                kept.id if link.to_page_id in merged_ids else link.to_page_id,
+            )
+            for link in links
+            if not (link.from_page_id in page_ids and link.to_page_id in page_ids)
+        }
+        links.delete()
+        Link.objects.bulk_create(
+            [
+                Link(from_page_id=from_page_id, to_page_id=to_page_id)
+                for from_page_id, to_page_id in moved
+            ],
+            ignore_conflicts=True,
+        )
+        CrawledPage.objects.filter(id__in=merged_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0023_deletedpage_crawledpage_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="crawledpage",
+            name="url_hash",
+            field=models.CharField(editable=False, max_length=32, null=True),
+        ),
+        migrations.RunPython(hash_urls, migrations.RunPython.noop),
+        migrations.RunPython(merge_duplicate_pages, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.1 on 2026-10-18 02:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0024_crawledpage_url_hash"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="crawledpage",
+            name="url_hash",
+            field=models.CharField(editable=False, max_length=32, unique=True),
+        ),
+    ]
@@ -0,0 +1,118 @@
+# Generated by Django 4.2.1 on 2026-10-18 03:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# The primary and unique keys of a partitioned table must include the partition key
+PARTITIONED_TABLES = [
+    """
+    CREATE TABLE "api_pagesnapshot" (
+        "id" bigserial NOT NULL,
+        "execution_id" integer NOT NULL,
+        "url" text NOT NULL,
+        "url_hash" varchar(32) NOT NULL,
+        "title" text NULL,
+        "status_code" smallint NULL CHECK ("status_code" >= 0),
+        "crawl_time" timestamp with time zone NOT NULL,
+        PRIMARY KEY ("execution_id", "id"),
+        UNIQUE ("execution_id", "url_hash")
+    ) PARTITION BY RANGE ("execution_id")
+    """,
+    """
+    CREATE TABLE "api_linksnapshot" (
+        "id" bigserial NOT NULL,
+        "execution_id" integer NOT NULL,
+        "from_url_hash" varchar(32) NOT NULL,
+        "to_url_hash" varchar(32) NOT NULL,
+        PRIMARY KEY ("execution_id", "id"),
+        UNIQUE ("execution_id", "from_url_hash", "to_url_hash")
+    ) PARTITION BY RANGE ("execution_id")
+    """,
+]
+
+
+def create_snapshot_tables(apps, schema_editor):
+    """
+    Create the snapshot tables, partitioned by ranges of executions on PostgreSQL.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        for name in ("PageSnapshot", "LinkSnapshot"):
+            schema_editor.create_model(apps.get_model("api", name))
+        return
+    for sql in PARTITIONED_TABLES:
+        schema_editor.execute(sql)
+
+
+def drop_snapshot_tables(apps, schema_editor):
+    """
+    Drop the snapshot tables together with their partitions.
+    """
+    for name in ("PageSnapshot", "LinkSnapshot"):
+        schema_editor.delete_model(apps.get_model("api", name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0025_unique_crawledpage_url_hash"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name="PageSnapshot",
+                    fields=[
+                        ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                        ("url", models.TextField()),
+                        ("url_hash", models.CharField(max_length=32)),
+                        ("title", models.TextField(blank=True, null=True)),
+                        (
+                            "status_code",
+                            models.PositiveSmallIntegerField(blank=True, null=True),
+                        ),
+                        ("crawl_time", models.DateTimeField()),
+                        (
+                            "execution",
+                            models.ForeignKey(
+                                db_constraint=False,
+                                db_index=False,
+                                on_delete=django.db.models.deletion.DO_NOTHING,
+                                related_name="+",
+                                to="api.execution",
+                            ),
+                        ),
+                    ],
+                    options={
+                        "unique_together": {("execution", "url_hash")},
+                    },
+                ),
+                migrations.CreateModel(
+                    name="LinkSnapshot",
+                    fields=[
+                        ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                        ("from_url_hash", models.CharField(max_length=32)),
+                        ("to_url_hash", models.CharField(max_length=32)),
+                        (
+                            "execution",
+                            models.ForeignKey(
+                                db_constraint=False,
+                                db_index=False,
+                                on_delete=django.db.models.deletion.DO_NOTHING,
+                                related_name="+",
+                                to="api.execution",
+                            ),
+                        ),
+                    ],
+                    options={
+                        "unique_together": {
+                            ("execution", "from_url_hash", "to_url_hash")
+                        },
+                    },
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_snapshot_tables, drop_snapshot_tables),
+            ],
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.2.1 on 2026-10-18 03:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0026_pagesnapshot_linksnapshot"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="execution",
+            name="deleting",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="websiterecord",
+            name="deleting",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name="Deletion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "target",
+                    models.TextField(
+                        choices=[
+                            ("website_record", "Website record"),
+                            ("execution", "Execution"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("target_id", models.IntegerField()),
+                ("website_record_id", models.IntegerField()),
+                (
+                    "status",
+                    models.TextField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("completed", "Completed"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                ("num_pages", models.PositiveBigIntegerField(default=0)),
+                ("num_pages_deleted", models.PositiveBigIntegerField(default=0)),
+                ("num_links_deleted", models.PositiveBigIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("end_time", models.DateTimeField(blank=True, null=True)),
+                ("error", models.TextField(blank=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["target", "target_id"],
+                        name="api_deletio_target_a97ef3_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.1 on 2026-10-18 03:12
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def set_last_crawled(apps, schema_editor):
+    """
+    Set the last crawl time of the existing website records from their executions.
+    """
+    WebsiteRecord = apps.get_model("api", "WebsiteRecord")
+    Execution = apps.get_model("api", "Execution")
+    WebsiteRecord.objects.update(
+        last_crawled=Subquery(
+            Execution.objects.filter(website_record_id=OuterRef("pk"))
+            .order_by("-start_time")
+            .values("start_time")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0027_execution_deleting_websiterecord_deleting_deletion"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="websiterecord",
+            name="last_crawled",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="execution",
+            index=models.Index(
+                fields=["start_time", "id"], name="api_executi_start_t_42d25a_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="websiterecord",
+            index=models.Index(
+                fields=["last_crawled", "id"], name="api_website_last_cr_814404_idx"
+            ),
+        ),
+        migrations.RunPython(set_last_crawled, migrations.RunPython.noop),
+    ]
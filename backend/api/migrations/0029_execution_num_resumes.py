@@ -0,0 +1,18 @@
+# Generated by Django 4.2.1 on 2026-10-18 03:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0028_websiterecord_last_crawled"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="execution",
+            name="num_resumes",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,10 +1,12 @@
-from django.db import models
+from django.db import models, transaction, connection, DatabaseError, IntegrityError
 from django.utils.timezone import make_aware
 import re
 
 from django.utils.datetime_safe import datetime
 
 from webcrawler.tasks_helper import create_periodic_crawl_task
+from webcrawler.events import publish_execution
+from webcrawler.normalization import compute_url_hash
 
 from django_celery_beat.models import PeriodicTask
 
@@ -22,6 +24,14 @@ class WebsiteRecord(models.Model):
       - label: a human-readable label for the site
       - active: whether or not the site is currently being crawled
       - tags: a list of tags associated with the site
+      - use_sitemaps: whether the crawl is seeded with the pages listed in the site's sitemaps
+      - max_pages: the maximum number of pages crawled by one execution
+      - max_depth: the maximum number of links followed from the start URL
+      - max_bytes: the maximum number of bytes downloaded by one execution
+      - max_duration: the maximum duration of one execution in seconds
+      - deleting: whether the website record is being deleted in the background
+      - last_crawled: the start time of the most recent execution, or None if it has none
+    Budget fields left empty are unbounded.
     """
 
     id = models.AutoField(primary_key=True)
@@ -38,6 +48,16 @@ class WebsiteRecord(models.Model):
     label = models.TextField()
     active = models.BooleanField(default=True)
     tags = ArrayField(models.TextField(max_length=100), blank=True)
+    use_sitemaps = models.BooleanField(default=False)
+    max_pages = models.PositiveIntegerField(null=True, blank=True)
+    max_depth = models.PositiveIntegerField(null=True, blank=True)
+    max_bytes = models.PositiveBigIntegerField(null=True, blank=True)
+    max_duration = models.PositiveIntegerField(null=True, blank=True)
+    deleting = models.BooleanField(default=False)
+    last_crawled = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['last_crawled', 'id'])]
 
     def __str__(self):
         return self.label
@@ -56,8 +76,23 @@ class WebsiteRecord(models.Model):
         website record and then calls super delete.
         """
         PeriodicTask.objects.filter(name=f'crawl_website_{self.label}').delete()
+        DeletedPage.record(CrawledPage.objects.filter(execution__website_record=self))
+        delete_snapshots(list(self.execution_set.values_list('id', flat=True)))
         super().delete(*args, **kwargs)
 
+    @classmethod
+    def refresh_last_crawled(cls, website_record_id):
+        """
+        Recompute the last crawl time of a website record after some of its executions were deleted.
+
+        Args:
+            website_record_id: The ID of the website record.
+        """
+        cls.objects.filter(id=website_record_id).update(last_crawled=models.Subquery(
+            Execution.objects.filter(website_record_id=models.OuterRef('pk'))
+            .order_by('-start_time').values('start_time')[:1]
+        ))
+
 
 class Execution(models.Model):
     """
@@ -69,6 +104,17 @@ class Execution(models.Model):
       - start_time: when the crawl started
       - end_time: when the crawl ended
       - num_sites_crawled: the number of sites that were crawled
+      - num_pages_skipped: the number of crawled pages that were unchanged since the previous crawl
+      - num_pages_reprocessed: the number of crawled pages that were parsed and saved again
+      - host_stats: the adaptive concurrency limit and recent latencies of each crawled host
+      - num_pages_failed: the number of crawled pages that answered with an HTTP error status
+      - num_pages_queued: the number of pages waiting in the frontier
+      - num_bytes: the number of bytes downloaded
+      - pages_per_second: the recent crawl rate, or the average rate once the execution has ended
+      - progress_updated_at: when the progress counters were last written
+      - deleting: whether the execution is being deleted in the background
+      - num_resumes: the number of times the interrupted execution was resumed
+    The progress counters are updated periodically while the execution runs.
     """
     id = models.AutoField(primary_key=True)
 
@@ -77,17 +123,80 @@ class Execution(models.Model):
         ('pending', 'Pending'),
         ('running', 'Running'),
         ('completed', 'Completed'),
+        ('budget_exhausted', 'Budget exhausted'),
+        ('cancelled', 'Cancelled'),
         ('failed', 'Failed'),
     ]
-    status = models.TextField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    status = models.TextField(max_length=20, choices=STATUS_CHOICES, default='pending')
     start_time = models.DateTimeField(auto_now_add=True)
     end_time = models.DateTimeField(null=True, blank=True)
     num_sites_crawled = models.PositiveIntegerField(default=0)
+    num_pages_skipped = models.PositiveIntegerField(default=0)
+    num_pages_reprocessed = models.PositiveIntegerField(default=0)
+    host_stats = models.JSONField(null=True, blank=True)
+    num_pages_failed = models.PositiveIntegerField(default=0)
+    num_pages_queued = models.PositiveIntegerField(default=0)
+    num_bytes = models.PositiveBigIntegerField(default=0)
+    pages_per_second = models.FloatField(default=0)
+    progress_updated_at = models.DateTimeField(null=True, blank=True)
+    deleting = models.BooleanField(default=False)
+    num_resumes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['start_time', 'id'])]
+
+    def save(self, *args, **kwargs):
+        """
+        Overridden save method. Calls super save, sets a new execution as the
+        last crawl of its website record and publishes the new state of the
+        execution to the clients listening for execution events.
+        """
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if adding:
+            WebsiteRecord.objects.filter(id=self.website_record_id).update(last_crawled=self.start_time)
+        publish_execution(self)
+
+    def delete(self, *args, **kwargs):
+        """
+        Overridden delete method. Records the pages of this execution as
+        deleted for the graph delta query, deletes its snapshot, calls super
+        delete and then recomputes the last crawl of the website record.
+        """
+        DeletedPage.record(self.crawledpage_set.all())
+        delete_snapshots([self.id])
+        super().delete(*args, **kwargs)
+        WebsiteRecord.refresh_last_crawled(self.website_record_id)
 
     def __str__(self):
         return f"{self.website_record.label} - {self.status}"
 
 
+class CrawlCheckpoint(models.Model):
+    """
+    Represents the last checkpoint of a running execution, used to resume it after a crash.
+
+    Each checkpoint includes the following fields:
+      - execution: the execution the checkpoint belongs to
+      - data: the zlib-compressed JSON state of the frontier, counters and budget
+      - updated_at: when the checkpoint was last written
+      - num_queued: the number of URLs waiting in the frontier
+      - num_seen: the number of URLs seen by the execution
+      - size: the size of the data in bytes
+      - duration_ms: how long writing the checkpoint took
+    """
+    execution = models.OneToOneField(Execution, related_name='checkpoint', on_delete=models.CASCADE)
+    data = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+    num_queued = models.PositiveIntegerField(default=0)
+    num_seen = models.PositiveIntegerField(default=0)
+    size = models.PositiveIntegerField(default=0)
+    duration_ms = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.execution} - {self.updated_at}"
+
+
 class CrawledPage(models.Model):
     """
     Represents a single page that has been crawled during an execution.
@@ -95,14 +204,148 @@ class CrawledPage(models.Model):
     Each crawled page includes the following fields:
       - execution: the execution during which the page was crawled
       - url: the URL of the page
+      - url_hash: the hash of the normalized URL, which identifies the page
       - crawl_time: when the page was crawled
       - title: the title of the page
+      - status_code: the HTTP status of the last response for the page
+      - etag: the ETag validator of the last full response
+      - last_modified: the Last-Modified validator of the last full response
+      - content_hash: the hash of the body of the last full response
+      - updated_at: when the title, the owner or the outgoing links of the page last changed
     """
     id = models.AutoField(primary_key=True)
     execution = models.ForeignKey(Execution, on_delete=models.CASCADE)
     url = models.TextField()
+    url_hash = models.CharField(max_length=32, unique=True, editable=False)
     crawl_time = models.DateTimeField(auto_now_add=True)
     title = models.TextField(null=True, blank=True)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    etag = models.TextField(null=True, blank=True)
+    last_modified = models.TextField(null=True, blank=True)
+    content_hash = models.CharField(max_length=32, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def save(self, *args, **kwargs):
+        """
+        Overridden save method. Computes the URL hash and calls super save.
+        """
+        self.url_hash = compute_url_hash(self.url)
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def bulk_create_missing(cls, pages):
+        """
+        Inserts pages that did not exist when they were looked up.
+
+        Another writer may insert some of the same pages in the meantime, in
+        which case they are not duplicated and the stored pages are returned.
+
+        Args:
+            pages: The unsaved CrawledPage instances, with distinct URL hashes
+
+        Returns:
+            A tuple of the list of saved pages and a flag that is True if some
+            of them were inserted by another writer.
+        """
+        if not pages:
+            return [], False
+        try:
+            return cls.objects.bulk_create(pages), False
+        except IntegrityError:
+            if transaction.get_connection().in_atomic_block:
+                raise
+        cls.objects.bulk_create(pages, ignore_conflicts=True)
+        return list(cls.objects.filter(url_hash__in=[page.url_hash for page in pages])), True
+
+    @classmethod
+    def bulk_save_pages(cls, fields_by_url, execution):
+        """
+        Updates or creates the crawled pages of a batch at once.
+
+        Pages are looked up by the hash of their URL, so URLs that only differ
+        in the case of the host, the default port or the fragment share a page.
+        Pages taken over from another website record are recorded as deleted
+        from it for the graph delta query. The update time of a page is only
+        set when it is new, its title changes or it is taken over.
+
+        Args:
+            fields_by_url: Dict mapping the URL of each crawled page to a dict of
+                the field values to store on it, e.g. its title
+            execution: The Execution instance during which these pages are crawled
+
+        Returns:
+            A dict mapping each URL to its saved CrawledPage instance.
+        """
+        crawl_time = make_aware(datetime.now())
+        field_names = {'crawl_time', 'execution', 'updated_at'}
+        for fields in fields_by_url.values():
+            field_names.update(fields)
+
+        hashes = {url: compute_url_hash(url) for url in fields_by_url}
+        # URLs of the same page are saved once, with the fields of the last one
+        urls_by_hash = {url_hash: url for url, url_hash in hashes.items()}
+        existing = cls.objects.filter(url_hash__in=urls_by_hash).annotate(
+            owner_id=models.F('execution__website_record_id')
+        )
+        pages = {page.url_hash: page for page in existing}
+        DeletedPage.record_moved([(page.url, page.owner_id) for page in pages.values()], execution.website_record_id)
+        stale = set(pages)
+
+        new_pages = [
+            cls(
+                url=url, url_hash=url_hash, execution=execution,
+                crawl_time=crawl_time, updated_at=crawl_time, **fields_by_url[url]
+            )
+            for url_hash, url in urls_by_hash.items() if url_hash not in pages
+        ]
+        new_pages, raced = cls.bulk_create_missing(new_pages)
+        pages.update((page.url_hash, page) for page in new_pages)
+        if raced:
+            stale.update(page.url_hash for page in new_pages)
+
+        for url_hash in stale:
+            page = pages[url_hash]
+            fields = fields_by_url[urls_by_hash[url_hash]]
+            # Pages inserted by another writer have no owner_id and count as changed
+            if (
+                getattr(page, 'owner_id', None) != execution.website_record_id
+                or ('title' in fields and fields['title'] != page.title)
+            ):
+                page.updated_at = crawl_time
+            for name, value in fields.items():
+                setattr(page, name, value)
+            page.crawl_time = crawl_time
+            page.execution = execution
+        cls.objects.bulk_update([pages[url_hash] for url_hash in stale], field_names)
+        return {url: pages[url_hash] for url, url_hash in hashes.items()}
+
+    @classmethod
+    def bulk_touch_pages(cls, fields_by_url):
+        """
+        Records a new crawl of unchanged pages, which keep their execution,
+        update time and links. Pages that no longer exist are left out.
+
+        Args:
+            fields_by_url: Dict mapping the URL of each crawled page to a dict of
+                the field values to store on it besides the crawl time
+
+        Returns:
+            A dict mapping each URL to its saved CrawledPage instance.
+        """
+        if not fields_by_url:
+            return {}
+        crawl_time = make_aware(datetime.now())
+        field_names = {'crawl_time'}
+        hashes = {url: compute_url_hash(url) for url in fields_by_url}
+        pages = {page.url_hash: page for page in cls.objects.filter(url_hash__in=hashes.values())}
+        for url, url_hash in hashes.items():
+            if url_hash in pages:
+                for name, value in fields_by_url[url].items():
+                    setattr(pages[url_hash], name, value)
+                    field_names.add(name)
+                pages[url_hash].crawl_time = crawl_time
+        cls.objects.bulk_update(pages.values(), field_names)
+        return {url: pages[url_hash] for url, url_hash in hashes.items() if url_hash in pages}
 
     def set_links(self, links, execution):
         """
@@ -113,10 +356,72 @@ class CrawledPage(models.Model):
             links: List of links to be crawled
             execution: The Execution instance during which these pages are crawled
         """
-        for url in links:
-            defaults = {'execution': execution, 'crawl_time': make_aware(datetime.now())}
-            crawled_page, created = CrawledPage.objects.update_or_create(url=url, defaults=defaults)
-            Link.objects.get_or_create(from_page=self, to_page=crawled_page)
+        CrawledPage.bulk_set_links({self: links}, execution)
+
+    @classmethod
+    def bulk_set_links(cls, links_by_page, execution):
+        """
+        Persists the outgoing links of several pages at once.
+
+        The target pages are updated or created and the links are inserted in
+        bulk, so the number of queries does not depend on the number of links.
+        Target pages taken over from another website record are recorded as
+        deleted from it for the graph delta query. The update time is only set
+        on the target pages taken over and on the pages that gain a link.
+
+        Args:
+            links_by_page: Dict mapping a saved CrawledPage to the links found on it
+            execution: The Execution instance during which these pages are crawled
+        """
+        hashes = {}
+        for links in links_by_page.values():
+            hashes.update((url, compute_url_hash(url)) for url in links)
+        if not hashes:
+            return
+
+        crawl_time = make_aware(datetime.now())
+        # The links the pages already have to the targets are read in the same query
+        existing = cls.objects.filter(url_hash__in=hashes.values()).annotate(
+            linked=models.FilteredRelation('links_to', condition=models.Q(links_to__from_page__in=links_by_page)),
+        ).values_list('url_hash', 'id', 'url', 'execution_id', 'execution__website_record_id', 'linked__from_page_id')
+        ids_by_hash = {}
+        owners = {}
+        stale = set()
+        changed = set()
+        linked = set()
+        for url_hash, page_id, url, execution_id, owner_id, from_page_id in existing:
+            ids_by_hash[url_hash] = page_id
+            owners[url] = owner_id
+            if execution_id != execution.id:
+                stale.add(page_id)
+            if owner_id != execution.website_record_id:
+                changed.add(page_id)
+            if from_page_id is not None:
+                linked.add((from_page_id, page_id))
+        DeletedPage.record_moved(owners.items(), execution.website_record_id)
+
+        new_pages = {
+            url_hash: cls(url=url, url_hash=url_hash, execution=execution, crawl_time=crawl_time, updated_at=crawl_time)
+            for url, url_hash in hashes.items() if url_hash not in ids_by_hash
+        }
+        new_pages, raced = cls.bulk_create_missing(list(new_pages.values()))
+        ids_by_hash.update((page.url_hash, page.id) for page in new_pages)
+        if raced:
+            stale.update(page.id for page in new_pages)
+            changed.update(page.id for page in new_pages)
+
+        new_links = [
+            Link(from_page=page, to_page_id=to_page_id)
+            for page, links in links_by_page.items()
+            for to_page_id in {ids_by_hash[hashes[url]] for url in links}
+            if (page.id, to_page_id) not in linked
+        ]
+        changed.update(link.from_page_id for link in new_links)
+        if stale:
+            cls.objects.filter(id__in=stale).update(execution=execution, crawl_time=crawl_time)
+        if changed:
+            cls.objects.filter(id__in=changed).update(updated_at=crawl_time)
+        Link.objects.bulk_create(new_links, ignore_conflicts=True)
 
     def get_links(self):
         """
@@ -144,3 +449,340 @@ class Link(models.Model):
 
     class Meta:
         unique_together = ('from_page', 'to_page')
+
+
+class ExecutionPartitionedModel(models.Model):
+    """
+    Base class of the tables holding the snapshots of executions.
+
+    On PostgreSQL the tables are partitioned by RANGE (execution_id), each
+    partition holding the snapshots of `partition_size` consecutive
+    executions. As execution IDs grow with time, a partition covers the
+    executions started during one period, and once all of them are deleted
+    it is detached and dropped instead of deleting its rows. On other
+    databases they are plain tables. The execution is not a database foreign
+    key, and Django does not cascade to the snapshot when an execution is deleted.
+    """
+    id = models.BigAutoField(primary_key=True)
+    execution = models.ForeignKey(
+        Execution, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+'
+    )
+
+    # The ranges of the existing partitions depend on it, so it must not change
+    partition_size = 1000
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def get_partition_range(cls, execution_id):
+        """
+        Returns the range of execution IDs of the partition holding the rows of an execution.
+
+        Args:
+            execution_id: The ID of the execution
+
+        Returns:
+            A tuple of the first ID of the range and the first ID after it.
+        """
+        start = int(execution_id) // cls.partition_size * cls.partition_size
+        return start, start + cls.partition_size
+
+    @classmethod
+    def get_partition_name(cls, execution_id):
+        """
+        Returns the name of the partition holding the rows of an execution.
+
+        Args:
+            execution_id: The ID of the execution
+        """
+        return f'{cls._meta.db_table}_{cls.get_partition_range(execution_id)[0]}'
+
+    @classmethod
+    def create_partition(cls, execution_id):
+        """
+        Creates the partition holding the rows of an execution unless it already exists.
+
+        Args:
+            execution_id: The ID of the execution
+        """
+        if connection.vendor != 'postgresql':
+            return
+        name = cls.get_partition_name(execution_id)
+        start, end = cls.get_partition_range(execution_id)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT to_regclass(%s)', [name])
+            if cursor.fetchone()[0] is not None:
+                return
+            try:
+                with transaction.atomic():
+                    cursor.execute(
+                        f'CREATE TABLE IF NOT EXISTS {connection.ops.quote_name(name)} '
+                        f'PARTITION OF {connection.ops.quote_name(cls._meta.db_table)} '
+                        f'FOR VALUES FROM ({start}) TO ({end})'
+                    )
+            except DatabaseError:
+                # Another writer of the range created it at the same time
+                cursor.execute('SELECT to_regclass(%s)', [name])
+                if cursor.fetchone()[0] is None:
+                    raise
+
+    @classmethod
+    def plan_deletion(cls, execution_ids):
+        """
+        Decides how the rows of executions about to be deleted are deleted.
+
+        A partition is dropped if no other execution of its range exists and
+        a later execution does, so that no new execution can be added to it.
+        The rows of the other executions are deleted.
+
+        Args:
+            execution_ids: The IDs of the executions
+
+        Returns:
+            A tuple of the names of the partitions to drop and the IDs of the
+            executions whose rows are deleted.
+        """
+        if connection.vendor != 'postgresql':
+            return [], list(execution_ids)
+        ids_by_range = {}
+        for execution_id in execution_ids:
+            ids_by_range.setdefault(cls.get_partition_range(execution_id), []).append(execution_id)
+        partitions, rows = [], []
+        for (start, end), ids in ids_by_range.items():
+            closed = Execution.objects.filter(id__gte=end).exists()
+            if closed and not Execution.objects.filter(id__gte=start, id__lt=end).exclude(id__in=ids).exists():
+                partitions.append(cls.get_partition_name(start))
+            else:
+                rows.extend(ids)
+        return partitions, rows
+
+    @classmethod
+    def delete_executions(cls, execution_ids):
+        """
+        Deletes the rows of executions about to be deleted, detaching and
+        dropping the partitions that only hold their rows.
+
+        Args:
+            execution_ids: The IDs of the executions
+        """
+        partitions, rows = cls.plan_deletion(execution_ids)
+        if rows:
+            cls.objects.filter(execution_id__in=rows).delete()
+        # A partition is detached without blocking the queries of the table unless in a transaction
+        concurrently = '' if connection.in_atomic_block else ' CONCURRENTLY'
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            for name in partitions:
+                cursor.execute('SELECT to_regclass(%s)', [name])
+                if cursor.fetchone()[0] is None:
+                    continue
+                cursor.execute(f'ALTER TABLE {quote(cls._meta.db_table)} DETACH PARTITION {quote(name)}{concurrently}')
+                cursor.execute(f'DROP TABLE {quote(name)}')
+
+
+class PageSnapshot(ExecutionPartitionedModel):
+    """
+    Represents a page as it was seen by one execution.
+
+    Each page snapshot includes the following fields:
+      - execution: the execution that saw the page
+      - url: the URL of the page
+      - url_hash: the hash of the normalized URL
+      - title: the title of the page, or None if it was only found as a link
+      - status_code: the HTTP status of the response, or None if it was only found as a link
+      - crawl_time: when the page was crawled
+    """
+    url = models.TextField()
+    url_hash = models.CharField(max_length=32)
+    title = models.TextField(null=True, blank=True)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    crawl_time = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('execution', 'url_hash')
+
+    @classmethod
+    def bulk_save_snapshot(cls, execution, pages, links_by_url):
+        """
+        Adds a batch of saved pages and their outgoing links to the snapshot of an execution.
+
+        Several URLs of the batch may share a page, which is written once, as
+        a single INSERT may not update the same row twice.
+
+        Args:
+            execution: The Execution instance the snapshot belongs to
+            pages: Dict mapping the URL of each crawled page to its saved CrawledPage
+            links_by_url: Dict mapping the URL of each crawled page to the links found
+                on it, or to None if the stored links were kept
+        """
+        # The links of unchanged pages are the ones stored by the previous crawl
+        kept = [pages[url].id for url, links in links_by_url.items() if links is None]
+        targets = {}
+        link_hashes = set()
+        for from_hash, to_url, to_hash in Link.objects.filter(from_page_id__in=kept).values_list(
+            'from_page__url_hash', 'to_page__url', 'to_page__url_hash'
+        ):
+            targets[to_hash] = to_url
+            link_hashes.add((from_hash, to_hash))
+        for url, links in links_by_url.items():
+            for link in links or ():
+                to_hash = compute_url_hash(link)
+                targets[to_hash] = link
+                link_hashes.add((pages[url].url_hash, to_hash))
+
+        cls.objects.bulk_create([
+            cls(
+                execution=execution, url=page.url, url_hash=page.url_hash,
+                title=page.title, status_code=page.status_code, crawl_time=page.crawl_time,
+            )
+            for page in {page.url_hash: page for page in pages.values()}.values()
+        ], update_conflicts=True, unique_fields=['execution', 'url_hash'],
+            update_fields=['url', 'title', 'status_code', 'crawl_time'])
+        cls.objects.bulk_create([
+            cls(execution=execution, url=url, url_hash=url_hash, crawl_time=execution.start_time)
+            for url_hash, url in targets.items()
+        ], ignore_conflicts=True)
+        LinkSnapshot.objects.bulk_create([
+            LinkSnapshot(execution=execution, from_url_hash=from_hash, to_url_hash=to_hash)
+            for from_hash, to_hash in link_hashes
+        ], ignore_conflicts=True)
+
+    def __str__(self):
+        return f"{self.url} - {self.execution_id}"
+
+
+class LinkSnapshot(ExecutionPartitionedModel):
+    """
+    Represents a link between two pages as it was seen by one execution.
+
+    Each link snapshot includes the following fields:
+      - execution: the execution that saw the link
+      - from_url_hash: the URL hash of the page the link is from
+      - to_url_hash: the URL hash of the page the link goes to
+    """
+    from_url_hash = models.CharField(max_length=32)
+    to_url_hash = models.CharField(max_length=32)
+
+    class Meta:
+        unique_together = ('execution', 'from_url_hash', 'to_url_hash')
+
+
+SNAPSHOT_MODELS = (PageSnapshot, LinkSnapshot)
+
+
+def create_snapshot_partitions(execution_id):
+    """
+    Creates the snapshot partitions holding the rows of an execution.
+
+    Args:
+        execution_id: The ID of the execution
+    """
+    for model in SNAPSHOT_MODELS:
+        model.create_partition(execution_id)
+
+
+def delete_snapshots(execution_ids):
+    """
+    Deletes the snapshots of executions about to be deleted.
+
+    Args:
+        execution_ids: The IDs of the executions
+    """
+    for model in SNAPSHOT_MODELS:
+        model.delete_executions(execution_ids)
+
+
+class DeletedPage(models.Model):
+    """
+    Represents a crawled page that has been deleted, or taken over by another
+    website record, so that clients holding a copy of the graph of the website
+    record it belonged to can remove it with the delta query.
+
+    Each deleted page includes the following fields:
+      - url: the URL of the deleted page
+      - website_record_id: the ID of the website record the page belonged to
+      - deleted_at: when the page was deleted
+    The website record is not a foreign key, as it may be deleted as well.
+    """
+    url = models.TextField()
+    website_record_id = models.IntegerField(db_index=True)
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    @classmethod
+    def record(cls, pages):
+        """
+        Records the specified pages as deleted.
+
+        Args:
+            pages: A queryset of the CrawledPages about to be deleted
+        """
+        cls.objects.bulk_create([
+            cls(url=url, website_record_id=website_record_id)
+            for url, website_record_id in pages.values_list('url', 'execution__website_record_id').iterator()
+        ], batch_size=1000)
+
+    @classmethod
+    def record_moved(cls, pages, website_record_id):
+        """
+        Records the pages about to be taken over by a website record as deleted
+        from the website records they belong to.
+
+        Args:
+            pages: (url, website_record_id) tuples of the pages before they move
+            website_record_id: The ID of the website record taking them over
+        """
+        moved = [cls(url=url, website_record_id=owner_id) for url, owner_id in pages if owner_id != website_record_id]
+        if moved:
+            cls.objects.bulk_create(moved)
+
+    def __str__(self):
+        return f"{self.url} - {self.deleted_at}"
+
+
+class Deletion(models.Model):
+    """
+    Represents the background deletion of a website record or an execution
+    and its crawled pages, links and snapshots.
+
+    Each deletion includes the following fields:
+      - target: whether a website record or an execution is deleted
+      - target_id: the ID of the deleted website record or execution
+      - website_record_id: the ID of the website record the target belongs to
+      - status: the current status of the deletion
+      - num_pages: the number of crawled pages to delete, counted when the deletion starts
+      - num_pages_deleted: the number of crawled pages deleted so far
+      - num_links_deleted: the number of links deleted so far
+      - created_at: when the deletion was requested
+      - updated_at: when the progress was last written
+      - end_time: when the deletion ended
+      - error: the error that failed the deletion
+    The targets are not foreign keys, as the deletion outlives them.
+    """
+    TARGET_CHOICES = [
+        ('website_record', 'Website record'),
+        ('execution', 'Execution'),
+    ]
+    target = models.TextField(max_length=20, choices=TARGET_CHOICES)
+    target_id = models.IntegerField()
+    website_record_id = models.IntegerField()
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    status = models.TextField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    num_pages = models.PositiveBigIntegerField(default=0)
+    num_pages_deleted = models.PositiveBigIntegerField(default=0)
+    num_links_deleted = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    end_time = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['target', 'target_id'])]
+
+    def __str__(self):
+        return f"{self.target} {self.target_id} - {self.status}"
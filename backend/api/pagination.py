@@ -0,0 +1,219 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on the sort field and the ID.
+
+    A page is selected with a condition on the sort key of the last row of
+    the previous page instead of an OFFSET, so every page is read from an
+    index on (sort field, id) at the same cost, and rows inserted meanwhile
+    do not shift the pages. The number of rows is not counted unless the
+    'count' query parameter asks for it: 'exact' runs COUNT(*), and
+    'approximate' uses the row estimate of the PostgreSQL planner.
+    Rows whose sort field is None come last in both directions.
+    """
+    page_size = 5
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None, sort=None):
+        """
+        Select the page of the queryset requested by the cursor.
+
+        Args:
+            queryset: The filtered, unordered queryset.
+            request: The HTTP request.
+            view: The view, unused.
+            sort: The field to sort by, prefixed with '-' for the descending
+                order, or None to sort by ID.
+
+        Returns:
+            The list of the objects of the page.
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.descending = bool(sort) and sort.startswith('-')
+        self.field = sort.lstrip('-') if sort else 'pk'
+        self.nullable = self.field != 'pk' and queryset.model._meta.get_field(self.field).null
+        value, pk, reverse = self.decode_cursor(queryset.model, request)
+        self.count = self.get_count(queryset, request.query_params.get(self.count_query_param))
+
+        if pk is not None:
+            queryset = queryset.filter(self.get_after_condition(value, pk, self.descending != reverse, reverse))
+        rows = list(queryset.order_by(*self.get_ordering(self.descending != reverse, reverse))[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, pk is not None
+        self.rows = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        fields = [
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]
+        if self.count is not None:
+            fields.insert(0, ('count', self.count))
+        return Response(OrderedDict(fields))
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_ordering(self, descending, nulls_first):
+        """
+        Return the ordering of the rows, with the ID breaking ties.
+
+        Args:
+            descending: Whether the sort field is in descending order.
+            nulls_first: Whether rows whose sort field is None come first.
+
+        Returns:
+            The list of order_by expressions.
+        """
+        order = F(self.field).desc if descending else F(self.field).asc
+        pk_order = '-pk' if descending else 'pk'
+        if self.field == 'pk':
+            return [pk_order]
+        if self.nullable:
+            return [order(nulls_first=True) if nulls_first else order(nulls_last=True), pk_order]
+        return [order(), pk_order]
+
+    def get_after_condition(self, value, pk, descending, nulls_first):
+        """
+        Build the condition selecting the rows that come after a sort key.
+
+        Args:
+            value: The sort field value of the cursor row.
+            pk: The ID of the cursor row.
+            descending: Whether the sort field is in descending order.
+            nulls_first: Whether rows whose sort field is None come first.
+
+        Returns:
+            The Q object.
+        """
+        after = 'lt' if descending else 'gt'
+        if self.field == 'pk':
+            return Q(**{f'pk__{after}': pk})
+        if value is None:
+            condition = Q(**{f'{self.field}__isnull': True, f'pk__{after}': pk})
+            return condition if not nulls_first else condition | Q(**{f'{self.field}__isnull': False})
+        # The redundant bound lets the database scan the index from the cursor on
+        condition = Q(**{f'{self.field}__{after}e': value}) & (
+            Q(**{f'{self.field}__{after}': value}) | Q(**{self.field: value, f'pk__{after}': pk})
+        )
+        if self.nullable and not nulls_first:
+            condition |= Q(**{f'{self.field}__isnull': True})
+        return condition
+
+    def get_count(self, queryset, mode):
+        """
+        Count the rows of the queryset if the request asks for it.
+
+        Args:
+            queryset: The filtered queryset.
+            mode: 'exact', 'approximate' or None.
+
+        Returns:
+            The number of rows, or None if they are not counted.
+        """
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'approximate':
+            return get_approximate_count(queryset)
+        return None
+
+    def encode_cursor(self, row, reverse):
+        """
+        Build the link to the rows after, or before if reverse, a row.
+
+        Args:
+            row: The object at the edge of the current page.
+            reverse: Whether the link points to the previous page.
+
+        Returns:
+            The URL of the page.
+        """
+        value = None if self.field == 'pk' else getattr(row, self.field)
+        if hasattr(value, 'isoformat'):
+            # Keep the microseconds, which DjangoJSONEncoder would drop
+            value = value.isoformat()
+        position = json.dumps([value, row.pk, reverse])
+        cursor = base64.urlsafe_b64encode(position.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, model, request):
+        """
+        Decode the cursor of a request.
+
+        Args:
+            model: The model of the paginated queryset.
+            request: The HTTP request.
+
+        Returns:
+            A (value, pk, reverse) tuple. pk is None for the first page.
+        """
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, None, False
+        try:
+            value, pk, reverse = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            if self.field != 'pk' and value is not None:
+                value = model._meta.get_field(self.field).to_python(value)
+            return value, model._meta.pk.to_python(pk), bool(reverse)
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.rows:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.rows:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.rows[0], reverse=True)
+
+
+def get_approximate_count(queryset):
+    """
+    Estimate the number of rows of a queryset without counting them.
+
+    Args:
+        queryset: The queryset.
+
+    Returns:
+        The row estimate of the query planner on PostgreSQL, or the exact
+        count on other databases.
+    """
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
@@ -1,6 +1,12 @@
+from datetime import timedelta
+
 import graphene
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
 from graphene_django import DjangoObjectType
-from .models import WebsiteRecord, CrawledPage, Link
+from graphql import GraphQLError
+from .loaders import get_loaders
+from .models import WebsiteRecord, CrawledPage, DeletedPage, Link, PageSnapshot, LinkSnapshot
 from django.utils import timezone
 
 
@@ -51,7 +57,9 @@ class Node(DjangoObjectType):
         Resolver for the 'owner' field. Returns the WebsiteRecord
         associated with the CrawledPage.
         """
-        return self.execution.website_record
+        loaders = get_loaders(info.context)
+        execution = loaders.executions.load(self.execution_id)
+        return loaders.owners.load(execution.website_record_id)
 
     def resolve_crawl_time(self, info):
         """
@@ -64,7 +72,77 @@ class Node(DjangoObjectType):
         Resolver for the 'links' field. Returns a list of CrawledPages that
         this page links to.
         """
-        return [link.to_page for link in self.links_from.all()]
+        return get_loaders(info.context).links.load(self.id)
+
+
+class GraphDelta(graphene.ObjectType):
+    """
+    GraphQL type for the changes of the graph since a cursor.
+
+    It includes the following fields:
+      - cursor: the cursor to pass to the next delta query
+      - nodes: the CrawledPages added or changed since the cursor, with all their links
+      - removed: the URLs of the CrawledPages deleted since the cursor
+    Clients apply the removals before the changed nodes. Consecutive deltas
+    may overlap by a few seconds, so applying a change twice must be harmless.
+    """
+    cursor = graphene.String(required=True)
+    nodes = graphene.List(graphene.NonNull(Node), required=True)
+    removed = graphene.List(graphene.NonNull(graphene.String), required=True)
+
+
+class SnapshotNode(graphene.ObjectType):
+    """
+    GraphQL type for a page of the snapshot of an execution.
+
+    It includes the following fields:
+      - url: the URL of the page
+      - title: the title of the page when the execution crawled it
+      - crawl_time: the time the execution crawled the page
+      - links: the pages of the snapshot this page linked to
+    """
+    url = graphene.String(required=True)
+    title = graphene.String()
+    crawl_time = graphene.String()
+    links = graphene.List(graphene.NonNull(lambda: SnapshotNode), required=True)
+
+
+def parse_cursor(cursor):
+    """
+    Parses a delta cursor, which is an ISO 8601 timestamp.
+
+    Args:
+        cursor: The cursor returned by a previous delta query, or a timestamp.
+
+    Returns:
+        The aware datetime of the cursor.
+    """
+    try:
+        since = parse_datetime(cursor)
+    except ValueError:
+        since = None
+    if since is None:
+        raise GraphQLError(f'Invalid cursor: {cursor}')
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def prime_nodes(info, nodes):
+    """
+    Evaluates the CrawledPages of a list field and queues their owners and
+    links, so that they are loaded in one batch for the whole list.
+
+    Args:
+        info: The GraphQL resolve info of the list field.
+        nodes: A queryset of CrawledPages.
+
+    Returns:
+        The list of CrawledPages.
+    """
+    nodes = list(nodes)
+    get_loaders(info.context).want_pages(nodes)
+    return nodes
 
 
 class Query(graphene.ObjectType):
@@ -74,15 +152,24 @@ class Query(graphene.ObjectType):
     It includes the following fields:
       - websites: a list of all WebsiteRecords
       - nodes: a list of all CrawledPages, optionally filtered by WebsiteRecord
+      - delta: the CrawledPages changed and deleted since a cursor, optionally filtered by WebsiteRecord
+      - snapshot: the pages and links as they were seen by one execution
     """
     websites = graphene.List(graphene.NonNull(WebPage), required=True)
     nodes = graphene.List(graphene.NonNull(Node), web_pages=graphene.List(graphene.NonNull(graphene.ID)), required= True)
+    delta = graphene.Field(
+        GraphDelta,
+        since=graphene.String(),
+        web_pages=graphene.List(graphene.NonNull(graphene.ID)),
+        required=True,
+    )
+    snapshot = graphene.List(graphene.NonNull(SnapshotNode), execution=graphene.ID(required=True), required=True)
 
     def resolve_websites(root, info):
         """
-        Resolver for the 'websites' field. Returns all WebsiteRecords.
+        Resolver for the 'websites' field. Returns all WebsiteRecords not being deleted.
         """
-        return WebsiteRecord.objects.all()
+        return WebsiteRecord.objects.filter(deleting=False)
 
     def resolve_nodes(root, info, web_pages=None):
         """
@@ -92,9 +179,60 @@ class Query(graphene.ObjectType):
         Args:
             web_pages: A list of WebsiteRecord primary keys to filter by.
         """
+        nodes = CrawledPage.objects.all()
+        if web_pages:
+            nodes = nodes.filter(execution__website_record__in=web_pages)
+        return prime_nodes(info, nodes)
+
+    def resolve_delta(root, info, since=None, web_pages=None):
+        """
+        Resolver for the 'delta' field. Returns the CrawledPages added or
+        changed since the cursor and the URLs of the deleted ones, including
+        the pages another website record took over since then. Without a
+        cursor, all CrawledPages are returned.
+
+        The new cursor lags behind the current time by CRAWLER_GRAPH_DELTA_OVERLAP
+        seconds, so pages saved by transactions still running are not missed.
+
+        Args:
+            since: The cursor returned by the previous delta query, or an ISO 8601 timestamp.
+            web_pages: A list of WebsiteRecord primary keys to filter by.
+        """
+        cursor = timezone.now() - timedelta(seconds=getattr(settings, 'CRAWLER_GRAPH_DELTA_OVERLAP', 5))
+        nodes = CrawledPage.objects.all()
+        removed = DeletedPage.objects.all()
         if web_pages:
-            return CrawledPage.objects.filter(execution__website_record__in=web_pages)
-        return CrawledPage.objects.all()
+            nodes = nodes.filter(execution__website_record__in=web_pages)
+            removed = removed.filter(website_record_id__in=web_pages)
+        if since:
+            since = parse_cursor(since)
+            nodes = nodes.filter(updated_at__gt=since)
+            removed = removed.filter(deleted_at__gt=since)
+        else:
+            removed = removed.none()
+        return GraphDelta(
+            cursor=cursor.isoformat(),
+            nodes=prime_nodes(info, nodes),
+            removed=removed.values_list('url', flat=True).distinct(),
+        )
+
+    def resolve_snapshot(root, info, execution):
+        """
+        Resolver for the 'snapshot' field. Returns the pages of the snapshot
+        of an execution, with the links between them.
+
+        Args:
+            execution: The primary key of the Execution.
+        """
+        nodes = {
+            page.url_hash: {'url': page.url, 'title': page.title, 'crawl_time': str(page.crawl_time), 'links': []}
+            for page in PageSnapshot.objects.filter(execution_id=execution)
+        }
+        links = LinkSnapshot.objects.filter(execution_id=execution).values_list('from_url_hash', 'to_url_hash')
+        for from_hash, to_hash in links:
+            if from_hash in nodes and to_hash in nodes:
+                nodes[from_hash]['links'].append(nodes[to_hash])
+        return list(nodes.values())
 
 
 schema = graphene.Schema(query=Query)
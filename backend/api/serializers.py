@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import WebsiteRecord, Execution, CrawledPage
+from .models import WebsiteRecord, Execution, CrawledPage, Deletion
 
 
 class CrawledPageSerializer(serializers.ModelSerializer):
@@ -24,6 +24,7 @@ class ExecutionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Execution
         fields = '__all__'
+        read_only_fields = ['deleting', 'num_resumes']
 
 
 class WebsiteRecordSerializer(serializers.ModelSerializer):
@@ -39,3 +40,16 @@ class WebsiteRecordSerializer(serializers.ModelSerializer):
     class Meta:
         model = WebsiteRecord
         fields = '__all__'
+        read_only_fields = ['deleting', 'last_crawled']
+
+
+class DeletionSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the Deletion model.
+
+    This serializer includes all fields from the Deletion model.
+    """
+
+    class Meta:
+        model = Deletion
+        fields = '__all__'
@@ -1,3 +1,521 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.db import connection, models
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from webcrawler.deletion import mark_for_deletion, run_deletion
+from webcrawler.events import EXECUTIONS_CHANNEL, get_website_channel, publish_execution, publish_pages
+from .models import WebsiteRecord, Execution, CrawledPage, Link, PageSnapshot, LinkSnapshot, DeletedPage, Deletion
+
+
+class CrawledPageSetLinksTests(TestCase):
+    def setUp(self):
+        website_record = WebsiteRecord.objects.create(
+            url='https://example.com/',
+            boundary_regexp='https://example.com/.*',
+            periodicity='day',
+            label='example',
+            active=False,
+            tags=[],
+        )
+        self.execution = Execution.objects.create(website_record=website_record)
+        self.page = CrawledPage.objects.create(url='https://example.com/', execution=self.execution)
+
+    def count_set_links_queries(self, num_links):
+        """
+        Links the page to `num_links` pages, half of which already exist,
+        and returns the number of executed queries.
+        """
+        links = [f'https://example.com/{num_links}/{i}' for i in range(num_links)]
+        for url in links[::2]:
+            CrawledPage.objects.create(url=url, execution=self.execution)
+
+        with CaptureQueriesContext(connection) as context:
+            self.page.set_links(links, self.execution)
+        return len(context.captured_queries)
+
+    def test_query_count_does_not_depend_on_number_of_links(self):
+        self.assertEqual(self.count_set_links_queries(2), self.count_set_links_queries(300))
+        self.assertLessEqual(self.count_set_links_queries(10), 4)
+
+    def test_set_links_creates_missing_pages_and_links(self):
+        existing = CrawledPage.objects.create(url='https://example.com/a', execution=self.execution)
+
+        self.page.set_links(['https://example.com/a', 'https://example.com/b'], self.execution)
+        self.page.set_links(['https://example.com/a', 'https://example.com/b'], self.execution)
+
+        self.assertEqual(CrawledPage.objects.filter(url='https://example.com/a').count(), 1)
+        self.assertEqual(CrawledPage.objects.filter(url='https://example.com/b').count(), 1)
+        self.assertEqual(
+            sorted(page.url for page in self.page.get_links()),
+            ['https://example.com/a', 'https://example.com/b'],
+        )
+        self.assertTrue(Link.objects.filter(from_page=self.page, to_page=existing).exists())
+
+
+class CrawledPageBulkSaveTests(TestCase):
+    def setUp(self):
+        website_record = WebsiteRecord.objects.create(
+            url='https://example.com',
+            boundary_regexp='https://example.com.*',
+            periodicity='day',
+            label='example',
+            active=False,
+            tags=[],
+        )
+        self.execution = Execution.objects.create(website_record=website_record)
+
+    def test_urls_of_the_same_page_are_saved_once(self):
+        pages = CrawledPage.bulk_save_pages({
+            'https://example.com': {'title': 'Home'},
+            'https://EXAMPLE.com/': {'title': 'Home again'},
+            'https://example.com/a': {'title': 'A'},
+        }, self.execution)
+        links = {
+            'https://example.com': ['https://example.com/a', 'https://example.com:443/a#top'],
+            'https://EXAMPLE.com/': ['https://example.com/a'],
+            'https://example.com/a': ['https://example.com', 'https://example.com/'],
+        }
+        CrawledPage.bulk_set_links({pages[url]: urls for url, urls in links.items()}, self.execution)
+        PageSnapshot.bulk_save_snapshot(self.execution, pages, links)
+
+        self.assertEqual(CrawledPage.objects.count(), 2)
+        self.assertIs(pages['https://example.com'], pages['https://EXAMPLE.com/'])
+        self.assertEqual(pages['https://example.com'].title, 'Home again')
+        self.assertEqual(Link.objects.count(), 2)
+        self.assertEqual(PageSnapshot.objects.filter(execution=self.execution).count(), 2)
+
+
+class MergeDuplicatePagesTests(TransactionTestCase):
+    """
+    Runs the data migration that merged the pages sharing a URL hash, on a
+    table whose URL hash is not unique for the duration of the test.
+    """
+    migration = import_module('api.migrations.0024_crawledpage_url_hash')
+
+    def setUp(self):
+        unique = CrawledPage._meta.get_field('url_hash')
+        non_unique = models.CharField(max_length=32, editable=False, null=True)
+        non_unique.set_attributes_from_name('url_hash')
+        non_unique.model = CrawledPage
+        with connection.schema_editor() as editor:
+            editor.alter_field(CrawledPage, unique, non_unique)
+        self.addCleanup(self.restore_unique, non_unique, unique)
+
+    def restore_unique(self, non_unique, unique):
+        CrawledPage.objects.all().delete()
+        with connection.schema_editor() as editor:
+            editor.alter_field(CrawledPage, non_unique, unique)
+
+    def create_page(self, url, status_code, age):
+        page = CrawledPage.objects.create(url=url, execution=self.execution, status_code=status_code)
+        CrawledPage.objects.filter(id=page.id).update(crawl_time=timezone.now() - timedelta(days=age))
+        return page
+
+    def test_duplicates_are_merged_into_the_last_fetched_page(self):
+        self.execution = Execution.objects.create(website_record=WebsiteRecord.objects.create(
+            url='https://example.com/',
+            boundary_regexp='https://example.com/.*',
+            periodicity='day',
+            label='example',
+            active=False,
+            tags=[],
+        ))
+        old = self.create_page('https://example.com/a', 200, 2)
+        kept = self.create_page('https://EXAMPLE.com/a', 200, 1)
+        target = self.create_page('https://example.com:443/a#top', None, 0)
+        other = self.create_page('https://example.com/b', 200, 0)
+        for from_page, to_page in [
+            (old, kept), (target, old), (other, old), (other, target), (old, other), (kept, other),
+        ]:
+            Link.objects.create(from_page=from_page, to_page=to_page)
+
+        self.migration.hash_urls(apps, None)
+        self.migration.merge_duplicate_pages(apps, None)
+
+        self.assertEqual(set(CrawledPage.objects.values_list('id', flat=True)), {kept.id, other.id})
+        self.assertEqual(
+            set(Link.objects.values_list('from_page_id', 'to_page_id')), {(other.id, kept.id), (kept.id, other.id)}
+        )
+
+
+class SnapshotTests(TestCase):
+    def test_partitions_hold_ranges_of_executions(self):
+        self.assertEqual(PageSnapshot.get_partition_range(1), (0, 1000))
+        self.assertEqual(PageSnapshot.get_partition_range(1000), (1000, 2000))
+        self.assertEqual(LinkSnapshot.get_partition_name(1999), 'api_linksnapshot_1000')
+
+    def test_deleting_an_execution_deletes_only_its_snapshot(self):
+        website_record = WebsiteRecord.objects.create(
+            url='https://example.com/',
+            boundary_regexp='https://example.com/.*',
+            periodicity='day',
+            label='example',
+            active=False,
+            tags=[],
+        )
+        executions = [Execution.objects.create(website_record=website_record) for _ in range(2)]
+        for execution in executions:
+            page = CrawledPage.objects.create(url=f'https://example.com/{execution.id}', execution=execution)
+            PageSnapshot.bulk_save_snapshot(execution, {page.url: page}, {page.url: ['https://example.com/a']})
+
+        executions[0].delete()
+
+        self.assertEqual(set(PageSnapshot.objects.values_list('execution_id', flat=True)), {executions[1].id})
+        self.assertEqual(set(LinkSnapshot.objects.values_list('execution_id', flat=True)), {executions[1].id})
+
+
+class GraphQueryTests(TestCase):
+    QUERY = '''
+        query {
+          nodes {
+            url
+            owner { identifier regexp }
+            links { url owner { identifier } }
+          }
+        }
+    '''
+
+    def setUp(self):
+        self.website_records = [
+            WebsiteRecord.objects.create(
+                url=f'https://example{i}.com/',
+                boundary_regexp=f'https://example{i}.com/.*',
+                periodicity='day',
+                label=f'example{i}',
+                active=False,
+                tags=[],
+            )
+            for i in range(2)
+        ]
+
+    def create_graph(self, num_pages):
+        """
+        Creates `num_pages` pages spread over several executions and websites,
+        each linking to the next one.
+        """
+        executions = [
+            Execution.objects.create(website_record=website_record)
+            for website_record in self.website_records
+            for _ in range(2)
+        ]
+        pages = [
+            CrawledPage.objects.create(url=f'https://example.com/{num_pages}/{i}', execution=executions[i % 4])
+            for i in range(num_pages)
+        ]
+        for page, next_page in zip(pages, pages[1:]):
+            Link.objects.create(from_page=page, to_page=next_page)
+
+    def count_graph_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/api/graphql/', {'query': self.QUERY}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('errors', response.json())
+        return len(context.captured_queries), response.json()['data']['nodes']
+
+    def test_query_count_does_not_depend_on_number_of_nodes(self):
+        self.create_graph(3)
+        num_queries, nodes = self.count_graph_queries()
+        self.assertEqual(len(nodes), 3)
+
+        self.create_graph(50)
+        self.assertEqual(self.count_graph_queries()[0], num_queries)
+        self.assertLessEqual(num_queries, 5)
+
+    def test_nodes_resolve_owners_and_links(self):
+        self.create_graph(5)
+        nodes = {node['url']: node for node in self.count_graph_queries()[1]}
+
+        first = nodes['https://example.com/5/0']
+        self.assertEqual(first['owner']['identifier'], str(self.website_records[0].id))
+        self.assertEqual(first['links'], [{'url': 'https://example.com/5/1', 'owner': {'identifier': str(self.website_records[0].id)}}])
+        self.assertEqual(nodes['https://example.com/5/2']['owner']['identifier'], str(self.website_records[1].id))
+        self.assertEqual(nodes['https://example.com/5/4']['links'], [])
+
+
+class GraphDeltaTests(TestCase):
+    QUERY = '''
+        query ($since: String, $webPages: [ID!]) {
+          delta(since: $since, webPages: $webPages) { cursor nodes { url } removed }
+        }
+    '''
+
+    def setUp(self):
+        self.executions = [
+            Execution.objects.create(website_record=WebsiteRecord.objects.create(
+                url=f'https://example{i}.com/',
+                boundary_regexp=f'https://example{i}.com/.*',
+                periodicity='day',
+                label=f'example{i}',
+                active=False,
+                tags=[],
+            ))
+            for i in range(2)
+        ]
+
+    def get_delta(self, website_record, since=None):
+        variables = {'since': since, 'webPages': [website_record.id]}
+        response = self.client.post(
+            '/api/graphql/', {'query': self.QUERY, 'variables': variables}, content_type='application/json'
+        )
+        self.assertNotIn('errors', response.json())
+        return response.json()['data']['delta']
+
+    def test_page_taken_over_by_another_website_is_removed(self):
+        first, second = self.executions
+        page = CrawledPage.objects.create(url='https://example0.com/', execution=first)
+        CrawledPage.bulk_set_links({page: ['https://shared.com/']}, first)
+        delta = self.get_delta(first.website_record)
+        self.assertEqual(
+            sorted(node['url'] for node in delta['nodes']), ['https://example0.com/', 'https://shared.com/']
+        )
+
+        other = CrawledPage.objects.create(url='https://example1.com/', execution=second)
+        CrawledPage.bulk_set_links({other: ['https://shared.com/']}, second)
+
+        delta = self.get_delta(first.website_record, delta['cursor'])
+        self.assertEqual(delta['removed'], ['https://shared.com/'])
+        self.assertNotIn('https://shared.com/', [node['url'] for node in delta['nodes']])
+        self.assertIn('https://shared.com/', [node['url'] for node in self.get_delta(second.website_record)['nodes']])
+
+
+class StubPubSub:
+    """
+    Stands in for a redis.asyncio pub/sub, delivering the (channel, message)
+    pairs of `published` on the subscribed channels.
+    """
+
+    def __init__(self, published):
+        self.published = published
+        self.channels = set()
+
+    async def subscribe(self, channel):
+        self.channels.add(channel)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=None):
+        while self.published:
+            channel, message = self.published.pop(0)
+            if channel in self.channels:
+                return {'type': 'message', 'channel': channel, 'data': message}
+        return None
+
+    async def reset(self):
+        self.channels.clear()
+
+
+@override_settings(CRAWLER_PUBLISH_EVENTS=True)
+class EventStreamTests(TestCase):
+    def setUp(self):
+        self.execution = Execution.objects.create(website_record=WebsiteRecord.objects.create(
+            url='https://example.com/',
+            boundary_regexp='https://example.com/.*',
+            periodicity='day',
+            label='example',
+            active=False,
+            tags=[],
+        ))
+        page = CrawledPage.objects.create(url='https://example.com/', execution=self.execution, title='Home')
+        with mock.patch('webcrawler.events.get_redis') as get_redis:
+            publish_pages(self.execution, {page.url: page}, {page.url: ['https://example.com/a']})
+            publish_execution(self.execution)
+        published = [call.args for call in get_redis.return_value.pipeline.return_value.publish.call_args_list]
+        client = mock.Mock(pubsub=mock.Mock(return_value=StubPubSub(published)), close=mock.AsyncMock())
+        patcher = mock.patch('redis.asyncio.Redis.from_url', return_value=client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def read_events(self, path, count):
+        """
+        Returns the first `count` events streamed by the view at `path`.
+        """
+        response = await self.async_client.get(path)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = []
+        async for chunk in response.streaming_content:
+            event, data = chunk.decode().split('\n')[:2]
+            if event.startswith('event: '):
+                events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+            if len(events) == count:
+                break
+        return events
+
+    async def test_website_record_stream_has_page_and_execution_events(self):
+        website_record = self.execution.website_record
+        events = await self.read_events(f'/api/events/website_records/{website_record.id}/', 2)
+
+        self.assertEqual([event for event, _ in events], ['pages', 'execution'])
+        pages = events[0][1]
+        self.assertEqual(pages['owner'], {'identifier': str(website_record.id), 'regexp': 'https://example.com/.*'})
+        self.assertEqual(
+            [(page['url'], page['title'], page['links']) for page in pages['pages']],
+            [('https://example.com/', 'Home', [{'url': 'https://example.com/a'}])],
+        )
+        self.assertEqual(events[1][1]['id'], self.execution.id)
+
+    async def test_execution_stream_has_only_execution_events(self):
+        events = await self.read_events('/api/events/executions/', 1)
+
+        self.assertEqual(events, [('execution', mock.ANY)])
+        self.assertEqual(events[0][1]['status'], self.execution.status)
+
+    def test_events_are_published_on_the_website_and_executions_channels(self):
+        with mock.patch('webcrawler.events.get_redis') as get_redis:
+            publish_execution(self.execution)
+        channels = [call.args[0] for call in get_redis.return_value.pipeline.return_value.publish.call_args_list]
+        self.assertEqual(channels, [EXECUTIONS_CHANNEL, get_website_channel(self.execution.website_record_id)])
+
+
+@override_settings(CRAWLER_PUBLISH_EVENTS=False)
+class DeletionTests(TestCase):
+    def setUp(self):
+        self.website_records = []
+        self.executions = []
+        for i in range(2):
+            website_record = WebsiteRecord.objects.create(
+                url=f'https://example{i}.com/',
+                boundary_regexp=f'https://example{i}.com/.*',
+                periodicity='day',
+                label=f'example{i}',
+                active=False,
+                tags=[],
+            )
+            self.website_records.append(website_record)
+            for _ in range(2):
+                execution = Execution.objects.create(website_record=website_record)
+                page = CrawledPage.objects.create(url=f'https://example{i}.com/{execution.id}', execution=execution)
+                CrawledPage.bulk_set_links({page: [f'https://example{i}.com/']}, execution)
+                self.executions.append(execution)
+
+    def get_ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.json()['results']]
+
+    def test_website_record_is_hidden_while_it_is_deleted(self):
+        website_record = self.website_records[0]
+        with mock.patch('webcrawler.tasks.delete_records.delay') as delay:
+            response = self.client.delete(f'/api/website_records/delete/{website_record.id}/')
+
+        self.assertEqual(response.status_code, 202)
+        deletion = Deletion.objects.get()
+        self.assertEqual(response.json()['deletion']['id'], deletion.id)
+        delay.assert_called_once_with(deletion.id)
+        self.assertEqual(self.get_ids('/api/website_records/'), [self.website_records[1].id])
+        self.assertEqual(self.get_ids('/api/executions/'), [execution.id for execution in self.executions[2:]])
+        response = self.client.post(
+            '/api/graphql/', {'query': 'query { websites { identifier } }'}, content_type='application/json'
+        )
+        self.assertEqual(response.json()['data']['websites'], [{'identifier': str(self.website_records[1].id)}])
+        self.assertEqual(self.client.post(f'/api/executions/create/{website_record.id}/').status_code, 404)
+
+    def test_repeated_deletion_is_not_started_twice(self):
+        deletion = mark_for_deletion(self.executions[0])
+        self.assertEqual(mark_for_deletion(self.executions[0]), deletion)
+        self.assertTrue(Execution.objects.get(id=self.executions[0].id).deleting)
+        self.assertFalse(Execution.objects.get(id=self.executions[1].id).deleting)
+
+    def test_website_record_is_deleted_in_batches(self):
+        deleted_urls = set(CrawledPage.objects.filter(
+            execution__website_record=self.website_records[0]
+        ).values_list('url', flat=True))
+        deletion = mark_for_deletion(self.website_records[0])
+
+        run_deletion(deletion, batch_size=1, link_batch_size=1)
+
+        deletion.refresh_from_db()
+        self.assertEqual(deletion.status, 'completed')
+        self.assertEqual(deletion.num_pages, 3)
+        self.assertEqual(deletion.num_pages_deleted, 3)
+        self.assertEqual(deletion.num_links_deleted, 2)
+        self.assertEqual(list(WebsiteRecord.objects.values_list('id', flat=True)), [self.website_records[1].id])
+        self.assertEqual(set(Execution.objects.values_list('id', flat=True)), {e.id for e in self.executions[2:]})
+        self.assertFalse(CrawledPage.objects.filter(url__in=deleted_urls).exists())
+        self.assertFalse(Link.objects.filter(from_page__url__in=deleted_urls).exists())
+        self.assertEqual(Link.objects.count(), 2)
+        self.assertEqual(set(DeletedPage.objects.values_list('url', flat=True)), deleted_urls)
+
+    def test_execution_is_deleted_without_its_website_record(self):
+        execution = self.executions[1]
+        run_deletion(mark_for_deletion(execution))
+
+        self.assertFalse(Execution.objects.filter(id=execution.id).exists())
+        self.assertFalse(CrawledPage.objects.filter(execution_id=execution.id).exists())
+        self.assertTrue(WebsiteRecord.objects.filter(id=execution.website_record_id).exists())
+        self.assertTrue(Execution.objects.filter(id=self.executions[0].id).exists())
+
+
+@override_settings(CRAWLER_PUBLISH_EVENTS=False)
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.website_records = [
+            WebsiteRecord.objects.create(
+                url=f'https://example{i}.com/',
+                boundary_regexp=f'https://example{i}.com/.*',
+                periodicity='day',
+                label=f'example{i}',
+                active=False,
+                tags=[],
+            )
+            for i in range(5)
+        ]
+        self.executions = [Execution.objects.create(website_record=self.website_records[0]) for _ in range(7)]
+        # Executions started at the same time are ordered by ID
+        Execution.objects.update(start_time=timezone.now())
+
+    def get_page(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def follow(self, url):
+        """
+        Returns the IDs of all pages from `url` on, following the next links, and the last page.
+        """
+        ids = []
+        while url:
+            page = self.get_page(url)
+            ids += [row['id'] for row in page['results']]
+            url = page['next']
+        return ids, page
+
+    def test_pages_of_tied_rows_hold_every_row_once(self):
+        ids = sorted(execution.id for execution in self.executions)
+
+        self.assertEqual(self.follow('/api/executions/?sort=start_time&page_size=2')[0], ids)
+        self.assertEqual(self.follow('/api/executions/?sort=-start_time&page_size=2')[0], ids[::-1])
+
+    def test_previous_link_returns_the_previous_page(self):
+        first = self.get_page('/api/executions/?sort=start_time&page_size=3')
+        self.assertIsNone(first['previous'])
+        second = self.get_page(first['next'])
+
+        previous = self.get_page(second['previous'])
+        self.assertEqual(previous['results'], first['results'])
+        self.assertIsNone(previous['previous'])
+
+    def test_rows_inserted_meanwhile_do_not_shift_the_pages(self):
+        first = self.get_page('/api/executions/?page_size=3')
+        Execution.objects.filter(id=first['results'][0]['id']).delete()
+        Execution.objects.create(website_record=self.website_records[0])
+
+        ids, _ = self.follow(first['next'])
+        self.assertEqual(ids, sorted(execution.id for execution in self.executions[3:]) + [ids[-1]])
+        self.assertNotIn(ids[-1], [execution.id for execution in self.executions])
+
+    def test_rows_without_sort_value_come_last(self):
+        crawled = self.website_records[1:3]
+        WebsiteRecord.objects.update(last_crawled=None)
+        WebsiteRecord.objects.filter(id__in=[record.id for record in crawled]).update(last_crawled=timezone.now())
+        expected = [record.id for record in crawled] + [
+            record.id for record in self.website_records if record not in crawled
+        ]
+
+        ids, page = self.follow('/api/website_records/?sort=last_crawled&page_size=2&count=exact')
+        self.assertEqual(ids, expected)
+        self.assertEqual(page['count'], 5)
@@ -17,6 +17,9 @@ from .views import (
     create_execution,
     update_execution,
     delete_execution,
+    get_deletion,
+    stream_execution_events,
+    stream_website_record_events,
 )
 
 # Provide schema information for OpenAPI document generation.
@@ -48,6 +51,13 @@ urlpatterns = [
     path('executions/update/<int:identifier>/', update_execution, name='update_execution'),
     path('executions/delete/<int:identifier>/', delete_execution, name='delete_execution'),
 
+    # Progress of the background deletions of website records and executions
+    path('deletions/<int:identifier>/', get_deletion, name='get_deletion'),
+
+    # Server-Sent Events pushed while executions run
+    path('events/executions/', stream_execution_events, name='stream_execution_events'),
+    path('events/website_records/<int:identifier>/', stream_website_record_events, name='stream_website_record_events'),
+
     # Swagger UI for OpenAPI documentation
     path('docs/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
 ]
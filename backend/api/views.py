@@ -1,19 +1,15 @@
-from django.db.models import Max
+from django.http import Http404, StreamingHttpResponse
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from rest_framework.pagination import PageNumberPagination
 from drf_yasg import openapi
 
-from .serializers import WebsiteRecordSerializer, ExecutionSerializer
-from .models import WebsiteRecord, Execution
-
-
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 5
-    page_size_query_param = 'page_size'
-    max_page_size = 100
+from .pagination import KeysetPagination
+from .serializers import WebsiteRecordSerializer, ExecutionSerializer, DeletionSerializer
+from .models import WebsiteRecord, Execution, Deletion
+from webcrawler.deletion import mark_for_deletion
+from webcrawler.events import EXECUTIONS_CHANNEL, get_website_channel, iter_events
 
 
 @swagger_auto_schema(method='POST', request_body=WebsiteRecordSerializer)
@@ -78,7 +74,7 @@ def update_website_record(request, identifier):
                             website_record:
                                 $ref: '#/components/schemas/WebsiteRecord'
     """
-    website_record = get_object_or_404(WebsiteRecord, pk=identifier)
+    website_record = get_object_or_404(WebsiteRecord, pk=identifier, deleting=False)
     serializer = WebsiteRecordSerializer(website_record, data=request.data)
     if serializer.is_valid():
         serializer.save()
@@ -90,7 +86,11 @@ def update_website_record(request, identifier):
 @api_view(['DELETE'])
 def delete_website_record(request, identifier):
     """
-    Delete a website record.
+    Delete a website record and its executions.
+
+    The website record is marked for deletion and hidden from the listings, and its
+    crawled pages, links and snapshots are deleted in batches by a background
+    task. The progress of the deletion is returned by get_deletion.
     ---
     parameters:
         - name: request
@@ -104,8 +104,8 @@ def delete_website_record(request, identifier):
           in: path
           type: integer
     responses:
-        200:
-            description: A successful response indicating the website record was deleted.
+        202:
+            description: A successful response indicating the deletion of the website record has started.
             content:
                 application/json:
                     schema:
@@ -113,10 +113,14 @@ def delete_website_record(request, identifier):
                         properties:
                             success:
                                 type: boolean
+                            deletion:
+                                $ref: '#/components/schemas/Deletion'
     """
     website_record = get_object_or_404(WebsiteRecord, pk=identifier)
-    website_record.delete()
-    return Response({'success': True})
+    deletion = mark_for_deletion(website_record)
+    from webcrawler.tasks import delete_records
+    delete_records.delay(deletion.id)
+    return Response({'success': True, 'deletion': DeletionSerializer(deletion).data}, status=202)
 
 
 @swagger_auto_schema(
@@ -132,16 +136,24 @@ def delete_website_record(request, identifier):
         openapi.Parameter('sort', openapi.IN_QUERY,
                           description="Sort the results by 'url', '-url', 'last_crawled', or '-last_crawled'",
                           type=openapi.TYPE_STRING),
-        openapi.Parameter('page', openapi.IN_QUERY, description="Page number for pagination",
-                          type=openapi.TYPE_INTEGER),
+        openapi.Parameter('cursor', openapi.IN_QUERY,
+                          description="Cursor of the page, taken from the 'next' or 'previous' link of the previous page",
+                          type=openapi.TYPE_STRING),
         openapi.Parameter('page_size', openapi.IN_QUERY, description="Number of items per page",
-                          type=openapi.TYPE_INTEGER)
+                          type=openapi.TYPE_INTEGER),
+        openapi.Parameter('count', openapi.IN_QUERY,
+                          description="Also return the number of items: 'exact', or 'approximate' for a fast estimate",
+                          type=openapi.TYPE_STRING)
     ]
 )
 @api_view(['GET'])
 def get_website_records(request):
     """
-    Get all website records.
+    Get all website records, one page at a time.
+
+    Pages are selected by a cursor on the sort order instead of a page number,
+    so deep pages are as fast as the first one. Follow the 'next' and
+    'previous' links to move between pages.
     ---
     parameters:
         - name: request
@@ -159,6 +171,7 @@ def get_website_records(request):
                         properties:
                             count:
                                 type: integer
+                                description: Only returned if the 'count' parameter is set.
                             next:
                                 type: string
                             previous:
@@ -173,7 +186,7 @@ def get_website_records(request):
     tags = request.GET.getlist('tags[]')
     sort = request.GET.get('sort')
 
-    website_records = WebsiteRecord.objects.all()
+    website_records = WebsiteRecord.objects.filter(deleting=False)
     if url:
         website_records = website_records.filter(url__icontains=url)
     if label:
@@ -181,14 +194,11 @@ def get_website_records(request):
     if tags:
         website_records = website_records.filter(tags__overlap=tags)
 
-    # Annotate each website record with the max 'end_time' of its executions
-    website_records = website_records.annotate(last_crawled=Max('execution__start_time'))
-
-    if sort in ['url', '-url', 'last_crawled', '-last_crawled']:
-        website_records = website_records.order_by(sort)
+    if sort not in ['url', '-url', 'last_crawled', '-last_crawled']:
+        sort = None
 
-    paginator = StandardResultsSetPagination()
-    paginated_website_records = paginator.paginate_queryset(website_records, request)
+    paginator = KeysetPagination()
+    paginated_website_records = paginator.paginate_queryset(website_records, request, sort=sort)
 
     serializer = WebsiteRecordSerializer(paginated_website_records, many=True)
     return paginator.get_paginated_response(serializer.data)
@@ -203,16 +213,22 @@ def get_website_records(request):
         openapi.Parameter('sort', openapi.IN_QUERY,
                           description="Sort the results by 'start_time', or '-start_time'",
                           type=openapi.TYPE_STRING),
-        openapi.Parameter('page', openapi.IN_QUERY, description="Page number for pagination",
-                          type=openapi.TYPE_INTEGER),
+        openapi.Parameter('cursor', openapi.IN_QUERY,
+                          description="Cursor of the page, taken from the 'next' or 'previous' link of the previous page",
+                          type=openapi.TYPE_STRING),
         openapi.Parameter('page_size', openapi.IN_QUERY, description="Number of items per page",
-                          type=openapi.TYPE_INTEGER)
+                          type=openapi.TYPE_INTEGER),
+        openapi.Parameter('count', openapi.IN_QUERY,
+                          description="Also return the number of items: 'exact', or 'approximate' for a fast estimate",
+                          type=openapi.TYPE_STRING)
     ]
 )
 @api_view(['GET'])
 def get_executions(request):
     """
-    Get all executions.
+    Get all executions, one page at a time.
+
+    Pages are selected by a cursor on the sort order, like get_website_records.
     ---
     parameters:
         - name: request
@@ -230,6 +246,7 @@ def get_executions(request):
                         properties:
                             count:
                                 type: integer
+                                description: Only returned if the 'count' parameter is set.
                             next:
                                 type: string
                             previous:
@@ -242,16 +259,16 @@ def get_executions(request):
     label = request.GET.get('label')
     sort = request.GET.get('sort')
 
-    executions = Execution.objects.all()
+    executions = Execution.objects.filter(deleting=False)
 
     if label:
         executions = executions.filter(website_record__label__icontains=label)
 
-    if sort in ['start_time', '-start_time']:
-        executions = executions.order_by(sort)
+    if sort not in ['start_time', '-start_time']:
+        sort = None
 
-    paginator = StandardResultsSetPagination()
-    paginated_executions = paginator.paginate_queryset(executions, request)
+    paginator = KeysetPagination()
+    paginated_executions = paginator.paginate_queryset(executions, request, sort=sort)
 
     serializer = ExecutionSerializer(paginated_executions, many=True)
     return paginator.get_paginated_response(serializer.data)
@@ -345,7 +362,7 @@ def create_execution(request, website_id):
                             success:
                                 type: boolean
     """
-    website = get_object_or_404(WebsiteRecord, pk=website_id)
+    website = get_object_or_404(WebsiteRecord, pk=website_id, deleting=False)
     from webcrawler.tasks import crawl_website
     crawl_website.delay(website.id)
     return Response({'success': True})
@@ -381,7 +398,7 @@ def update_execution(request, identifier):
                             execution:
                                 $ref: '#/components/schemas/Execution'
     """
-    execution = get_object_or_404(Execution, pk=identifier)
+    execution = get_object_or_404(Execution, pk=identifier, deleting=False)
     serializer = ExecutionSerializer(execution, data=request.data)
     if serializer.is_valid():
         serializer.save()
@@ -394,6 +411,10 @@ def update_execution(request, identifier):
 def delete_execution(request, identifier):
     """
     Delete an execution.
+
+    The execution is marked for deletion and hidden from the listings, and its
+    crawled pages, links and snapshots are deleted in batches by a background
+    task. The progress of the deletion is returned by get_deletion.
     ---
     parameters:
         - name: request
@@ -407,8 +428,8 @@ def delete_execution(request, identifier):
           in: path
           type: integer
     responses:
-        200:
-            description: A successful response indicating the execution was deleted.
+        202:
+            description: A successful response indicating the deletion of the execution has started.
             content:
                 application/json:
                     schema:
@@ -416,7 +437,95 @@ def delete_execution(request, identifier):
                         properties:
                             success:
                                 type: boolean
+                            deletion:
+                                $ref: '#/components/schemas/Deletion'
     """
     execution = get_object_or_404(Execution, pk=identifier)
-    execution.delete()
-    return Response({'success': True})
+    deletion = mark_for_deletion(execution)
+    from webcrawler.tasks import delete_records
+    delete_records.delay(deletion.id)
+    return Response({'success': True, 'deletion': DeletionSerializer(deletion).data}, status=202)
+
+
+@swagger_auto_schema(method='GET', responses={200: DeletionSerializer()})
+@api_view(['GET'])
+def get_deletion(request, identifier):
+    """
+    Get the progress of the deletion of a website record or an execution.
+    ---
+    parameters:
+        - name: request
+          description: The HTTP request object.
+          required: true
+          in: query
+          type: object
+        - name: identifier
+          description: The identifier of the deletion to retrieve.
+          required: true
+          in: path
+          type: integer
+    responses:
+        200:
+            description: A successful response with the requested deletion.
+            content:
+                application/json:
+                    schema:
+                        $ref: '#/components/schemas/Deletion'
+    """
+    deletion = get_object_or_404(Deletion, pk=identifier)
+    serializer = DeletionSerializer(deletion)
+    return Response(serializer.data)
+
+
+def event_stream_response(channel):
+    """
+    Build a Server-Sent Events response streaming the events of a Redis channel.
+
+    Args:
+        channel: The channel name.
+
+    Returns:
+        A StreamingHttpResponse. The stream is pushed as events arrive when
+        the project is served by an ASGI server.
+    """
+    response = StreamingHttpResponse(iter_events(channel), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def stream_execution_events(request):
+    """
+    Stream the status and progress changes of all executions as Server-Sent Events.
+    ---
+    responses:
+        200:
+            description: An event stream of 'execution' events, each carrying
+                the serialized execution.
+            content:
+                text/event-stream: {}
+    """
+    return event_stream_response(EXECUTIONS_CHANNEL)
+
+
+async def stream_website_record_events(request, identifier):
+    """
+    Stream the execution changes and newly crawled pages of a website record as Server-Sent Events.
+    ---
+    parameters:
+        - name: identifier
+          description: The identifier of the website record.
+          required: true
+          in: path
+          type: integer
+    responses:
+        200:
+            description: An event stream of 'execution' events and of 'pages'
+                events, each carrying the owner and a batch of saved pages
+                with their outgoing links.
+            content:
+                text/event-stream: {}
+    """
+    if not await WebsiteRecord.objects.filter(pk=identifier).aexists():
+        raise Http404('Website record does not exist.')
+    return event_stream_response(get_website_channel(identifier))
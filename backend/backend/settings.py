@@ -152,6 +152,14 @@ CELERY_BROKER_URL = 'redis://redis:6379'
 # CELERY_BROKER_URL = 'redis://127.0.0.1:6379'
 CELERY_RESULT_BACKEND = "redis://redis:6379"
 
+# Synced to the database scheduler of celery beat on startup
+CELERY_BEAT_SCHEDULE = {
+    'prune-executions': {
+        'task': 'webcrawler.tasks.prune_old_executions',
+        'schedule': 3600.0,
+    },
+}
+
 
 # CORS
 CORS_ORIGIN_ALLOW_ALL = True
@@ -167,3 +175,117 @@ SWAGGER_SETTINGS = {
 }
 
 
+# Crawler
+
+# Maximum number of pages fetched at the same time by a single execution
+CRAWLER_CONCURRENCY = 8
+
+# Crawl engine used by the crawl_website task: 'threads' or 'asyncio'
+CRAWLER_ENGINE = 'threads'
+
+# Only one execution of a website runs at a time. A crawl triggered while one is
+# running is dropped ('skip'), waits for it to finish ('queue') or stops it early
+# ('supersede'). At most one trigger per website waits, retrying every
+# CRAWLER_SITE_LOCK_RETRY_DELAY seconds. The lock of a dead worker expires after
+# CRAWLER_SITE_LOCK_LEASE seconds.
+CRAWLER_OVERLAP_POLICY = 'skip'
+CRAWLER_SITE_LOCK_LEASE = 300
+CRAWLER_SITE_LOCK_RETRY_DELAY = 10
+
+# Distributed mode: the frontier of an execution lives in Redis and its pages are
+# crawled by crawl_batch tasks on any number of Celery workers. Every task claims
+# CRAWLER_BATCH_SIZE URLs, and at most CRAWLER_MAX_BATCH_TASKS run at the same time.
+# Claimed URLs are leased for CRAWLER_BATCH_LEASE seconds, after which they are
+# queued again, as the worker that claimed them is assumed lost. The lease must
+# be longer than a batch takes.
+CRAWLER_DISTRIBUTED = False
+CRAWLER_REDIS_URL = CELERY_BROKER_URL
+CRAWLER_BATCH_SIZE = 50
+CRAWLER_MAX_BATCH_TASKS = 16
+CRAWLER_BATCH_LEASE = 600
+
+# Maximum number of pages fetched at the same time by the asyncio engine
+CRAWLER_ASYNC_CONCURRENCY = 100
+
+# User-Agent header sent with every crawler request
+CRAWLER_USER_AGENT = 'WebCrawler/1.0'
+
+# Number of hosts whose keep-alive connection pools are kept per execution
+CRAWLER_POOL_HOSTS = 10
+
+# Seconds before a crawler request times out
+CRAWLER_REQUEST_TIMEOUT = 30
+
+# Only responses of these media types are downloaded and parsed, and only up to
+# CRAWLER_MAX_BODY_SIZE bytes. Links with the skipped extensions are never fetched.
+CRAWLER_ALLOWED_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+CRAWLER_MAX_BODY_SIZE = 10 * 1024 * 1024
+CRAWLER_SKIPPED_EXTENSIONS = (
+    '.7z', '.avi', '.bmp', '.bz2', '.css', '.dmg', '.doc', '.docx', '.exe', '.gif', '.gz',
+    '.ico', '.iso', '.jpeg', '.jpg', '.js', '.mkv', '.mov', '.mp3', '.mp4', '.pdf', '.png',
+    '.ppt', '.pptx', '.rar', '.svg', '.tar', '.tgz', '.wav', '.webm', '.webp', '.xls', '.xlsx', '.zip',
+)
+
+# Adaptive per-host concurrency: initial number of requests in flight per host
+# and the response time (seconds) up to which the limit keeps growing
+CRAWLER_HOST_INITIAL_CONCURRENCY = 2
+CRAWLER_HOST_TARGET_LATENCY = 1.0
+
+# Maximum number of sitemap entries loaded into the frontier of an execution
+CRAWLER_SITEMAP_MAX_URLS = 100000
+
+# HTML parser backend used to extract titles and links: 'lxml' or 'html.parser'
+CRAWLER_HTML_PARSER = 'lxml'
+
+# Seconds between two writes of the progress counters of a running execution
+CRAWLER_PROGRESS_INTERVAL = 2.0
+
+# Crawlers publish execution changes and saved pages to Redis pub/sub, which the
+# /api/events/ Server-Sent Events endpoints stream to clients. Streams are closed
+# after CRAWLER_EVENTS_MAX_AGE seconds and reopened by the browser.
+CRAWLER_PUBLISH_EVENTS = True
+CRAWLER_EVENTS_MAX_AGE = 300
+
+# Seconds the cursor of the GraphQL delta query lags behind the current time
+CRAWLER_GRAPH_DELTA_OVERLAP = 5
+
+# Keep a snapshot of the pages and links seen by every execution, in tables
+# partitioned by ranges of execution IDs on PostgreSQL. The partitions are only
+# created while snapshots are enabled.
+CRAWLER_SNAPSHOTS = True
+
+# Retention of executions, applied hourly by the prune_old_executions task or by
+# `python manage.py prune_executions`. Per website, the CRAWLER_RETENTION_KEEP_LAST
+# most recent executions, all executions of the last CRAWLER_RETENTION_KEEP_WITHIN
+# days and, if CRAWLER_RETENTION_KEEP_DAILY, the last execution of every older day
+# are kept. Executions older than CRAWLER_RETENTION_MAX_AGE days are pruned, and so
+# are the pages they own that were not crawled since then. None disables a rule.
+CRAWLER_RETENTION_KEEP_LAST = 100
+CRAWLER_RETENTION_KEEP_WITHIN = 7
+CRAWLER_RETENTION_KEEP_DAILY = True
+CRAWLER_RETENTION_MAX_AGE = 90
+# Executions deleted per transaction and pages moved or deleted per statement
+CRAWLER_RETENTION_BATCH_SIZE = 100
+CRAWLER_RETENTION_PAGE_BATCH_SIZE = 1000
+
+# Website records and executions are deleted in the background by the delete_records
+# task: pages and links deleted per statement, and seconds between retries while
+# the website is being crawled
+CRAWLER_DELETION_BATCH_SIZE = 1000
+CRAWLER_DELETION_LINK_BATCH_SIZE = 10000
+CRAWLER_DELETION_RETRY_DELAY = 10
+
+# Seconds between checkpoints of the frontier of a running execution (0 disables
+# them). A running execution whose checkpoint is older than
+# CRAWLER_CHECKPOINT_STALE_AFTER seconds is resumed by the next crawl of its website.
+# An execution is resumed at most CRAWLER_MAX_RESUMES times, after which it is
+# left failed and the next crawl starts a new execution.
+CRAWLER_CHECKPOINT_INTERVAL = 60
+CRAWLER_CHECKPOINT_STALE_AFTER = 180
+CRAWLER_MAX_RESUMES = 3
+
+# Write-behind persistence: pages per batch, seconds between flushes and
+# number of pages waiting for the writer before fetch workers are blocked
+CRAWLER_WRITE_BATCH_SIZE = 100
+CRAWLER_WRITE_FLUSH_INTERVAL = 2.0
+CRAWLER_WRITE_QUEUE_SIZE = 1000
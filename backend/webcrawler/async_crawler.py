@@ -0,0 +1,188 @@
+import asyncio
+import time
+from urllib.parse import urlparse
+
+import aiohttp
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .crawler import Crawler
+from .extraction import compute_content_hash
+from .http_client import AsyncHttpClient
+from .writer import PageWriter
+
+
+class AsyncCrawler(Crawler):
+    def __init__(self, website_record, concurrency=None):
+        """
+        Initialize the AsyncCrawler object.
+
+        Args:
+            website_record: The website record object representing the website to crawl.
+            concurrency: The maximum number of pages fetched at the same time.
+                Defaults to the CRAWLER_ASYNC_CONCURRENCY setting.
+        """
+        super().__init__(
+            website_record,
+            concurrency=concurrency or getattr(settings, 'CRAWLER_ASYNC_CONCURRENCY', 100),
+        )
+
+    async def crawl(self, start_url, ex_id):
+        """
+        Perform the crawling process starting from the specified URL.
+
+        All fetches share one event loop and one pooled aiohttp session. A bounded
+        semaphore keeps at most `concurrency` pages in flight, database writes
+        are handed over to the write-behind PageWriter. No more pages are
+        dispatched once the crawl budget is exhausted. Checkpoints are
+        handled as in Crawler.crawl.
+
+        Args:
+            start_url: The starting URL for the crawling process.
+            ex_id: The ID of the execution associated with the crawling process.
+        """
+        execution = await sync_to_async(self.get_execution)(ex_id)
+        await sync_to_async(execution.save)()
+        await sync_to_async(self.load_validators)()
+        if not await sync_to_async(self.restore_checkpoint)(ex_id):
+            self.frontier.push(start_url)
+            if self.website_record.use_sitemaps:
+                await sync_to_async(self.seed_from_sitemaps)(start_url, execution)
+
+        semaphore = asyncio.BoundedSemaphore(self.concurrency)
+
+        self.writer = PageWriter(execution)
+        with self.writer:
+            async with AsyncHttpClient(self.concurrency) as self.client:
+                in_flight = {}
+                while self.frontier or in_flight:
+                    while self.frontier and not semaphore.locked() and not self.budget.is_exhausted():
+                        url, depth = self.frontier.pop()
+                        self.budget.add_page()
+                        await semaphore.acquire()
+                        task = asyncio.create_task(self.process_url_bounded(semaphore, url, execution))
+                        in_flight[task] = (url, depth)
+
+                    if not in_flight:
+                        break
+
+                    done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        _, depth = in_flight.pop(task)
+                        self.enqueue_links(task.result(), depth + 1)
+
+                    if self.is_progress_due():
+                        await sync_to_async(self.report_progress)(execution)
+                    if self.is_checkpoint_due():
+                        await sync_to_async(self.save_checkpoint)(execution, list(in_flight.values()))
+
+    async def process_url_bounded(self, semaphore, url, execution):
+        """
+        Process the specified URL and release its semaphore slot afterwards.
+
+        Args:
+            semaphore: The semaphore slot acquired for this URL.
+            url: The URL to process.
+            execution: The Execution object associated with the crawling process.
+
+        Returns:
+            A set of valid links extracted from the HTML of the URL.
+        """
+        try:
+            return await self.process_url(url, execution)
+        finally:
+            semaphore.release()
+
+    async def process_url(self, url, execution):
+        """
+        Process the specified URL during the crawling process.
+
+        Unchanged, rejected and failed pages are handled as in Crawler.process_url.
+
+        Args:
+            url: The URL to process.
+            execution: The Execution object associated with the crawling process.
+
+        Returns:
+            A set of valid links extracted from the HTML of the URL.
+        """
+        try:
+            response, body = await self.get_response(url)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return self.process_failed_page(url, e)
+        if self.get_status_code(response) == 304:
+            return await sync_to_async(self.process_unchanged_page)(url, execution, {'status_code': 304})
+
+        if body is None:
+            return await sync_to_async(self.process_rejected_page)(url, response, execution)
+
+        self.budget.add_bytes(len(body))
+        content_hash = compute_content_hash(body)
+        if self.is_unchanged(url, content_hash):
+            return await sync_to_async(self.process_unchanged_page)(url, execution, {})
+
+        html = self.decode_body(response, body)
+        title, links = self.extract_page(url, html)
+        with self.lock:
+            self.num_crawled += 1
+            self.num_reprocessed += 1
+
+        await sync_to_async(self.save_crawled_page)(url, response, title, execution, links, content_hash)
+
+        return links
+
+    async def get_response(self, url):
+        """
+        Send an HTTP GET request to the specified URL and return the response object.
+
+        The body is read before the connection is released, unless it is
+        not HTML or too large. The request waits for a free slot of the
+        host's adaptive concurrency limit.
+
+        Args:
+            url: The URL to send the request to.
+
+        Returns:
+            A tuple of the aiohttp response object and the raw body, which is
+            None if the response was rejected.
+        """
+        host = urlparse(url).netloc
+        await self.throttle.acquire_async(host)
+        start = time.monotonic()
+        status_code = retry_after = None
+        try:
+            async with self.client.get(url, headers=self.get_conditional_headers(url)) as response:
+                body = await self.client.read_body(response)
+            status_code = self.get_status_code(response)
+            retry_after = response.headers.get('Retry-After')
+            return response, body
+        finally:
+            self.throttle.release(host, time.monotonic() - start, status_code, retry_after)
+
+    def get_status_code(self, response):
+        """
+        Return the HTTP status code of the aiohttp response object.
+
+        Args:
+            response: The response object.
+
+        Returns:
+            The status code.
+        """
+        return response.status
+
+    def decode_body(self, response, body):
+        """
+        Decode the raw body of the aiohttp response object.
+
+        Args:
+            response: The response object.
+            body: The raw body.
+
+        Returns:
+            The body as a string.
+        """
+        try:
+            return body.decode(response.get_encoding(), errors='replace')
+        except (LookupError, RuntimeError):
+            return body.decode('utf-8', errors='replace')
@@ -0,0 +1,111 @@
+import threading
+import time
+
+
+class CrawlBudget:
+    """
+    Limits of a single execution, taken from the budget fields of a WebsiteRecord.
+
+    A limit set to None is unbounded. Once a limit is reached no more pages
+    are dispatched and `exhausted` names the limit that ended the crawl.
+    """
+
+    def __init__(self, website_record):
+        """
+        Initialize the CrawlBudget object and start its wall clock.
+
+        Args:
+            website_record: The WebsiteRecord object with the budget fields.
+        """
+        self.max_pages = website_record.max_pages
+        self.max_depth = website_record.max_depth
+        self.max_bytes = website_record.max_bytes
+        self.max_duration = website_record.max_duration
+        self.num_pages = 0
+        self.num_bytes = 0
+        self.started_at = time.monotonic()
+        self.exhausted = None
+        self.lock = threading.Lock()
+
+    def allows_depth(self, depth):
+        """
+        Check if pages at the specified depth may be crawled.
+
+        Args:
+            depth: The number of links followed from the start URL.
+
+        Returns:
+            True if the depth is within the budget, False otherwise.
+        """
+        return self.max_depth is None or depth <= self.max_depth
+
+    def add_page(self):
+        """
+        Count a dispatched page.
+        """
+        with self.lock:
+            self.num_pages += 1
+
+    def add_bytes(self, num_bytes):
+        """
+        Count downloaded bytes.
+
+        Args:
+            num_bytes: The size of a downloaded response body.
+        """
+        with self.lock:
+            self.num_bytes += num_bytes
+
+    def stop(self, reason):
+        """
+        End the crawl early, e.g. when it was superseded by a newer execution.
+
+        Args:
+            reason: The value stored in `exhausted`.
+        """
+        with self.lock:
+            if self.exhausted is None:
+                self.exhausted = reason
+
+    def is_exhausted(self):
+        """
+        Check the page, byte and wall-clock limits.
+
+        Returns:
+            True if one of the limits has been reached, False otherwise.
+        """
+        with self.lock:
+            if self.exhausted is None:
+                if self.max_pages is not None and self.num_pages >= self.max_pages:
+                    self.exhausted = 'max_pages'
+                elif self.max_bytes is not None and self.num_bytes >= self.max_bytes:
+                    self.exhausted = 'max_bytes'
+                elif self.max_duration is not None and time.monotonic() - self.started_at >= self.max_duration:
+                    self.exhausted = 'max_duration'
+            return self.exhausted is not None
+
+    def snapshot(self):
+        """
+        Return the usage of the budget for a checkpoint.
+
+        Returns:
+            A dict of the page and byte counters and the elapsed seconds.
+        """
+        with self.lock:
+            return {
+                'num_pages': self.num_pages,
+                'num_bytes': self.num_bytes,
+                'elapsed': time.monotonic() - self.started_at,
+            }
+
+    def restore(self, snapshot):
+        """
+        Continue counting from the usage stored in a checkpoint.
+
+        Args:
+            snapshot: A dict returned by `snapshot`.
+        """
+        with self.lock:
+            self.num_pages = snapshot['num_pages']
+            self.num_bytes = snapshot['num_bytes']
+            self.started_at = time.monotonic() - snapshot['elapsed']
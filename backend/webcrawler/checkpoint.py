@@ -0,0 +1,71 @@
+import json
+import time
+import zlib
+
+from api.models import CrawlCheckpoint
+
+
+def encode_checkpoint(state):
+    """
+    Serialize the state of a crawl compactly.
+
+    Args:
+        state: A JSON-serializable dict.
+
+    Returns:
+        The zlib-compressed JSON bytes.
+    """
+    return zlib.compress(json.dumps(state, separators=(',', ':')).encode(), 6)
+
+
+def decode_checkpoint(data):
+    """
+    Deserialize the state of a crawl.
+
+    Args:
+        data: Bytes returned by `encode_checkpoint`.
+
+    Returns:
+        The state dict.
+    """
+    return json.loads(zlib.decompress(bytes(data)))
+
+
+def save_checkpoint(execution, state, started_at):
+    """
+    Store the checkpoint of an execution, replacing the previous one.
+
+    Args:
+        execution: The Execution object associated with the crawling process.
+        state: The state dict, with the frontier snapshot under 'frontier'.
+        started_at: The time.monotonic() value at which the checkpoint was started.
+
+    Returns:
+        The saved CrawlCheckpoint object.
+    """
+    data = encode_checkpoint(state)
+    checkpoint, _ = CrawlCheckpoint.objects.update_or_create(
+        execution=execution,
+        defaults={
+            'data': data,
+            'num_queued': len(state['frontier']['queue']),
+            'num_seen': len(state['frontier']['seen']),
+            'size': len(data),
+            'duration_ms': round((time.monotonic() - started_at) * 1000),
+        },
+    )
+    return checkpoint
+
+
+def load_checkpoint(execution_id):
+    """
+    Load the last checkpoint of an execution.
+
+    Args:
+        execution_id: The ID of the execution.
+
+    Returns:
+        The state dict, or None if the execution has no checkpoint.
+    """
+    data = CrawlCheckpoint.objects.filter(execution_id=execution_id).values_list('data', flat=True).first()
+    return decode_checkpoint(data) if data is not None else None
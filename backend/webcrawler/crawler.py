@@ -1,57 +1,271 @@
-import requests
-from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
-import re
-from collections import deque
 import concurrent.futures
+import logging
+import threading
+import time
 
+import requests
+from django.conf import settings
+from django.utils import timezone
 from django.utils.datetime_safe import datetime
 from django.utils.timezone import make_aware
 
-from api.models import CrawledPage, Execution
+from api.models import CrawledPage, Execution, Link
+from .budget import CrawlBudget
+from .checkpoint import load_checkpoint, save_checkpoint
+from .events import publish_execution
+from .extraction import compute_content_hash, extract_title_and_links
+from .frontier import Frontier
+from .http_client import HttpClient
+from .normalization import compute_url_hash
+from .sitemap import iter_site_urls
+from .throttle import HostConcurrencyController
+from .writer import PageWriter
+
+logger = logging.getLogger(__name__)
 
 
 class Crawler:
-    def __init__(self, website_record):
+    def __init__(self, website_record, concurrency=None):
         """
         Initialize the Crawler object.
         
         Args:
             website_record: The website record object representing the website to crawl.
+            concurrency: The maximum number of pages fetched at the same time.
+                Defaults to the CRAWLER_CONCURRENCY setting.
         """
         self.website_record = website_record
-        self.visited_urls = set()
+        self.concurrency = concurrency or getattr(settings, 'CRAWLER_CONCURRENCY', 8)
+        self.frontier = Frontier(
+            website_record.boundary_regexp,
+            skipped_extensions=getattr(settings, 'CRAWLER_SKIPPED_EXTENSIONS', ()),
+        )
         self.num_crawled = 0
+        self.num_skipped = 0
+        self.num_reprocessed = 0
+        self.num_failed = 0
+        self.lock = threading.Lock()
+        self.client = None
+        self.writer = None
+        self.throttle = HostConcurrencyController(self.concurrency)
+        self.validators = {}
+        self.budget = CrawlBudget(website_record)
+        self.checkpoint_interval = getattr(settings, 'CRAWLER_CHECKPOINT_INTERVAL', 60)
+        self.next_checkpoint = time.monotonic() + self.checkpoint_interval
+        self.checkpoint_stats = {'checkpoints': 0, 'duration_ms': 0, 'size': 0}
+        self.progress_interval = getattr(settings, 'CRAWLER_PROGRESS_INTERVAL', 2.0)
+        self.last_progress = (time.monotonic(), 0)
 
     def crawl(self, start_url, ex_id):
         """
         Perform the crawling process starting from the specified URL.
+
+        Up to `concurrency` pages are fetched at the same time. Links of the
+        finished pages are drained into the frontier as soon as they complete.
+        Pages are saved by a write-behind PageWriter, which is flushed before
+        this method returns. No more pages are dispatched once the crawl budget
+        is exhausted. Progress counters are written to the execution every
+        CRAWLER_PROGRESS_INTERVAL seconds. The crawl state is checkpointed periodically, and an
+        execution with a checkpoint continues from it instead of the start URL.
         
         Args:
             start_url: The starting URL for the crawling process.
             ex_id: The ID of the execution associated with the crawling process.
         """
-        queue = deque([start_url])
         execution = self.get_execution(ex_id)
         execution.save()
+        self.load_validators()
+        if not self.restore_checkpoint(ex_id):
+            self.frontier.push(start_url)
+            if self.website_record.use_sitemaps:
+                self.seed_from_sitemaps(start_url, execution)
+
+        self.client = HttpClient(self.concurrency)
+        self.writer = PageWriter(execution)
+        with self.writer, self.client, concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            in_flight = {}
+            while self.frontier or in_flight:
+                while self.frontier and len(in_flight) < self.concurrency and not self.budget.is_exhausted():
+                    url, depth = self.frontier.pop()
+                    self.budget.add_page()
+                    in_flight[executor.submit(self.process_url, url, execution)] = (url, depth)
+
+                if not in_flight:
+                    break
+
+                done, _ = concurrent.futures.wait(
+                    in_flight, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    _, depth = in_flight.pop(future)
+                    self.enqueue_links(future.result(), depth + 1)
+
+                if self.is_progress_due():
+                    self.report_progress(execution)
+                if self.is_checkpoint_due():
+                    self.save_checkpoint(execution, list(in_flight.values()))
+
+    def enqueue_links(self, links, depth):
+        """
+        Queue the links found on a page unless they are deeper than the budget allows.
+        
+        Args:
+            links: The set of links to queue.
+            depth: The crawl depth of the links.
+        """
+        if self.budget.allows_depth(depth):
+            self.frontier.extend(links, depth)
+
+    def seed_from_sitemaps(self, start_url, execution):
+        """
+        Load the pages listed in the site's sitemaps into the frontier.
+
+        Pages whose <lastmod> is older than the start of the previous
+        completed execution are left out. Sitemap entries are queued at depth 1.
+        
+        Args:
+            start_url: The starting URL for the crawling process.
+            execution: The Execution object associated with the crawling process.
+        """
+        modified_since = Execution.objects.filter(
+            website_record=self.website_record,
+            status='completed',
+        ).exclude(id=execution.id).order_by('-start_time').values_list('start_time', flat=True).first()
 
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            while queue:
-                url = queue.popleft()
+        batch = []
+        with HttpClient(1) as client:
+            for url in iter_site_urls(client, start_url, modified_since):
+                batch.append(url)
+                if len(batch) >= 1000:
+                    self.enqueue_links(batch, 1)
+                    batch = []
+        self.enqueue_links(batch, 1)
 
-                if url in self.visited_urls:
-                    continue
+    def is_checkpoint_due(self):
+        """
+        Check if CRAWLER_CHECKPOINT_INTERVAL seconds have passed since the last checkpoint.
+        
+        Returns:
+            True if a checkpoint should be saved, False otherwise.
+        """
+        return bool(self.checkpoint_interval) and time.monotonic() >= self.next_checkpoint
+
+    def save_checkpoint(self, execution, in_flight):
+        """
+        Save the frontier, counters and budget usage of the execution.
+
+        Queued pages are saved first, so the checkpoint never refers to pages
+        that were crawled but lost. Pages still in flight are queued again on resume.
+        
+        Args:
+            execution: The Execution object associated with the crawling process.
+            in_flight: (url, depth) tuples of the pages being fetched.
+        """
+        started_at = time.monotonic()
+        self.writer.sync()
+        budget = self.budget.snapshot()
+        budget['num_pages'] -= len(in_flight)
+        with self.lock:
+            state = {
+                'frontier': self.frontier.snapshot(in_flight),
+                'budget': budget,
+                'num_crawled': self.num_crawled,
+                'num_skipped': self.num_skipped,
+                'num_reprocessed': self.num_reprocessed,
+                'num_failed': self.num_failed,
+            }
+        checkpoint = save_checkpoint(execution, state, started_at)
 
-                self.visited_urls.add(url)
+        self.checkpoint_stats['checkpoints'] += 1
+        self.checkpoint_stats['duration_ms'] += checkpoint.duration_ms
+        self.checkpoint_stats['size'] = checkpoint.size
+        self.next_checkpoint = time.monotonic() + self.checkpoint_interval
 
-                future = executor.submit(self.process_url, url, execution)
-                links = future.result()
+    def restore_checkpoint(self, execution_id):
+        """
+        Restore the state of an interrupted execution from its last checkpoint.
+        
+        Args:
+            execution_id: The ID of the execution.
+        
+        Returns:
+            True if a checkpoint was restored, False if the execution has none.
+        """
+        state = load_checkpoint(execution_id)
+        if state is None:
+            return False
 
-                self.enqueue_valid_links(links, queue)
+        self.frontier.restore(state['frontier'])
+        self.budget.restore(state['budget'])
+        self.num_crawled = state['num_crawled']
+        self.num_skipped = state['num_skipped']
+        self.num_reprocessed = state['num_reprocessed']
+        self.num_failed = state.get('num_failed', 0)
+        return True
+
+    def is_progress_due(self):
+        """
+        Check if CRAWLER_PROGRESS_INTERVAL seconds have passed since progress was last reported.
+        
+        Returns:
+            True if the progress should be reported, False otherwise.
+        """
+        return time.monotonic() - self.last_progress[0] >= self.progress_interval
+
+    def get_progress(self, final=False):
+        """
+        Return the progress counters of the execution.
+
+        The crawl rate is measured since the previous call, or over the whole
+        crawl for the final report.
+        
+        Args:
+            final: True for the report of a finished crawl.
+        
+        Returns:
+            A dict of Execution field values.
+        """
+        now = time.monotonic()
+        last_time, last_crawled = self.last_progress
+        with self.lock:
+            progress = {
+                'num_sites_crawled': self.num_crawled,
+                'num_pages_skipped': self.num_skipped,
+                'num_pages_reprocessed': self.num_reprocessed,
+                'num_pages_failed': self.num_failed,
+            }
+        progress['num_pages_queued'] = len(self.frontier)
+        progress['num_bytes'] = self.budget.num_bytes
+        if final:
+            elapsed = now - self.budget.started_at
+            crawled = progress['num_sites_crawled']
+        else:
+            elapsed = now - last_time
+            crawled = progress['num_sites_crawled'] - last_crawled
+        progress['pages_per_second'] = round(crawled / elapsed, 2) if elapsed > 0 else 0.0
+        self.last_progress = (now, progress['num_sites_crawled'])
+        return progress
+
+    def report_progress(self, execution):
+        """
+        Write the progress counters to the execution row with a single UPDATE and publish them.
+        
+        Args:
+            execution: The Execution object associated with the crawling process.
+        """
+        progress = self.get_progress()
+        progress['progress_updated_at'] = timezone.now()
+        Execution.objects.filter(id=execution.id).update(**progress)
+        for name, value in progress.items():
+            setattr(execution, name, value)
+        publish_execution(execution)
 
     def get_execution(self, execution_id):
         """
-        Get the execution object associated with the specified ID.
+        Get the execution object associated with the specified ID and mark it as running.
+
+        A resumed execution keeps its start time.
         
         Args:
             execution_id: The ID of the execution.
@@ -64,16 +278,149 @@ class Crawler:
         except Execution.DoesNotExist:
             return None
 
+        if execution.status == 'pending':
+            execution.start_time = make_aware(datetime.now())
         execution.status = 'running'
-        execution.start_time = make_aware(datetime.now())
         execution.end_time = None
         execution.num_sites_crawled = self.num_crawled
 
         return execution
 
+    def load_validators(self, urls=None):
+        """
+        Load the ETag, Last-Modified and content hash validators stored by
+        previous crawls of the website.
+        
+        Args:
+            urls: Only load the validators of these URLs. Defaults to all pages of the website.
+        """
+        pages = CrawledPage.objects.filter(
+            execution__website_record=self.website_record,
+        )
+        if urls is not None:
+            pages = pages.filter(url_hash__in=[compute_url_hash(url) for url in urls])
+        pages = pages.exclude(
+            etag=None, last_modified=None, content_hash=None,
+        ).values_list('url', 'etag', 'last_modified', 'content_hash')
+        self.validators = {url: validators for url, *validators in pages}
+
+    def get_conditional_headers(self, url):
+        """
+        Build the conditional request headers for the specified URL.
+        
+        Args:
+            url: The URL to be requested.
+        
+        Returns:
+            A dict with the If-None-Match and If-Modified-Since headers
+            of the validators known for the URL.
+        """
+        etag, last_modified, _ = self.validators.get(url, (None, None, None))
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def get_stored_links(self, url):
+        """
+        Return the outgoing links stored for the specified URL by a previous crawl.
+        
+        Args:
+            url: The URL of the page.
+        
+        Returns:
+            A set of the linked URLs.
+        """
+        return set(
+            Link.objects.filter(from_page__url_hash=compute_url_hash(url)).values_list('to_page__url', flat=True)
+        )
+
+    def is_unchanged(self, url, content_hash):
+        """
+        Check if the content of the specified URL is the same as at the previous crawl.
+        
+        Args:
+            url: The URL of the page.
+            content_hash: The hash of the current response body.
+        
+        Returns:
+            True if the stored content hash matches, False otherwise.
+        """
+        _, _, stored_hash = self.validators.get(url, (None, None, None))
+        return stored_hash == content_hash
+
+    def process_unchanged_page(self, url, execution, fields):
+        """
+        Record an unchanged page without parsing it.
+
+        The links stored by the previous crawl are followed and only the
+        specified fields and the crawl time of the page are updated.
+        
+        Args:
+            url: The URL of the page.
+            execution: The Execution object associated with the crawling process.
+            fields: Dict of the CrawledPage field values to store.
+        
+        Returns:
+            The set of links stored for the page.
+        """
+        links = self.get_stored_links(url)
+        with self.lock:
+            self.num_crawled += 1
+            self.num_skipped += 1
+        self.writer.touch(url, fields)
+        return links
+
+    def process_rejected_page(self, url, response, execution):
+        """
+        Record a page whose body was not downloaded because it is not HTML or too large.
+        
+        Args:
+            url: The URL of the page.
+            response: The response object for the page.
+            execution: The Execution object associated with the crawling process.
+        
+        Returns:
+            An empty set, as rejected pages have no links.
+        """
+        status_code = self.get_status_code(response)
+        with self.lock:
+            self.num_crawled += 1
+            if status_code >= 400:
+                self.num_failed += 1
+        self.writer.put(url, {'status_code': status_code, 'title': None}, set())
+        return set()
+
+    def process_failed_page(self, url, error):
+        """
+        Record a page that could not be fetched, e.g. because the request timed out.
+
+        The page keeps the data stored by previous crawls and is counted as
+        failed, and the crawl goes on.
+        
+        Args:
+            url: The URL of the page.
+            error: The exception raised by the request.
+        
+        Returns:
+            An empty set, as no links were found.
+        """
+        logger.warning('Could not fetch %s: %r', url, error)
+        with self.lock:
+            self.num_failed += 1
+        return set()
+
     def process_url(self, url, execution):
         """
         Process the specified URL during the crawling process.
+
+        When the server answers 304 Not Modified or the body hashes to the
+        same value as at the previous crawl, the page is not parsed and
+        the links stored by the previous crawl are followed instead.
+        Non-HTML and oversized responses are recorded without their body.
+        Network errors and timeouts only fail the page, not the crawl.
         
         Args:
             url: The URL to process.
@@ -82,48 +429,120 @@ class Crawler:
         Returns:
             A set of valid links extracted from the HTML of the URL.
         """
-        response = self.get_response(url)
-        html = response.text
-        links = self.extract_links(url, html)
-        self.num_crawled += 1
+        try:
+            response, body = self.get_response(url)
+        except requests.RequestException as e:
+            return self.process_failed_page(url, e)
+        if self.get_status_code(response) == 304:
+            return self.process_unchanged_page(url, execution, {'status_code': 304})
+
+        if body is None:
+            return self.process_rejected_page(url, response, execution)
 
-        crawled_page = self.save_crawled_page(url, response, html, execution, links)
+        self.budget.add_bytes(len(body))
+        content_hash = compute_content_hash(body)
+        if self.is_unchanged(url, content_hash):
+            return self.process_unchanged_page(url, execution, {})
+
+        html = self.decode_body(response, body)
+        title, links = self.extract_page(url, html)
+        with self.lock:
+            self.num_crawled += 1
+            self.num_reprocessed += 1
+
+        self.save_crawled_page(url, response, title, execution, links, content_hash)
 
         return links
 
     def get_response(self, url):
         """
         Send an HTTP GET request to the specified URL and return the response object.
+
+        The request goes through the execution's pooled keep-alive client and is
+        conditional when validators of a previous crawl are known. It waits for a
+        free slot of the host's adaptive concurrency limit. The response is
+        streamed, so non-HTML and oversized bodies are never downloaded in full.
         
         Args:
             url: The URL to send the request to.
         
         Returns:
-            The response object.
+            A tuple of the response object and the raw body, which is None
+            if the response was rejected.
+        """
+        host = urlparse(url).netloc
+        self.throttle.acquire(host)
+        start = time.monotonic()
+        status_code = retry_after = None
+        try:
+            with self.client.get(url, headers=self.get_conditional_headers(url), stream=True) as response:
+                status_code = self.get_status_code(response)
+                retry_after = response.headers.get('Retry-After')
+                body = self.client.read_body(response)
+            return response, body
+        finally:
+            self.throttle.release(host, time.monotonic() - start, status_code, retry_after)
+
+    def get_status_code(self, response):
+        """
+        Return the HTTP status code of the response object.
+        
+        Args:
+            response: The response object.
+        
+        Returns:
+            The status code.
         """
-        response = requests.get(url)
-        return response
+        return response.status_code
 
-    def extract_links(self, url, html):
+    def decode_body(self, response, body):
         """
-        Extract links from the HTML of the specified URL.
+        Decode the raw body of the response object.
+        
+        Args:
+            response: The response object.
+            body: The raw body.
+        
+        Returns:
+            The body as a string.
+        """
+        try:
+            return body.decode(response.encoding or 'utf-8', errors='replace')
+        except LookupError:
+            return body.decode('utf-8', errors='replace')
+
+    def http_stats(self):
+        """
+        Return the connection pool counters of the HTTP client.
+        
+        Returns:
+            A dict with the number of requests, pool hits and pool misses.
+        """
+        if self.client is None:
+            return {}
+        return self.client.stats()
+
+    def extract_page(self, url, html):
+        """
+        Extract the title and the links from the HTML of the specified URL.
+
+        The HTML is parsed only once, see extract_title_and_links.
         
         Args:
             url: The URL from which to extract links.
             html: The HTML content of the URL.
         
         Returns:
-            A set of valid links extracted from the HTML.
+            A tuple of the page title and the set of valid links extracted from the HTML.
         """
-        soup = BeautifulSoup(html, 'html.parser')
+        title, hrefs = extract_title_and_links(html)
         links = set()
-        for a_tag in soup.find_all('a', href=True):
-            link = a_tag['href']
+        for link in hrefs:
             absolute_link = urljoin(url, link)
             normalized_link = self.normalize_link(absolute_link)
             if normalized_link:
                 links.add(normalized_link)
-        return links
+        return title, links
 
     def normalize_link(self, link):
         """
@@ -137,81 +556,31 @@ class Crawler:
         """
         parsed_link = urlparse(link)
         if parsed_link.scheme and parsed_link.netloc:
-            return parsed_link.geturl()
+            return parsed_link._replace(fragment='').geturl()
         return None
 
-    def save_crawled_page(self, url, response, html, execution, links):
+    def save_crawled_page(self, url, response, title, execution, links, content_hash):
         """
-        Save the crawled page information to the database.
+        Hand the crawled page information over to the write-behind writer.
+
+        Blocks while the writer's queue is full.
         
         Args:
             url: The URL of the crawled page.
             response: The response object for the page.
-            html: The HTML content of the page.
+            title: The title of the page.
             execution: The Execution object associated with the crawling process.
             links: The set of valid links extracted from the page.
-        
-        Returns:
-            The saved CrawledPage object.
-        """
-        crawl_time = datetime.now()
-        title = self.extract_title(html)
-
-        crawled_page, created = CrawledPage.objects.get_or_create(
-            url=url,
-            defaults={
-                'crawl_time': make_aware(crawl_time),
-                'title': title,
-                'execution': execution,
-            }
-        )
-
-        if not created:
-            crawled_page.crawl_time = make_aware(crawl_time)
-            crawled_page.title = title
-            crawled_page.execution = execution
-            crawled_page.save()
-
-        crawled_page.set_links(links, execution=execution)
-        crawled_page.save()
-
-        return crawled_page
-
-    def extract_title(self, html):
-        """
-        Extract the title from the HTML content.
-        
-        Args:
-            html: The HTML content.
-        
-        Returns:
-            The extracted title string.
-        """
-        soup = BeautifulSoup(html, 'html.parser')
-        title_tag = soup.find('title')
-        return title_tag.string if title_tag else ''
-
-    def enqueue_valid_links(self, links, queue):
-        """
-        Enqueue the valid links to the crawling queue.
-        
-        Args:
-            links: The set of links to enqueue.
-            queue: The crawling queue.
-        """
-        for link in links:
-            if self.is_valid_link(link):
-                queue.append(link)
-
-    def is_valid_link(self, link):
-        """
-        Check if the specified link is valid based on the website's boundary regular expression.
-        
-        Args:
-            link: The link to check.
-        
-        Returns:
-            True if the link is valid, False otherwise.
+            content_hash: The hash of the response body.
         """
-        boundary_regexp = self.website_record.boundary_regexp
-        return re.match(boundary_regexp, link) is not None
+        fields = {
+            'status_code': self.get_status_code(response),
+            'title': title,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'content_hash': content_hash,
+        }
+        if fields['status_code'] >= 400:
+            with self.lock:
+                self.num_failed += 1
+        self.writer.put(url, fields, links)
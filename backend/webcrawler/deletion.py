@@ -0,0 +1,143 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from django_celery_beat.models import PeriodicTask
+
+from api.models import (
+    CrawlCheckpoint, CrawledPage, DeletedPage, Deletion, Execution, Link, WebsiteRecord, delete_snapshots,
+)
+
+
+def mark_for_deletion(target):
+    """
+    Mark a website record or an execution as being deleted.
+
+    The record is hidden from the listings and no longer crawled, while the
+    delete_records task deletes it. A record already being deleted keeps
+    its running deletion.
+
+    Args:
+        target: The WebsiteRecord or Execution object to delete.
+
+    Returns:
+        The Deletion object tracking the progress.
+    """
+    if isinstance(target, WebsiteRecord):
+        kind, website_record_id = 'website_record', target.id
+    else:
+        kind, website_record_id = 'execution', target.website_record_id
+    with transaction.atomic():
+        deletion = Deletion.objects.filter(
+            target=kind, target_id=target.id, status__in=('pending', 'running'),
+        ).first()
+        if deletion is not None:
+            return deletion
+        if kind == 'website_record':
+            WebsiteRecord.objects.filter(id=target.id).update(deleting=True)
+            Execution.objects.filter(website_record_id=target.id).update(deleting=True)
+            PeriodicTask.objects.filter(name=f'crawl_website_{target.label}').delete()
+        else:
+            Execution.objects.filter(id=target.id).update(deleting=True)
+        return Deletion.objects.create(target=kind, target_id=target.id, website_record_id=website_record_id)
+
+
+def run_deletion(deletion, batch_size=None, link_batch_size=None):
+    """
+    Delete the target of a deletion, one execution after another.
+
+    The crawled pages of each execution are deleted in batches of batch_size,
+    after their links were deleted in batches of link_batch_size. Each batch
+    runs in its own short transaction with a single SQL statement, so neither
+    the database nor the worker has to hold millions of rows at once, and the
+    progress is written after every batch. The caller must hold the crawl
+    lock of the website, so that no crawl writes the pages meanwhile.
+
+    Args:
+        deletion: The Deletion object.
+        batch_size: The number of pages deleted per statement.
+            Defaults to the CRAWLER_DELETION_BATCH_SIZE setting.
+        link_batch_size: The number of links deleted per statement.
+            Defaults to the CRAWLER_DELETION_LINK_BATCH_SIZE setting.
+    """
+    batch_size = batch_size or getattr(settings, 'CRAWLER_DELETION_BATCH_SIZE', 1000)
+    link_batch_size = link_batch_size or getattr(settings, 'CRAWLER_DELETION_LINK_BATCH_SIZE', 10000)
+    if deletion.target == 'website_record':
+        executions = Execution.objects.filter(website_record_id=deletion.target_id)
+    else:
+        executions = Execution.objects.filter(id=deletion.target_id)
+    execution_ids = list(executions.order_by('id').values_list('id', flat=True))
+
+    deletion.status = 'running'
+    deletion.num_pages = CrawledPage.objects.filter(execution_id__in=execution_ids).count()
+    deletion.save(update_fields=['status', 'num_pages', 'updated_at'])
+
+    for execution_id in execution_ids:
+        delete_pages(deletion, execution_id, batch_size, link_batch_size)
+        with transaction.atomic():
+            delete_snapshots([execution_id])
+            CrawlCheckpoint.objects.filter(execution_id=execution_id).delete()
+            Execution.objects.filter(id=execution_id).delete()
+    if deletion.target == 'website_record':
+        WebsiteRecord.objects.filter(id=deletion.target_id).delete()
+    else:
+        WebsiteRecord.refresh_last_crawled(deletion.website_record_id)
+
+    deletion.refresh_from_db()
+    deletion.status = 'completed'
+    deletion.end_time = timezone.now()
+    deletion.save(update_fields=['status', 'end_time', 'updated_at'])
+
+
+def delete_pages(deletion, execution_id, batch_size, link_batch_size):
+    """
+    Delete the crawled pages of an execution and their links in batches.
+
+    The pages are recorded as deleted for the graph delta query.
+
+    Args:
+        deletion: The Deletion object whose progress is updated.
+        execution_id: The ID of the execution.
+        batch_size: The number of pages deleted per statement.
+        link_batch_size: The number of links deleted per statement.
+    """
+    quote = connection.ops.quote_name
+    page_table, link_table = quote(CrawledPage._meta.db_table), quote(Link._meta.db_table)
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT id FROM {page_table} WHERE execution_id = %s ORDER BY id LIMIT %s',
+                [execution_id, batch_size],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return
+        placeholders = ', '.join(['%s'] * len(ids))
+        num_links = 0
+        for column in ('from_page_id', 'to_page_id'):
+            while True:
+                with transaction.atomic(), connection.cursor() as cursor:
+                    cursor.execute(
+                        f'DELETE FROM {link_table} WHERE id IN ('
+                        f'SELECT id FROM {link_table} WHERE {column} IN ({placeholders}) LIMIT %s)',
+                        [*ids, link_batch_size],
+                    )
+                    num_links += cursor.rowcount
+                if cursor.rowcount < link_batch_size:
+                    break
+        with transaction.atomic(), connection.cursor() as cursor:
+            DeletedPage.record(CrawledPage.objects.filter(id__in=ids))
+            # Links another crawl added to these pages meanwhile
+            cursor.execute(
+                f'DELETE FROM {link_table} WHERE from_page_id IN ({placeholders}) OR to_page_id IN ({placeholders})',
+                ids + ids,
+            )
+            num_links += cursor.rowcount
+            cursor.execute(f'DELETE FROM {page_table} WHERE id IN ({placeholders})', ids)
+            num_pages = cursor.rowcount
+        Deletion.objects.filter(id=deletion.id).update(
+            num_pages_deleted=F('num_pages_deleted') + num_pages,
+            num_links_deleted=F('num_links_deleted') + num_links,
+            updated_at=timezone.now(),
+        )
@@ -0,0 +1,149 @@
+import concurrent.futures
+import time
+
+from django.conf import settings
+
+from .crawler import Crawler
+from .http_client import HttpClient
+from .redis_frontier import COUNTERS, RedisFrontier, SharedCrawlBudget, get_redis
+from .writer import PageWriter
+
+
+class DistributedCrawler(Crawler):
+    """
+    Crawler of one batch of a distributed execution.
+
+    The frontier, seen-set, budget and counters of the execution live in
+    Redis, so any number of Celery workers can crawl the same site. Every
+    crawl_batch task creates a DistributedCrawler, claims a batch of URLs,
+    fetches them with the threads engine and queues the links it finds.
+    """
+
+    def __init__(self, website_record, execution_id, concurrency=None):
+        """
+        Initialize the DistributedCrawler object.
+
+        Args:
+            website_record: The website record object representing the website to crawl.
+            execution_id: The ID of the execution shared by all workers.
+            concurrency: The maximum number of pages fetched at the same time by this worker.
+                Defaults to the CRAWLER_CONCURRENCY setting.
+        """
+        super().__init__(website_record, concurrency)
+        self.frontier = RedisFrontier(
+            get_redis(),
+            execution_id,
+            website_record.boundary_regexp,
+            skipped_extensions=getattr(settings, 'CRAWLER_SKIPPED_EXTENSIONS', ()),
+        )
+        self.budget = SharedCrawlBudget(website_record, self.frontier)
+        self.batch_size = getattr(settings, 'CRAWLER_BATCH_SIZE', 50)
+        self.max_tasks = getattr(settings, 'CRAWLER_MAX_BATCH_TASKS', 16)
+        self.claimed = []
+
+    def start(self, start_url, execution, lock_token=None):
+        """
+        Reset the shared frontier of the execution and seed it.
+
+        Args:
+            start_url: The starting URL for the crawling process.
+            execution: The Execution object associated with the crawling process.
+            lock_token: The token of the SiteCrawlLock held by the execution.
+
+        Returns:
+            A tuple of the number of batch tasks to start and a flag that is
+            True if there is nothing to crawl and the execution must be finished.
+        """
+        self.frontier.start(lock_token)
+        self.frontier.push(start_url)
+        if self.website_record.use_sitemaps:
+            self.seed_from_sitemaps(start_url, execution)
+        return self.frontier.schedule(batch_size=self.batch_size, max_tasks=self.max_tasks)
+
+    def crawl_batch(self, execution):
+        """
+        Claim a batch of URLs from the shared frontier and crawl them.
+
+        Args:
+            execution: The Execution object associated with the crawling process.
+        """
+        if not self.frontier or self.budget.is_exhausted():
+            return
+        self.claimed = self.frontier.claim(self.batch_size, self.budget.max_pages)
+        if not self.claimed:
+            return
+
+        self.load_validators([url for url, _ in self.claimed])
+        self.client = HttpClient(self.concurrency)
+        self.writer = PageWriter(execution)
+        with self.writer, self.client, concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            in_flight = {executor.submit(self.process_url, url, execution): depth for url, depth in self.claimed}
+            for future in concurrent.futures.as_completed(in_flight):
+                self.enqueue_links(future.result(), in_flight[future] + 1)
+
+    def finish_batch(self, execution, task_id):
+        """
+        Publish the counters of the batch and settle it in the shared frontier.
+
+        Like the threads engine, the budget is only checked while URLs are
+        still queued, so a crawl that ends with exactly the allowed number
+        of pages is completed rather than stopped by its budget.
+
+        Args:
+            execution: The Execution object associated with the crawling process.
+            task_id: The ID of the crawl_batch task.
+
+        Returns:
+            A tuple of the number of batch tasks to start and a flag that is
+            True for the single worker that must finish the execution.
+        """
+        self.frontier.add_counters(**{name: getattr(self, name) for name in COUNTERS})
+        if self.frontier:
+            self.budget.is_exhausted()
+        if self.is_progress_due():
+            self.report_progress(execution)
+        return self.frontier.schedule(self.claimed, task_id, self.batch_size, self.max_tasks)
+
+    def is_progress_due(self):
+        """
+        Check if no worker has reported the progress in the last CRAWLER_PROGRESS_INTERVAL seconds.
+
+        Returns:
+            True if this worker should report the progress, False otherwise.
+        """
+        return self.frontier.claim_progress_report(self.progress_interval)
+
+    def get_progress(self, final=False):
+        """
+        Return the progress counters of the whole execution.
+
+        The crawl rate is measured since the previous report of any worker,
+        or over the whole crawl for the final report.
+
+        Args:
+            final: True for the report of a finished crawl.
+
+        Returns:
+            A dict of Execution field values.
+        """
+        state = self.frontier.get_state()
+        now = time.time()
+        num_crawled = int(state.get('num_crawled', 0))
+        if final:
+            elapsed = now - float(state.get('started_at', now))
+            crawled = num_crawled
+        else:
+            elapsed = now - float(state.get('progress_time', state.get('started_at', now)))
+            crawled = num_crawled - int(state.get('progress_crawled', 0))
+            self.frontier.client.hset(
+                self.frontier.state_key, mapping={'progress_time': now, 'progress_crawled': num_crawled}
+            )
+        return {
+            'num_sites_crawled': num_crawled,
+            'num_pages_skipped': int(state.get('num_skipped', 0)),
+            'num_pages_reprocessed': int(state.get('num_reprocessed', 0)),
+            'num_pages_failed': int(state.get('num_failed', 0)),
+            'num_pages_queued': len(self.frontier),
+            'num_bytes': int(state.get('bytes', 0)),
+            'pages_per_second': round(crawled / elapsed, 2) if elapsed > 0 else 0.0,
+        }
@@ -0,0 +1,132 @@
+import json
+import logging
+import time
+
+import redis
+import redis.asyncio
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .redis_frontier import get_redis
+
+logger = logging.getLogger(__name__)
+
+EXECUTIONS_CHANNEL = 'crawler:events:executions'
+
+
+def get_website_channel(website_id):
+    """
+    Return the pub/sub channel of the execution and page events of a website.
+
+    Args:
+        website_id: The ID of the WebsiteRecord.
+
+    Returns:
+        The channel name.
+    """
+    return f'crawler:events:website:{website_id}'
+
+
+def publish(channels, event, data):
+    """
+    Publish an event to the specified Redis channels.
+
+    Events are best effort: a Redis error is logged and never fails the crawl.
+
+    Args:
+        channels: The channel names.
+        event: The event name, e.g. 'execution'.
+        data: The JSON-serializable payload.
+    """
+    if not getattr(settings, 'CRAWLER_PUBLISH_EVENTS', True):
+        return
+    message = f'{event} {json.dumps(data, cls=DjangoJSONEncoder)}'
+    try:
+        pipeline = get_redis().pipeline(transaction=False)
+        for channel in channels:
+            pipeline.publish(channel, message)
+        pipeline.execute()
+    except redis.RedisError as e:
+        logger.warning('Could not publish %s event: %s', event, e)
+
+
+def publish_execution(execution):
+    """
+    Publish the current state of an execution.
+
+    Args:
+        execution: The Execution object.
+    """
+    from api.serializers import ExecutionSerializer
+
+    publish(
+        [EXECUTIONS_CHANNEL, get_website_channel(execution.website_record_id)],
+        'execution',
+        ExecutionSerializer(execution).data,
+    )
+
+
+def publish_pages(execution, pages, links_by_url):
+    """
+    Publish a batch of persisted pages and their outgoing links.
+
+    The pages have the shape of the nodes of the GraphQL `nodes` query.
+
+    Args:
+        execution: The Execution object the pages belong to.
+        pages: Dict mapping each URL to its saved CrawledPage.
+        links_by_url: Dict mapping each URL to the links found on the page,
+            or None if the stored links were kept.
+    """
+    website_record = execution.website_record
+    publish(
+        [get_website_channel(website_record.id)],
+        'pages',
+        {
+            'owner': {'identifier': str(website_record.id), 'regexp': website_record.boundary_regexp},
+            'pages': [
+                {
+                    'url': url,
+                    'title': page.title,
+                    'crawlTime': str(page.crawl_time),
+                    'links': None if links_by_url.get(url) is None else [{'url': link} for link in links_by_url[url]],
+                }
+                for url, page in pages.items()
+            ],
+        },
+    )
+
+
+async def iter_events(channel, keepalive=15):
+    """
+    Stream the events of a Redis channel in the Server-Sent Events format.
+
+    A comment line is sent when no event arrived for `keepalive` seconds.
+    The stream ends after CRAWLER_EVENTS_MAX_AGE seconds. Browsers reconnect
+    by themselves, and subscriptions of disconnected clients do not pile up.
+
+    Args:
+        channel: The channel name.
+        keepalive: The number of seconds between keep-alive comments.
+
+    Yields:
+        The SSE messages.
+    """
+    client = redis.asyncio.Redis.from_url(
+        getattr(settings, 'CRAWLER_REDIS_URL', settings.CELERY_BROKER_URL), decode_responses=True
+    )
+    pubsub = client.pubsub()
+    deadline = time.monotonic() + getattr(settings, 'CRAWLER_EVENTS_MAX_AGE', 300)
+    try:
+        await pubsub.subscribe(channel)
+        yield 'retry: 3000\n\n'
+        while time.monotonic() < deadline:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=keepalive)
+            if message is None:
+                yield ': keep-alive\n\n'
+                continue
+            event, _, data = message['data'].partition(' ')
+            yield f'event: {event}\ndata: {data}\n\n'
+    finally:
+        await pubsub.reset()
+        await client.close()
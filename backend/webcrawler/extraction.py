@@ -0,0 +1,110 @@
+import hashlib
+
+from bs4 import BeautifulSoup
+from django.conf import settings
+from lxml import etree
+
+
+class LinkTitleTarget:
+    """
+    lxml parser target collecting the page title and the href of every <a> tag.
+
+    The parser streams events into the target, so no element tree is built.
+    """
+
+    def __init__(self):
+        self.title_parts = []
+        self.title_state = 'before'
+        self.hrefs = []
+
+    def start(self, tag, attrib):
+        if tag == 'a':
+            href = attrib.get('href')
+            if href is not None:
+                self.hrefs.append(href)
+        elif tag == 'title' and self.title_state == 'before':
+            self.title_state = 'inside'
+
+    def end(self, tag):
+        if tag == 'title' and self.title_state == 'inside':
+            self.title_state = 'after'
+
+    def data(self, data):
+        if self.title_state == 'inside':
+            self.title_parts.append(data)
+
+    def close(self):
+        return ''.join(self.title_parts), self.hrefs
+
+
+def extract_with_lxml(html):
+    """
+    Extract the title and link targets of an HTML document using lxml.
+
+    Args:
+        html: The HTML content.
+
+    Returns:
+        A tuple of the title string and the list of href values.
+    """
+    parser = etree.HTMLParser(target=LinkTitleTarget())
+    parser.feed(html)
+    return parser.close()
+
+
+def extract_with_soup(html):
+    """
+    Extract the title and link targets of an HTML document using BeautifulSoup.
+
+    Args:
+        html: The HTML content.
+
+    Returns:
+        A tuple of the title string and the list of href values.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    title_tag = soup.find('title')
+    title = title_tag.get_text() if title_tag else ''
+    hrefs = [a_tag['href'] for a_tag in soup.find_all('a', href=True)]
+    return title, hrefs
+
+
+EXTRACTION_BACKENDS = {
+    'lxml': extract_with_lxml,
+    'html.parser': extract_with_soup,
+}
+
+
+def extract_title_and_links(html, backend=None):
+    """
+    Extract the title and link targets of an HTML document in a single pass.
+
+    Documents the selected backend cannot parse are retried with
+    BeautifulSoup's html.parser.
+
+    Args:
+        html: The HTML content.
+        backend: The name of the parser backend. Defaults to the
+            CRAWLER_HTML_PARSER setting.
+
+    Returns:
+        A tuple of the title string and the list of href values.
+    """
+    backend = backend or getattr(settings, 'CRAWLER_HTML_PARSER', 'lxml')
+    try:
+        return EXTRACTION_BACKENDS[backend](html)
+    except (etree.LxmlError, ValueError):
+        return extract_with_soup(html)
+
+
+def compute_content_hash(content):
+    """
+    Compute a fast fingerprint of a response body.
+
+    Args:
+        content: The raw response body.
+
+    Returns:
+        The hex digest of the 128-bit BLAKE2b hash of the body.
+    """
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
@@ -0,0 +1,162 @@
+import re
+from collections import deque
+from functools import lru_cache
+from urllib.parse import urlparse
+
+from .normalization import compute_url_hash
+
+
+@lru_cache(maxsize=128)
+def compile_boundary(boundary_regexp):
+    """
+    Compile a website boundary regular expression, caching the result.
+
+    Args:
+        boundary_regexp: The boundary regular expression of a WebsiteRecord.
+
+    Returns:
+        The compiled pattern.
+    """
+    return re.compile(boundary_regexp)
+
+
+class Frontier:
+    """
+    BFS queue of URLs waiting to be crawled, each with its crawl depth.
+
+    URLs are deduplicated by the hash of their normalized URL when they are
+    added, so every page enters the queue at most once during an execution,
+    even if it is linked as e.g. both 'https://example.com' and
+    'https://example.com/'. The frontier is not thread-safe and is
+    meant to be driven by the crawl loop only.
+    """
+
+    def __init__(self, boundary_regexp, skipped_extensions=()):
+        """
+        Initialize the Frontier object.
+
+        Args:
+            boundary_regexp: The regular expression links must match to be queued.
+            skipped_extensions: File extensions of links that are never queued, e.g. '.pdf'.
+        """
+        self.boundary = compile_boundary(boundary_regexp)
+        self.skipped_extensions = tuple(extension.lower() for extension in skipped_extensions)
+        self.queue = deque()
+        self.seen = set()
+        self.num_added = 0
+        self.num_duplicates = 0
+        self.peak_size = 0
+
+    def __len__(self):
+        return len(self.queue)
+
+    def __bool__(self):
+        return bool(self.queue)
+
+    def is_valid_link(self, link):
+        """
+        Check if the specified link matches the boundary regular expression
+        and does not point to a file with a skipped extension.
+
+        Args:
+            link: The link to check.
+
+        Returns:
+            True if the link is valid, False otherwise.
+        """
+        if self.skipped_extensions and urlparse(link).path.lower().endswith(self.skipped_extensions):
+            return False
+        return self.boundary.match(link) is not None
+
+    def push(self, url, depth=0):
+        """
+        Queue the specified URL unless a URL of the same page has been seen before.
+
+        Args:
+            url: The URL to queue.
+            depth: The number of links followed from the start URL to reach it.
+
+        Returns:
+            True if the URL was queued, False if it was a duplicate.
+        """
+        url_hash = compute_url_hash(url)
+        if url_hash in self.seen:
+            self.num_duplicates += 1
+            return False
+
+        self.seen.add(url_hash)
+        self.queue.append((url, depth))
+        self.num_added += 1
+        self.peak_size = max(self.peak_size, len(self.queue))
+        return True
+
+    def extend(self, links, depth=0):
+        """
+        Queue all links that match the boundary and have not been seen before.
+
+        Args:
+            links: The links to queue.
+            depth: The crawl depth of the links.
+        """
+        for link in links:
+            if self.is_valid_link(link):
+                self.push(link, depth)
+
+    def pop(self):
+        """
+        Remove and return the next URL to crawl.
+
+        Returns:
+            A tuple of the URL and its depth.
+        """
+        return self.queue.popleft()
+
+    def snapshot(self, in_flight=()):
+        """
+        Return the state of the frontier for a checkpoint.
+
+        Args:
+            in_flight: (url, depth) tuples of dispatched pages that are not saved yet.
+                They are queued again when the checkpoint is restored.
+
+        Returns:
+            A JSON-serializable dict of the queue, the hashes of the seen URLs
+            and the counters.
+        """
+        return {
+            'queue': [*in_flight, *self.queue],
+            'seen': list(self.seen),
+            'num_added': self.num_added,
+            'num_duplicates': self.num_duplicates,
+            'peak_size': self.peak_size,
+        }
+
+    def restore(self, snapshot):
+        """
+        Restore the state of the frontier from a checkpoint.
+
+        Args:
+            snapshot: A dict returned by `snapshot`.
+        """
+        self.queue = deque((url, depth) for url, depth in snapshot['queue'])
+        self.seen = set(snapshot['seen'])
+        self.num_added = snapshot['num_added']
+        self.num_duplicates = snapshot['num_duplicates']
+        self.peak_size = snapshot['peak_size']
+
+    def stats(self):
+        """
+        Return the frontier counters.
+
+        Returns:
+            A dict with the current queue depth, peak size, number of
+            queued URLs and the duplicate hit rate of push calls.
+        """
+        attempts = self.num_added + self.num_duplicates
+        return {
+            'queue_depth': len(self.queue),
+            'peak_size': self.peak_size,
+            'queued': self.num_added,
+            'duplicates': self.num_duplicates,
+            'duplicate_rate': self.num_duplicates / attempts if attempts else 0.0,
+        }
@@ -0,0 +1,262 @@
+import threading
+
+import aiohttp
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.request import ACCEPT_ENCODING
+
+
+def get_default_headers():
+    """
+    Return the headers sent with every crawler request.
+
+    Returns:
+        A dict with the User-Agent and Accept-Encoding headers.
+    """
+    return {
+        'User-Agent': getattr(settings, 'CRAWLER_USER_AGENT', 'WebCrawler'),
+        'Accept-Encoding': ACCEPT_ENCODING,
+    }
+
+
+def is_acceptable(headers):
+    """
+    Check the Content-Type and Content-Length headers of a response before its body is read.
+
+    Responses without a Content-Type are accepted.
+
+    Args:
+        headers: The response headers.
+
+    Returns:
+        True if the body should be downloaded, False otherwise.
+    """
+    content_type = headers.get('Content-Type')
+    if content_type:
+        media_type = content_type.split(';', 1)[0].strip().lower()
+        if media_type not in getattr(settings, 'CRAWLER_ALLOWED_CONTENT_TYPES', ('text/html',)):
+            return False
+
+    content_length = headers.get('Content-Length')
+    if content_length and content_length.isdigit():
+        return int(content_length) <= get_max_body_size()
+    return True
+
+
+def get_max_body_size():
+    """
+    Return the maximum number of bytes downloaded per response.
+
+    Returns:
+        The CRAWLER_MAX_BODY_SIZE setting.
+    """
+    return getattr(settings, 'CRAWLER_MAX_BODY_SIZE', 10 * 1024 * 1024)
+
+
+class HttpClient:
+    """
+    Keep-alive HTTP client shared by all fetches of one execution.
+
+    Connections are pooled per host and the pools are sized to the crawl
+    concurrency, so every worker thread can hold its own connection.
+    """
+
+    def __init__(self, concurrency):
+        """
+        Initialize the HttpClient object.
+
+        Args:
+            concurrency: The number of pages fetched at the same time.
+        """
+        self.adapter = HTTPAdapter(
+            pool_connections=getattr(settings, 'CRAWLER_POOL_HOSTS', 10),
+            pool_maxsize=concurrency,
+        )
+        self.session = requests.Session()
+        self.session.headers.update(get_default_headers())
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+        self.timeout = getattr(settings, 'CRAWLER_REQUEST_TIMEOUT', 30)
+        self.closed_stats = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get(self, url, **kwargs):
+        """
+        Send an HTTP GET request through the pooled session.
+
+        Args:
+            url: The URL to send the request to.
+            **kwargs: Extra arguments passed to requests.
+
+        Returns:
+            The response object.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def read_body(self, response, chunk_size=64 * 1024):
+        """
+        Read the body of a streamed response unless it is not HTML or too large.
+
+        The download is aborted as soon as the body exceeds the size limit.
+
+        Args:
+            response: A response requested with stream=True.
+            chunk_size: The size of the read chunks.
+
+        Returns:
+            The raw body, or None if the response was rejected.
+        """
+        if not is_acceptable(response.headers):
+            return None
+
+        max_size = get_max_body_size()
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            size += len(chunk)
+            if size > max_size:
+                return None
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    def stats(self):
+        """
+        Return the connection pool counters.
+
+        Returns:
+            A dict with the number of requests, pool hits (reused connections)
+            and pool misses (newly opened connections).
+        """
+        if self.closed_stats is not None:
+            return self.closed_stats
+
+        pools = self.adapter.poolmanager.pools
+        num_requests = num_connections = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                num_requests += pool.num_requests
+                num_connections += pool.num_connections
+        return {
+            'requests': num_requests,
+            'pool_hits': max(num_requests - num_connections, 0),
+            'pool_misses': num_connections,
+        }
+
+    def close(self):
+        """
+        Close the session and all its pooled connections.
+
+        The pool counters are kept, as closing the session drops the pools.
+        """
+        self.closed_stats = self.stats()
+        self.session.close()
+
+
+class AsyncHttpClient:
+    """
+    aiohttp counterpart of HttpClient used by the asyncio crawl engine.
+    """
+
+    def __init__(self, concurrency):
+        """
+        Initialize the AsyncHttpClient object.
+
+        Args:
+            concurrency: The number of pages fetched at the same time.
+        """
+        self.concurrency = concurrency
+        self.session = None
+        self.lock = threading.Lock()
+        self.counters = {'requests': 0, 'pool_hits': 0, 'pool_misses': 0}
+
+    async def __aenter__(self):
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self.count('requests'))
+        trace_config.on_connection_reuseconn.append(self.count('pool_hits'))
+        trace_config.on_connection_create_end.append(self.count('pool_misses'))
+
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=self.concurrency,
+                limit_per_host=self.concurrency,
+            ),
+            headers=get_default_headers(),
+            timeout=aiohttp.ClientTimeout(total=getattr(settings, 'CRAWLER_REQUEST_TIMEOUT', 30)),
+            trace_configs=[trace_config],
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    def count(self, counter):
+        """
+        Build a trace callback incrementing the specified counter.
+
+        Args:
+            counter: The name of the counter.
+
+        Returns:
+            The coroutine function registered on the trace config.
+        """
+        async def callback(session, trace_config_ctx, params):
+            with self.lock:
+                self.counters[counter] += 1
+        return callback
+
+    def get(self, url, **kwargs):
+        """
+        Send an HTTP GET request through the pooled session.
+
+        Args:
+            url: The URL to send the request to.
+            **kwargs: Extra arguments passed to aiohttp.
+
+        Returns:
+            The aiohttp request context manager.
+        """
+        return self.session.get(url, **kwargs)
+
+    async def read_body(self, response, chunk_size=64 * 1024):
+        """
+        Read the body of a response unless it is not HTML or too large.
+
+        The download is aborted as soon as the body exceeds the size limit.
+
+        Args:
+            response: The aiohttp response object.
+            chunk_size: The size of the read chunks.
+
+        Returns:
+            The raw body, or None if the response was rejected.
+        """
+        if not is_acceptable(response.headers):
+            return None
+
+        max_size = get_max_body_size()
+        chunks = []
+        size = 0
+        async for chunk in response.content.iter_chunked(chunk_size):
+            size += len(chunk)
+            if size > max_size:
+                return None
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    def stats(self):
+        """
+        Return the connection pool counters.
+
+        Returns:
+            A dict with the same keys as HttpClient.stats.
+        """
+        with self.lock:
+            return dict(self.counters)
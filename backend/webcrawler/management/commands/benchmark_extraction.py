@@ -0,0 +1,32 @@
+import timeit
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from webcrawler.extraction import EXTRACTION_BACKENDS
+
+FIXTURES_DIR = Path(__file__).resolve().parent.parent.parent / 'benchmarks' / 'fixtures'
+
+
+class Command(BaseCommand):
+    help = 'Compare the HTML extraction backends on saved HTML fixtures.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help='HTML files to parse. Defaults to the bundled fixtures.')
+        parser.add_argument('--number', type=int, default=20, help='Number of parses per file and backend.')
+
+    def handle(self, *args, **options):
+        """
+        Parse every fixture with every backend and print the mean time per parse.
+        """
+        files = [Path(name) for name in options['files']] or sorted(FIXTURES_DIR.glob('*.html'))
+        number = options['number']
+
+        self.stdout.write(f"{'file':<24}{'size':>10}" + ''.join(f'{name:>16}' for name in EXTRACTION_BACKENDS))
+        for path in files:
+            html = path.read_text(encoding='utf-8', errors='replace')
+            timings = []
+            for extract in EXTRACTION_BACKENDS.values():
+                seconds = timeit.timeit(lambda: extract(html), number=number)
+                timings.append(f'{seconds / number * 1000:>13.2f} ms')
+            self.stdout.write(f'{path.name:<24}{len(html):>10}' + ''.join(timings))
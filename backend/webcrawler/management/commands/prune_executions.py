@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from webcrawler.retention import RetentionPolicy, prune_executions
+
+
+class Command(BaseCommand):
+    help = 'Delete the executions that the retention policy does not keep.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted.')
+        parser.add_argument('--keep-last', type=int, help='Override CRAWLER_RETENTION_KEEP_LAST.')
+        parser.add_argument('--keep-within', type=int, help='Override CRAWLER_RETENTION_KEEP_WITHIN (days).')
+        parser.add_argument('--max-age', type=int, help='Override CRAWLER_RETENTION_MAX_AGE (days).')
+        parser.add_argument('--batch-size', type=int, help='Executions deleted per transaction.')
+
+    def handle(self, *args, **options):
+        """
+        Prune the executions and print the number of rows and bytes reclaimed.
+        """
+        policy = RetentionPolicy.from_settings()
+        for name in ('keep_last', 'keep_within', 'max_age'):
+            if options[name] is not None:
+                setattr(policy, name, options[name])
+
+        report = prune_executions(policy, dry_run=options['dry_run'], batch_size=options['batch_size'])
+
+        self.stdout.write('Would delete:' if options['dry_run'] else 'Deleted:')
+        for name, value in report.items():
+            self.stdout.write(f'  {name:<16}{value:>12}')
@@ -0,0 +1,43 @@
+import hashlib
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url):
+    """
+    Normalize a URL to the form that identifies its crawled page.
+
+    The scheme and host are lowercased, the default port and the fragment
+    are removed and an empty path becomes '/'. The path and query are kept
+    as they are, since servers may treat them case-sensitively.
+
+    Args:
+        url: The absolute URL.
+
+    Returns:
+        The normalized URL.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    userinfo, at, host = parts.netloc.rpartition('@')
+    host = host.lower()
+    try:
+        if parts.port is not None and parts.port == DEFAULT_PORTS.get(scheme):
+            host = host.rsplit(':', 1)[0]
+    except ValueError:
+        pass
+    return urlunsplit((scheme, userinfo + at + host, parts.path or '/', parts.query, ''))
+
+
+def compute_url_hash(url):
+    """
+    Compute the fixed-size key of a URL, used to look crawled pages up by an index.
+
+    Args:
+        url: The absolute URL.
+
+    Returns:
+        The hex digest of the 128-bit BLAKE2b hash of the normalized URL.
+    """
+    return hashlib.blake2b(normalize_url(url).encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
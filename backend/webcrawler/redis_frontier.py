@@ -0,0 +1,431 @@
+import time
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+
+from .budget import CrawlBudget
+from .frontier import Frontier
+from .normalization import compute_url_hash
+
+# Queue every URL whose hash has not been seen before.
+# KEYS: queue, seen, state. ARGV: ttl, depth, url_hash, url, url_hash, url...
+PUSH_SCRIPT = """
+local added = 0
+for i = 3, #ARGV, 2 do
+    if redis.call('SADD', KEYS[2], ARGV[i]) == 1 then
+        redis.call('RPUSH', KEYS[1], ARGV[2] .. ' ' .. ARGV[i + 1])
+        added = added + 1
+    end
+end
+redis.call('HINCRBY', KEYS[3], 'queued', added)
+redis.call('HINCRBY', KEYS[3], 'duplicates', (#ARGV - 2) / 2 - added)
+local size = redis.call('LLEN', KEYS[1])
+if size > tonumber(redis.call('HGET', KEYS[3], 'peak_size') or '0') then
+    redis.call('HSET', KEYS[3], 'peak_size', size)
+end
+for i = 1, #KEYS do
+    redis.call('EXPIRE', KEYS[i], ARGV[1])
+end
+return added
+"""
+
+# Pop a batch of entries, never claiming more pages than the budget has left.
+# Claimed entries are leased until now + lease, and entries whose lease
+# expired, as their worker was lost, are queued again first.
+# KEYS: queue, state, claimed. ARGV: batch size, max pages (-1 if unbounded), now, lease, ttl.
+CLAIM_SCRIPT = """
+local expired = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', ARGV[3])
+for i = 1, #expired do
+    redis.call('ZREM', KEYS[3], expired[i])
+    redis.call('RPUSH', KEYS[1], expired[i])
+end
+if #expired > 0 then
+    redis.call('HINCRBY', KEYS[2], 'pages', -#expired)
+end
+local count = tonumber(ARGV[1])
+local max_pages = tonumber(ARGV[2])
+if max_pages >= 0 then
+    count = math.min(count, max_pages - tonumber(redis.call('HGET', KEYS[2], 'pages') or '0'))
+end
+if count <= 0 then
+    return {}
+end
+local entries = redis.call('LRANGE', KEYS[1], 0, count - 1)
+if #entries > 0 then
+    redis.call('LTRIM', KEYS[1], #entries, -1)
+    local deadline = tonumber(ARGV[3]) + tonumber(ARGV[4])
+    for i = 1, #entries do
+        redis.call('ZADD', KEYS[3], deadline, entries[i])
+    end
+    redis.call('EXPIRE', KEYS[3], ARGV[5])
+    redis.call('HINCRBY', KEYS[2], 'pages', #entries)
+end
+return entries
+"""
+
+# Settle a finished batch and decide how many batch tasks to start.
+# A task is settled once, even if the broker delivers it again. Once no batch
+# task is left, the entries still claimed belong to lost workers and are
+# queued again, or dropped if the crawl was stopped. The execution is finished
+# exactly once, by the caller that sees an empty frontier (or a stopped crawl)
+# with no batch task left and nothing claimed.
+# KEYS: queue, state, claimed, settled tasks. ARGV: task ID ('' if none), batch size, max tasks, ttl, entries...
+SCHEDULE_SCRIPT = """
+for i = 5, #ARGV do
+    redis.call('ZREM', KEYS[3], ARGV[i])
+end
+local tasks
+if ARGV[1] ~= '' and redis.call('SADD', KEYS[4], ARGV[1]) == 1 then
+    redis.call('EXPIRE', KEYS[4], ARGV[4])
+    tasks = redis.call('HINCRBY', KEYS[2], 'tasks', -1)
+else
+    tasks = tonumber(redis.call('HGET', KEYS[2], 'tasks') or '0')
+end
+local stopped = redis.call('HEXISTS', KEYS[2], 'stopped') == 1 or redis.call('HEXISTS', KEYS[2], 'failed') == 1
+if tasks <= 0 then
+    local orphans = redis.call('ZRANGE', KEYS[3], 0, -1)
+    if #orphans > 0 then
+        redis.call('DEL', KEYS[3])
+        redis.call('HINCRBY', KEYS[2], 'pages', -#orphans)
+        if not stopped then
+            for i = 1, #orphans do
+                redis.call('RPUSH', KEYS[1], orphans[i])
+            end
+        end
+    end
+end
+local queued = redis.call('LLEN', KEYS[1])
+local spawn = 0
+if not stopped and queued > 0 then
+    spawn = math.min(tonumber(ARGV[3]) - tasks, math.ceil(queued / tonumber(ARGV[2])))
+    if spawn > 0 then
+        tasks = redis.call('HINCRBY', KEYS[2], 'tasks', spawn)
+    else
+        spawn = 0
+    end
+end
+local finished = 0
+if tasks <= 0 and redis.call('ZCARD', KEYS[3]) == 0 and redis.call('HSETNX', KEYS[2], 'finished', 1) == 1 then
+    finished = 1
+end
+return {spawn, finished}
+"""
+
+COUNTERS = ('num_crawled', 'num_skipped', 'num_reprocessed', 'num_failed')
+
+
+@lru_cache(maxsize=None)
+def get_redis(url=None):
+    """
+    Return the Redis client shared by the distributed crawl of this process.
+
+    Args:
+        url: The Redis URL. Defaults to the CRAWLER_REDIS_URL setting.
+
+    Returns:
+        The redis.Redis client.
+    """
+    url = url or getattr(settings, 'CRAWLER_REDIS_URL', settings.CELERY_BROKER_URL)
+    return redis.Redis.from_url(url, decode_responses=True)
+
+
+class RedisFrontier(Frontier):
+    """
+    Frontier of a distributed execution, shared by all Celery workers through Redis.
+
+    The queue holds "<depth> <url>" entries and the seen-set deduplicates
+    the hashes of the normalized URLs across workers. Claimed entries are
+    leased for CRAWLER_BATCH_LEASE seconds in a sorted set, so the entries of
+    a worker that was lost are queued again. A state hash keeps the frontier
+    counters, the number of scheduled batch tasks and the crawl counters of
+    the execution.
+    """
+
+    def __init__(self, client, execution_id, boundary_regexp, skipped_extensions=()):
+        """
+        Initialize the RedisFrontier object.
+
+        Args:
+            client: The redis.Redis client.
+            execution_id: The ID of the execution the frontier belongs to.
+            boundary_regexp: The regular expression links must match to be queued.
+            skipped_extensions: File extensions of links that are never queued, e.g. '.pdf'.
+        """
+        super().__init__(boundary_regexp, skipped_extensions)
+        self.client = client
+        prefix = f'crawler:execution:{execution_id}'
+        self.queue_key = f'{prefix}:queue'
+        self.seen_key = f'{prefix}:seen'
+        self.state_key = f'{prefix}:state'
+        self.progress_key = f'{prefix}:progress'
+        self.claimed_key = f'{prefix}:claimed'
+        self.settled_key = f'{prefix}:settled'
+        self.ttl = getattr(settings, 'CRAWLER_DISTRIBUTED_KEY_TTL', 7 * 24 * 3600)
+        self.lease = getattr(settings, 'CRAWLER_BATCH_LEASE', 600)
+        self.push_script = client.register_script(PUSH_SCRIPT)
+        self.claim_script = client.register_script(CLAIM_SCRIPT)
+        self.schedule_script = client.register_script(SCHEDULE_SCRIPT)
+
+    def __len__(self):
+        return self.client.llen(self.queue_key)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def start(self, lock_token=None):
+        """
+        Clear any leftover keys of the execution and start its wall clock.
+
+        Args:
+            lock_token: The token of the SiteCrawlLock held by the execution.
+        """
+        self.delete()
+        self.client.hset(self.state_key, mapping={'started_at': time.time(), 'lock_token': lock_token or ''})
+        self.client.expire(self.state_key, self.ttl)
+
+    def delete(self):
+        """
+        Delete the Redis keys of the execution.
+        """
+        self.client.delete(
+            self.queue_key, self.seen_key, self.state_key, self.progress_key, self.claimed_key, self.settled_key
+        )
+
+    def claim_progress_report(self, interval):
+        """
+        Let a single worker report the progress of the execution per interval.
+
+        Args:
+            interval: The number of seconds between two progress reports.
+
+        Returns:
+            True if the caller should report the progress, False otherwise.
+        """
+        return bool(self.client.set(self.progress_key, 1, nx=True, px=max(int(interval * 1000), 1)))
+
+    def push(self, url, depth=0):
+        """
+        Queue the specified URL unless any worker has seen it before.
+
+        Args:
+            url: The URL to queue.
+            depth: The number of links followed from the start URL to reach it.
+
+        Returns:
+            True if the URL was queued, False if it was a duplicate.
+        """
+        return self.push_urls([url], depth) == 1
+
+    def extend(self, links, depth=0):
+        """
+        Queue all links that match the boundary and have not been seen before,
+        in a single round trip.
+
+        Args:
+            links: The links to queue.
+            depth: The crawl depth of the links.
+        """
+        self.push_urls([link for link in links if self.is_valid_link(link)], depth)
+
+    def push_urls(self, urls, depth):
+        if not urls:
+            return 0
+        args = [self.ttl, depth]
+        for url in urls:
+            args.extend((compute_url_hash(url), url))
+        return self.push_script(keys=[self.queue_key, self.seen_key, self.state_key], args=args)
+
+    def pop(self):
+        """
+        Remove and return the next URL to crawl.
+
+        Returns:
+            A tuple of the URL and its depth.
+        """
+        entries = self.claim(1)
+        if not entries:
+            raise IndexError('pop from an empty frontier')
+        return entries[0]
+
+    def claim(self, batch_size, max_pages=None):
+        """
+        Atomically take a batch of URLs off the shared queue.
+
+        Claimed URLs are leased to the caller until they are settled by
+        `schedule`. Claimed URLs whose lease expired are queued again first.
+
+        Args:
+            batch_size: The maximum number of URLs to claim.
+            max_pages: The page limit of the crawl budget, if any.
+
+        Returns:
+            A list of (url, depth) tuples.
+        """
+        entries = self.claim_script(
+            keys=[self.queue_key, self.state_key, self.claimed_key],
+            args=[batch_size, -1 if max_pages is None else max_pages, time.time(), self.lease, self.ttl],
+        )
+        claimed = []
+        for entry in entries:
+            depth, url = entry.split(' ', 1)
+            claimed.append((url, int(depth)))
+        return claimed
+
+    def schedule(self, claimed=(), task_id=None, batch_size=1, max_tasks=1):
+        """
+        Settle finished work and compute how many batch tasks to start.
+
+        Args:
+            claimed: The (url, depth) tuples claimed by the task that have been processed.
+            task_id: The ID of the batch task that has ended, if any.
+            batch_size: The number of URLs claimed by a batch task.
+            max_tasks: The maximum number of batch tasks running at the same time.
+
+        Returns:
+            A tuple of the number of batch tasks the caller must start and a
+            flag that is True for the single caller that must finish the execution.
+        """
+        spawn, finished = self.schedule_script(
+            keys=[self.queue_key, self.state_key, self.claimed_key, self.settled_key],
+            args=[task_id or '', batch_size, max_tasks, self.ttl, *(f'{depth} {url}' for url, depth in claimed)],
+        )
+        return int(spawn), bool(finished)
+
+    def is_settled(self, task_id):
+        """
+        Check if a batch task has already ended, e.g. before the broker delivered it again.
+
+        Args:
+            task_id: The ID of the batch task.
+
+        Returns:
+            True if the task has been settled, False otherwise.
+        """
+        return bool(self.client.sismember(self.settled_key, task_id))
+
+    def add_counters(self, **counters):
+        """
+        Add the crawl counters of a batch to the execution totals.
+
+        Args:
+            counters: The counter increments, keyed by name.
+        """
+        pipeline = self.client.pipeline()
+        for name, value in counters.items():
+            if value:
+                pipeline.hincrby(self.state_key, name, value)
+        pipeline.execute()
+
+    def stop(self, reason):
+        """
+        Stop all workers from claiming more pages.
+
+        Args:
+            reason: The reason recorded in the state hash, e.g. 'max_pages'.
+        """
+        self.client.hsetnx(self.state_key, 'stopped', reason)
+
+    def mark_failed(self):
+        """
+        Stop scheduling new batches after a batch task failed.
+        """
+        self.client.hset(self.state_key, 'failed', 1)
+
+    def get_state(self):
+        """
+        Return the raw state hash of the execution.
+
+        Returns:
+            A dict of the state fields.
+        """
+        return self.client.hgetall(self.state_key)
+
+    def stats(self):
+        """
+        Return the frontier counters.
+
+        Returns:
+            A dict with the same keys as Frontier.stats.
+        """
+        state = self.get_state()
+        queued = int(state.get('queued', 0))
+        duplicates = int(state.get('duplicates', 0))
+        attempts = queued + duplicates
+        return {
+            'queue_depth': len(self),
+            'peak_size': int(state.get('peak_size', 0)),
+            'queued': queued,
+            'duplicates': duplicates,
+            'duplicate_rate': duplicates / attempts if attempts else 0.0,
+        }
+
+
+class SharedCrawlBudget(CrawlBudget):
+    """
+    Crawl budget of a distributed execution, counted in the state hash of its RedisFrontier.
+
+    Pages are counted when they are claimed, so the page limit is never
+    exceeded. The wall clock starts when the execution starts.
+    """
+
+    def __init__(self, website_record, frontier):
+        """
+        Initialize the SharedCrawlBudget object.
+
+        Args:
+            website_record: The WebsiteRecord object with the budget fields.
+            frontier: The RedisFrontier of the execution.
+        """
+        super().__init__(website_record)
+        self.frontier = frontier
+
+    def add_page(self):
+        """
+        Pages are counted by RedisFrontier.claim.
+        """
+
+    def stop(self, reason):
+        """
+        End the crawl of all workers early.
+
+        Args:
+            reason: The reason recorded in the state hash.
+        """
+        self.frontier.stop(reason)
+        self.exhausted = self.frontier.client.hget(self.frontier.state_key, 'stopped')
+
+    def add_bytes(self, num_bytes):
+        """
+        Count downloaded bytes.
+
+        Args:
+            num_bytes: The size of a downloaded response body.
+        """
+        self.frontier.client.hincrby(self.frontier.state_key, 'bytes', num_bytes)
+
+    def is_exhausted(self):
+        """
+        Check the page, byte and wall-clock limits of the whole execution.
+
+        The first worker to see a limit reached records it, which stops
+        all workers from claiming more pages.
+
+        Returns:
+            True if one of the limits has been reached, False otherwise.
+        """
+        state = self.frontier.get_state()
+        exhausted = state.get('stopped')
+        if exhausted is None:
+            started_at = float(state.get('started_at', time.time()))
+            if self.max_pages is not None and int(state.get('pages', 0)) >= self.max_pages:
+                exhausted = 'max_pages'
+            elif self.max_bytes is not None and int(state.get('bytes', 0)) >= self.max_bytes:
+                exhausted = 'max_bytes'
+            elif self.max_duration is not None and time.time() - started_at >= self.max_duration:
+                exhausted = 'max_duration'
+            if exhausted is not None:
+                self.frontier.stop(exhausted)
+                exhausted = self.frontier.client.hget(self.frontier.state_key, 'stopped')
+        self.exhausted = exhausted
+        return exhausted is not None
@@ -0,0 +1,290 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from api.models import (
+    CrawlCheckpoint, CrawledPage, DeletedPage, Execution, Link, LinkSnapshot, PageSnapshot, SNAPSHOT_MODELS,
+    WebsiteRecord, delete_snapshots,
+)
+
+REPORT_FIELDS = (
+    'executions', 'checkpoints', 'page_snapshots', 'link_snapshots',
+    'pages_moved', 'pages_deleted', 'links_deleted', 'bytes',
+)
+
+
+class RetentionPolicy:
+    """
+    Decides which executions of a website are kept.
+
+    An execution is kept if any rule keeps it, like backup rotation:
+      - keep_last: the number of most recent executions to keep
+      - keep_within: the number of days during which all executions are kept
+      - keep_daily: keep the most recent execution of every day before that
+      - max_age: the number of days after which executions are pruned even if
+        keep_daily keeps them, unless they are among the keep_last ones
+    Pending and running executions and the most recent execution are always kept.
+    """
+
+    def __init__(self, keep_last=None, keep_within=None, keep_daily=False, max_age=None):
+        """
+        Initialize the RetentionPolicy object.
+
+        Args:
+            keep_last: The number of most recent executions to keep, or None.
+            keep_within: The number of days during which all executions are kept, or None.
+            keep_daily: Whether one execution per day is kept beyond keep_within.
+            max_age: The maximum age of executions in days, or None.
+        """
+        self.keep_last = keep_last
+        self.keep_within = keep_within
+        self.keep_daily = keep_daily
+        self.max_age = max_age
+
+    @classmethod
+    def from_settings(cls):
+        """
+        Create the policy configured by the CRAWLER_RETENTION_* settings.
+
+        Returns:
+            The RetentionPolicy object.
+        """
+        return cls(
+            keep_last=getattr(settings, 'CRAWLER_RETENTION_KEEP_LAST', None),
+            keep_within=getattr(settings, 'CRAWLER_RETENTION_KEEP_WITHIN', None),
+            keep_daily=getattr(settings, 'CRAWLER_RETENTION_KEEP_DAILY', False),
+            max_age=getattr(settings, 'CRAWLER_RETENTION_MAX_AGE', None),
+        )
+
+    def is_enabled(self):
+        """
+        Check if any rule is configured. Without rules, nothing is pruned.
+
+        Returns:
+            True if the policy prunes executions, False otherwise.
+        """
+        return any(rule is not None for rule in (self.keep_last, self.keep_within, self.max_age)) or self.keep_daily
+
+    def select_pruned(self, executions, now):
+        """
+        Select the executions of one website that are not kept.
+
+        Args:
+            executions: A list of (id, start_time, status) tuples, most recent first.
+            now: The current time.
+
+        Returns:
+            A list of the IDs of the executions to prune.
+        """
+        if not self.is_enabled():
+            return []
+        keep_within = now - timedelta(days=self.keep_within) if self.keep_within is not None else None
+        max_age = now - timedelta(days=self.max_age) if self.max_age is not None else None
+        days = set()
+        pruned = []
+        for index, (execution_id, start_time, status) in enumerate(executions):
+            day = timezone.localdate(start_time)
+            if (
+                index == 0
+                or status in ('pending', 'running')
+                or (self.keep_last is not None and index < self.keep_last)
+            ):
+                days.add(day)
+                continue
+            if max_age is None or start_time >= max_age:
+                if keep_within is not None and start_time >= keep_within:
+                    days.add(day)
+                    continue
+                if self.keep_daily and day not in days:
+                    days.add(day)
+                    continue
+            pruned.append(execution_id)
+        return pruned
+
+
+def prune_executions(policy=None, dry_run=False, batch_size=None, page_batch_size=None):
+    """
+    Prune the executions of all websites that the retention policy does not keep.
+
+    Executions are deleted in batches, each in its own short transaction,
+    together with their checkpoints and snapshots. Snapshot partitions whose
+    executions are all deleted are detached and dropped rather than deleted
+    row by row. The live pages an execution still
+    owns are moved to the most recent kept execution of the website, so the
+    graph does not change, except for pages not crawled for max_age days,
+    which are deleted in batches with their links.
+
+    Args:
+        policy: The RetentionPolicy. Defaults to the one configured in the settings.
+        dry_run: Only report what would be deleted.
+        batch_size: The number of executions deleted per transaction.
+            Defaults to the CRAWLER_RETENTION_BATCH_SIZE setting.
+        page_batch_size: The number of pages moved or deleted per statement.
+            Defaults to the CRAWLER_RETENTION_PAGE_BATCH_SIZE setting.
+
+    Returns:
+        A dict with the number of rows of every kind deleted, or that would be
+        deleted in a dry run, and the number of bytes reclaimed. Bytes are only
+        measured on PostgreSQL.
+    """
+    policy = policy or RetentionPolicy.from_settings()
+    batch_size = batch_size or getattr(settings, 'CRAWLER_RETENTION_BATCH_SIZE', 100)
+    page_batch_size = page_batch_size or getattr(settings, 'CRAWLER_RETENTION_PAGE_BATCH_SIZE', 1000)
+    now = timezone.now()
+    stale_before = now - timedelta(days=policy.max_age) if policy.max_age is not None else None
+    report = dict.fromkeys(REPORT_FIELDS, 0)
+
+    for website_id in WebsiteRecord.objects.filter(deleting=False).values_list('id', flat=True):
+        executions = list(
+            Execution.objects.filter(website_record_id=website_id, deleting=False)
+            .order_by('-start_time', '-id')
+            .values_list('id', 'start_time', 'status')
+        )
+        pruned = policy.select_pruned(executions, now)
+        if not pruned:
+            continue
+        pruned_ids = set(pruned)
+        keeper_id = next(execution_id for execution_id, _, _ in executions if execution_id not in pruned_ids)
+        for start in range(0, len(pruned), batch_size):
+            batch = pruned[start:start + batch_size]
+            if dry_run:
+                add_counts(report, measure_batch(batch, stale_before))
+            else:
+                add_counts(report, delete_batch(batch, keeper_id, stale_before, page_batch_size))
+    return report
+
+
+def add_counts(report, counts):
+    for name, value in counts.items():
+        report[name] += value
+
+
+def measure_batch(execution_ids, stale_before):
+    """
+    Count the rows that deleting a batch of executions would delete or move.
+
+    Args:
+        execution_ids: The IDs of the executions.
+        stale_before: Pages crawled before this time are deleted instead of moved, or None.
+
+    Returns:
+        A dict of counts, keyed like the report of prune_executions.
+    """
+    pages = CrawledPage.objects.filter(execution_id__in=execution_ids)
+    stale = pages.filter(crawl_time__lt=stale_before) if stale_before is not None else pages.none()
+    stale_ids = stale.values('id')
+    return {
+        'executions': len(execution_ids),
+        'checkpoints': CrawlCheckpoint.objects.filter(execution_id__in=execution_ids).count(),
+        'page_snapshots': PageSnapshot.objects.filter(execution_id__in=execution_ids).count(),
+        'link_snapshots': LinkSnapshot.objects.filter(execution_id__in=execution_ids).count(),
+        'pages_moved': pages.count() - stale.count(),
+        'pages_deleted': stale.count(),
+        'links_deleted': Link.objects.filter(Q(from_page_id__in=stale_ids) | Q(to_page_id__in=stale_ids)).count(),
+        'bytes': (
+            get_snapshots_size(execution_ids)
+            + get_rows_size(Execution, 'id', execution_ids)
+            + get_rows_size(CrawledPage, 'id', list(stale.values_list('id', flat=True)))
+        ),
+    }
+
+
+def delete_batch(execution_ids, keeper_id, stale_before, page_batch_size):
+    """
+    Delete a batch of executions.
+
+    Their pages are moved or deleted in chunks of page_batch_size first, each
+    in its own transaction. The executions, checkpoints and snapshots are then
+    deleted in one short transaction.
+
+    Args:
+        execution_ids: The IDs of the executions.
+        keeper_id: The ID of the execution that takes over their live pages.
+        stale_before: Pages crawled before this time are deleted instead of moved, or None.
+        page_batch_size: The number of pages moved or deleted per statement.
+
+    Returns:
+        A dict of counts, keyed like the report of prune_executions.
+    """
+    counts = dict.fromkeys(REPORT_FIELDS, 0)
+    pages = CrawledPage.objects.filter(execution_id__in=execution_ids)
+    if stale_before is not None:
+        stale = pages.filter(crawl_time__lt=stale_before)
+        while True:
+            ids = list(stale.values_list('id', flat=True)[:page_batch_size])
+            if not ids:
+                break
+            with transaction.atomic():
+                counts['bytes'] += get_rows_size(CrawledPage, 'id', ids)
+                DeletedPage.record(CrawledPage.objects.filter(id__in=ids))
+                links = Link.objects.filter(Q(from_page_id__in=ids) | Q(to_page_id__in=ids))
+                counts['links_deleted'] += links.delete()[0]
+                counts['pages_deleted'] += CrawledPage.objects.filter(id__in=ids).delete()[0]
+    while True:
+        ids = list(pages.values_list('id', flat=True)[:page_batch_size])
+        if not ids:
+            break
+        counts['pages_moved'] += CrawledPage.objects.filter(id__in=ids).update(execution_id=keeper_id)
+
+    with transaction.atomic():
+        counts['executions'] = len(execution_ids)
+        counts['bytes'] += get_snapshots_size(execution_ids) + get_rows_size(Execution, 'id', execution_ids)
+        counts['page_snapshots'] = PageSnapshot.objects.filter(execution_id__in=execution_ids).count()
+        counts['link_snapshots'] = LinkSnapshot.objects.filter(execution_id__in=execution_ids).count()
+        delete_snapshots(execution_ids)
+        counts['checkpoints'] = CrawlCheckpoint.objects.filter(execution_id__in=execution_ids).delete()[0]
+        Execution.objects.filter(id__in=execution_ids).delete()
+    return counts
+
+
+def get_snapshots_size(execution_ids):
+    """
+    Measure the disk space used by the snapshots of executions, counting
+    the whole size of the partitions that deleting them would drop.
+
+    Args:
+        execution_ids: The IDs of the executions.
+
+    Returns:
+        The size in bytes, or 0 if the database is not PostgreSQL.
+    """
+    if connection.vendor != 'postgresql':
+        return 0
+    size = 0
+    for model in SNAPSHOT_MODELS:
+        partitions, rows = model.plan_deletion(execution_ids)
+        size += get_rows_size(model, 'execution_id', rows)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT COALESCE(SUM(pg_total_relation_size(to_regclass(name))), 0) FROM unnest(%s) AS name',
+                [partitions],
+            )
+            size += int(cursor.fetchone()[0])
+    return size
+
+
+def get_rows_size(model, column, values):
+    """
+    Measure the space used by table rows, without their index entries.
+
+    Args:
+        model: The model of the table.
+        column: The column the rows are selected by.
+        values: The values of the column.
+
+    Returns:
+        The size in bytes, or 0 if the database is not PostgreSQL.
+    """
+    if connection.vendor != 'postgresql' or not values:
+        return 0
+    table = connection.ops.quote_name(model._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT COALESCE(SUM(pg_column_size(t.*)), 0) FROM {table} AS t '
+            f'WHERE {connection.ops.quote_name(column)} = ANY(%s)',
+            [list(values)],
+        )
+        return int(cursor.fetchone()[0])
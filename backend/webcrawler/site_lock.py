@@ -0,0 +1,166 @@
+import threading
+import uuid
+
+from django.conf import settings
+
+from .redis_frontier import get_redis
+
+# KEYS: lock. ARGV: token, lease in milliseconds.
+REFRESH_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# KEYS: lock, cancel. ARGV: token.
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    if redis.call('GET', KEYS[2]) == ARGV[1] then
+        redis.call('DEL', KEYS[2])
+    end
+    return 1
+end
+return 0
+"""
+
+OVERLAP_POLICIES = ('skip', 'queue', 'supersede')
+
+# Maximum number of seconds between two checks of the lease by its holder
+HEARTBEAT_INTERVAL = 5.0
+
+
+class SiteCrawlLock:
+    """
+    Per-website crawl mutex stored in Redis with an expiring lease.
+
+    The holder keeps the lease alive while it crawls. If the worker dies, the
+    lease expires after CRAWLER_SITE_LOCK_LEASE seconds and the site can be
+    crawled again. Another trigger can ask the holder to stop (supersede), and
+    at most one trigger per site waits for the lock (queue).
+    """
+
+    def __init__(self, website_id, token=None, lease=None):
+        """
+        Initialize the SiteCrawlLock object.
+
+        Args:
+            website_id: The ID of the WebsiteRecord the lock protects.
+            token: The token of an already held lock, e.g. one passed between tasks.
+            lease: Seconds the lock is held without being refreshed.
+                Defaults to the CRAWLER_SITE_LOCK_LEASE setting.
+        """
+        self.client = get_redis()
+        self.token = token or uuid.uuid4().hex
+        self.lease = lease or getattr(settings, 'CRAWLER_SITE_LOCK_LEASE', 300)
+        prefix = f'crawler:site:{website_id}'
+        self.lock_key = f'{prefix}:lock'
+        self.cancel_key = f'{prefix}:cancel'
+        self.pending_key = f'{prefix}:pending'
+        self.refresh_script = self.client.register_script(REFRESH_SCRIPT)
+        self.release_script = self.client.register_script(RELEASE_SCRIPT)
+        self.on_cancel = None
+        self.stopped = threading.Event()
+        self.heartbeat = None
+
+    def __enter__(self):
+        """
+        Keep the lease alive until the block exits, then release the lock.
+        """
+        self.start_heartbeat()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop_heartbeat()
+        self.release()
+
+    def start_heartbeat(self, on_cancel=None):
+        """
+        Start refreshing the lease from a background thread.
+
+        Args:
+            on_cancel: Called when the crawl is superseded or the lock was lost.
+        """
+        self.on_cancel = on_cancel or self.on_cancel
+        self.stopped.clear()
+        self.heartbeat = threading.Thread(target=self.run_heartbeat, daemon=True)
+        self.heartbeat.start()
+
+    def stop_heartbeat(self):
+        """
+        Stop refreshing the lease without releasing the lock.
+        """
+        self.stopped.set()
+        if self.heartbeat is not None:
+            self.heartbeat.join()
+
+    def acquire(self):
+        """
+        Take the lock if no other execution of the website holds it.
+
+        Returns:
+            True if the lock was acquired, False otherwise.
+        """
+        return bool(self.client.set(self.lock_key, self.token, nx=True, ex=self.lease))
+
+    def refresh(self):
+        """
+        Extend the lease of the held lock.
+
+        Returns:
+            True if the lock is still held, False if it was lost.
+        """
+        return bool(self.refresh_script(keys=[self.lock_key], args=[self.token, self.lease * 1000]))
+
+    def release(self):
+        """
+        Release the lock if it is still held.
+        """
+        self.release_script(keys=[self.lock_key, self.cancel_key], args=[self.token])
+
+    def is_cancelled(self):
+        """
+        Check if another trigger asked the holder of this lock to stop.
+
+        Returns:
+            True if the crawl was superseded, False otherwise.
+        """
+        return self.client.get(self.cancel_key) == self.token
+
+    def supersede(self):
+        """
+        Ask the current holder of the lock to stop its crawl.
+        """
+        holder = self.client.get(self.lock_key)
+        if holder is not None:
+            self.client.set(self.cancel_key, holder, ex=self.lease)
+
+    def claim_pending(self, is_pending):
+        """
+        Register this trigger as the one waiting for the lock.
+
+        Args:
+            is_pending: True if this trigger is already the waiting one.
+
+        Returns:
+            True if this trigger may wait for the lock, False if another one already does.
+        """
+        if is_pending:
+            self.client.expire(self.pending_key, self.lease * 2)
+            return True
+        return bool(self.client.set(self.pending_key, 1, nx=True, ex=self.lease * 2))
+
+    def clear_pending(self):
+        """
+        Allow another trigger to wait for the lock.
+        """
+        self.client.delete(self.pending_key)
+
+    def run_heartbeat(self):
+        """
+        Heartbeat thread loop refreshing the lease and watching for cancellation.
+        """
+        while not self.stopped.wait(min(self.lease / 3, HEARTBEAT_INTERVAL)):
+            if (not self.refresh() or self.is_cancelled()) and self.on_cancel is not None:
+                self.on_cancel()
@@ -0,0 +1,167 @@
+import logging
+import zlib
+from datetime import datetime, time, timezone
+from urllib.parse import urljoin, urlparse
+
+import requests
+from django.conf import settings
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.timezone import is_naive, make_aware
+from lxml import etree
+
+SITEMAP_NESTING_LIMIT = 3
+
+logger = logging.getLogger(__name__)
+
+
+def parse_lastmod(value):
+    """
+    Parse the W3C datetime of a <lastmod> element.
+
+    Args:
+        value: The text of the element.
+
+    Returns:
+        An aware datetime, or None if the value cannot be parsed.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            date = parse_date(value)
+            parsed = datetime.combine(date, time.min) if date else None
+    except ValueError:
+        return None
+    if parsed is not None and is_naive(parsed):
+        parsed = make_aware(parsed, timezone.utc)
+    return parsed
+
+
+def find_sitemaps(client, start_url):
+    """
+    Find the sitemaps of the site of the specified URL.
+
+    The Sitemap entries of robots.txt are used. Sites that do not list any,
+    or whose robots.txt cannot be fetched, fall back to /sitemap.xml.
+
+    Args:
+        client: The HttpClient used for the requests.
+        start_url: A URL of the site.
+
+    Returns:
+        A list of sitemap URLs.
+    """
+    parsed_url = urlparse(start_url)
+    root = f'{parsed_url.scheme}://{parsed_url.netloc}/'
+    sitemaps = []
+
+    try:
+        response = client.get(urljoin(root, 'robots.txt'))
+    except requests.RequestException as e:
+        logger.warning('Could not fetch robots.txt of %s: %r', root, e)
+        response = None
+    if response is not None and response.status_code == 200:
+        for line in response.text.splitlines():
+            name, _, value = line.partition(':')
+            if name.strip().lower() == 'sitemap' and value.strip():
+                sitemaps.append(urljoin(root, value.strip()))
+
+    return sitemaps or [urljoin(root, 'sitemap.xml')]
+
+
+def iter_chunks(response, chunk_size=64 * 1024):
+    """
+    Stream the decoded body of the response in chunks.
+
+    Gzipped sitemap files are decompressed on the fly.
+
+    Args:
+        response: A streamed requests response.
+        chunk_size: The size of the read chunks.
+
+    Yields:
+        Chunks of the body.
+    """
+    decompressor = None
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        if decompressor is None:
+            is_gzip = chunk[:2] == b'\x1f\x8b'
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if is_gzip else False
+        yield decompressor.decompress(chunk) if decompressor else chunk
+
+
+def iter_sitemap(client, sitemap_url, modified_since=None, depth=0):
+    """
+    Stream the page entries of a sitemap or sitemap index.
+
+    The document is parsed incrementally and every processed element is
+    dropped, so memory use does not grow with the size of the sitemap.
+    Sitemap indexes are followed up to SITEMAP_NESTING_LIMIT levels. A
+    sitemap that cannot be fetched is skipped after the entries read so far.
+
+    Args:
+        client: The HttpClient used for the requests.
+        sitemap_url: The URL of the sitemap.
+        modified_since: Entries whose <lastmod> is older than this datetime are skipped.
+        depth: The nesting level of the sitemap.
+
+    Yields:
+        The URLs of the pages listed in the sitemap.
+    """
+    nested_sitemaps = []
+    try:
+        with client.get(sitemap_url, stream=True) as response:
+            if response.status_code != 200:
+                return
+
+            parser = etree.XMLPullParser(events=('end',), resolve_entities=False, no_network=True, recover=True)
+            loc = lastmod = None
+            for chunk in iter_chunks(response):
+                parser.feed(chunk)
+                for _, element in parser.read_events():
+                    name = etree.QName(element).localname
+                    if name == 'loc':
+                        loc = (element.text or '').strip()
+                    elif name == 'lastmod':
+                        lastmod = parse_lastmod(element.text)
+                    elif name in ('url', 'sitemap'):
+                        if loc and not (modified_since and lastmod and lastmod < modified_since):
+                            if name == 'url':
+                                yield loc
+                            else:
+                                nested_sitemaps.append(loc)
+                        loc = lastmod = None
+                        element.clear()
+                        while element.getprevious() is not None:
+                            del element.getparent()[0]
+    except requests.RequestException as e:
+        logger.warning('Could not fetch sitemap %s: %r', sitemap_url, e)
+        return
+
+    if depth < SITEMAP_NESTING_LIMIT:
+        for nested_sitemap in nested_sitemaps:
+            yield from iter_sitemap(client, nested_sitemap, modified_since, depth + 1)
+
+
+def iter_site_urls(client, start_url, modified_since=None):
+    """
+    Stream the page URLs listed in all sitemaps of a site.
+
+    Args:
+        client: The HttpClient used for the requests.
+        start_url: A URL of the site.
+        modified_since: Entries whose <lastmod> is older than this datetime are skipped.
+
+    Yields:
+        The page URLs, at most CRAWLER_SITEMAP_MAX_URLS of them.
+    """
+    max_urls = getattr(settings, 'CRAWLER_SITEMAP_MAX_URLS', 100000)
+    count = 0
+    for sitemap_url in find_sitemaps(client, start_url):
+        for url in iter_sitemap(client, sitemap_url, modified_since):
+            yield url
+            count += 1
+            if count >= max_urls:
+                return
@@ -1,16 +1,40 @@
+import asyncio
+from functools import partial
+
 from celery import shared_task
+from celery.utils.log import get_task_logger
+from django.conf import settings
 from django.utils import timezone
 from django.utils.datetime_safe import datetime
 from django.utils.timezone import make_aware
 
-from api.models import WebsiteRecord, Execution, CrawledPage
+from api.models import WebsiteRecord, Execution, CrawledPage, CrawlCheckpoint, Deletion
+from .async_crawler import AsyncCrawler
 from .crawler import Crawler
+from .deletion import run_deletion
+from .distributed_crawler import DistributedCrawler
+from .retention import prune_executions
+from .site_lock import OVERLAP_POLICIES, SiteCrawlLock
 
 
-@shared_task
-def crawl_website(website_id):
+logger = get_task_logger(__name__)
+
+CRAWLER_ENGINES = {
+    'threads': Crawler,
+    'asyncio': AsyncCrawler,
+}
+
+
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True, max_retries=None)
+def crawl_website(self, website_id):
     """
     Task to crawl a website asynchronously.
+
+    An interrupted execution of the website that has a checkpoint is resumed
+    instead of starting a new one. The task is acknowledged only after it
+    finishes, so the broker redelivers it when the worker is killed mid-crawl.
+    Only one execution of a website runs at a time. Triggers arriving while it
+    runs are handled by the CRAWLER_OVERLAP_POLICY setting, see defer_crawl.
     
     Args:
         website_id: The ID of the WebsiteRecord object representing the website to crawl.
@@ -19,17 +43,250 @@ def crawl_website(website_id):
         The ID of the crawled website.
     """
     website_record = WebsiteRecord.objects.get(id=website_id)
-    execution = create_new_execution(website_record)
-    try:
-        crawler_instance = Crawler(website_record)
-        execute_crawl(crawler_instance, website_record.url, execution.id)
-        update_execution(execution, crawler_instance)
-    except Exception as e:
-        handle_crawl_error(execution, crawler_instance)
-        raise e
+    if website_record.deleting:
+        return website_id
+    lock = SiteCrawlLock(website_id)
+    if not lock.acquire():
+        return defer_crawl(self, website_id, lock)
+    if self.request.retries:
+        lock.clear_pending()
+
+    if getattr(settings, 'CRAWLER_DISTRIBUTED', False):
+        execution = None
+        try:
+            execution = find_resumable_execution(website_record) or create_new_execution(website_record)
+            start_distributed_crawl(website_record, execution, lock)
+        except Exception:
+            abort_distributed_crawl(website_record, execution, lock)
+            raise
+        return website_id
+
+    with lock:
+        execution = find_resumable_execution(website_record) or create_new_execution(website_record)
+        try:
+            crawler_instance = create_crawler(website_record)
+            lock.on_cancel = partial(crawler_instance.budget.stop, 'superseded')
+            execute_crawl(crawler_instance, website_record.url, execution.id)
+            update_execution(execution, crawler_instance)
+            logger.info('Execution %s HTTP stats: %s', execution.id, crawler_instance.http_stats())
+            logger.info('Execution %s frontier stats: %s', execution.id, crawler_instance.frontier.stats())
+            logger.info('Execution %s checkpoint stats: %s', execution.id, crawler_instance.checkpoint_stats)
+        except Exception as e:
+            handle_crawl_error(execution, crawler_instance)
+            raise e
     return website_id
 
 
+def defer_crawl(task, website_id, lock):
+    """
+    Handle a crawl trigger of a website that is already being crawled.
+
+    With the 'skip' policy the trigger is dropped. With 'queue' it is retried
+    until the running execution ends, and with 'supersede' the running
+    execution is also asked to stop early. At most one trigger per website
+    waits; further triggers are dropped while it does.
+    
+    Args:
+        task: The bound crawl_website task.
+        website_id: The ID of the WebsiteRecord object representing the website to crawl.
+        lock: The SiteCrawlLock of the website.
+    
+    Returns:
+        The ID of the website, if the trigger was dropped.
+    
+    Raises:
+        celery.exceptions.Retry: If the trigger waits for the lock.
+    """
+    policy = getattr(settings, 'CRAWLER_OVERLAP_POLICY', 'skip')
+    if policy not in OVERLAP_POLICIES:
+        raise ValueError(f'Unknown crawl overlap policy: {policy}')
+    if policy == 'skip' or not lock.claim_pending(task.request.retries > 0):
+        logger.info('Website %s is already being crawled, trigger dropped', website_id)
+        return website_id
+
+    if policy == 'supersede':
+        lock.supersede()
+    raise task.retry(countdown=getattr(settings, 'CRAWLER_SITE_LOCK_RETRY_DELAY', 10))
+
+
+def start_distributed_crawl(website_record, execution, lock):
+    """
+    Seed the shared frontier of a distributed execution and start its batch tasks.
+
+    The execution keeps running until the last crawl_batch task finds the
+    frontier drained with nothing in flight. The site lock stays held until then.
+    
+    Args:
+        website_record: The WebsiteRecord object representing the website to crawl.
+        execution: The Execution object associated with the crawling process.
+        lock: The acquired SiteCrawlLock of the website.
+    """
+    crawler_instance = DistributedCrawler(website_record, execution.id)
+    execution = crawler_instance.get_execution(execution.id)
+    execution.save()
+    spawn, finished = crawler_instance.start(website_record.url, execution, lock.token)
+    dispatch_batches(website_record.id, execution.id, spawn)
+    if finished:
+        finish_distributed_execution(execution, crawler_instance)
+
+
+def abort_distributed_crawl(website_record, execution, lock):
+    """
+    Fail a distributed execution that could not be started and release the site lock.
+
+    Batch tasks that were already started stop scheduling new batches, and
+    the last of them cleans the shared frontier up.
+    
+    Args:
+        website_record: The WebsiteRecord object representing the website to crawl.
+        execution: The Execution object, or None if it was not created.
+        lock: The acquired SiteCrawlLock of the website.
+    """
+    try:
+        if execution is not None:
+            DistributedCrawler(website_record, execution.id).frontier.mark_failed()
+            execution.status = 'failed'
+            execution.end_time = timezone.now()
+            execution.save()
+    finally:
+        lock.release()
+
+
+@shared_task(bind=True, acks_late=True, reject_on_worker_lost=True)
+def crawl_batch(self, website_id, execution_id):
+    """
+    Task to crawl one batch of URLs of a distributed execution.
+
+    Every batch starts as many follow-up batch tasks as the shared frontier
+    needs, up to CRAWLER_MAX_BATCH_TASKS running at the same time. Running
+    batches keep the site lock of the execution alive. The task is
+    acknowledged only after it finishes, so the broker delivers it again
+    when the worker is lost, and the URLs it claimed are queued again.
+    
+    Args:
+        website_id: The ID of the WebsiteRecord object representing the website to crawl.
+        execution_id: The ID of the execution shared by all workers.
+    
+    Returns:
+        The ID of the execution.
+    """
+    website_record = WebsiteRecord.objects.get(id=website_id)
+    execution = Execution.objects.get(id=execution_id)
+    crawler_instance = DistributedCrawler(website_record, execution_id)
+    if crawler_instance.frontier.is_settled(self.request.id):
+        return execution_id
+    lock = SiteCrawlLock(website_id, crawler_instance.frontier.get_state().get('lock_token'))
+    stop = partial(crawler_instance.budget.stop, 'superseded')
+    if not lock.refresh() or lock.is_cancelled():
+        stop()
+    lock.start_heartbeat(stop)
+    try:
+        crawler_instance.crawl_batch(execution)
+    except Exception:
+        crawler_instance.frontier.mark_failed()
+        raise
+    finally:
+        lock.stop_heartbeat()
+        spawn, finished = crawler_instance.finish_batch(execution, self.request.id)
+        dispatch_batches(website_id, execution_id, spawn)
+        if finished:
+            finish_distributed_execution(execution, crawler_instance)
+    return execution_id
+
+
+def dispatch_batches(website_id, execution_id, count):
+    """
+    Queue the specified number of crawl_batch tasks.
+    
+    Args:
+        website_id: The ID of the WebsiteRecord object representing the website to crawl.
+        execution_id: The ID of the execution shared by all workers.
+        count: The number of tasks to queue.
+    """
+    for _ in range(count):
+        crawl_batch.delay(website_id, execution_id)
+
+
+def finish_distributed_execution(execution, crawler_instance):
+    """
+    Store the totals of a distributed execution and delete its Redis keys.
+    
+    Args:
+        execution: The Execution object associated with the crawling process.
+        crawler_instance: A DistributedCrawler of the execution.
+    """
+    frontier = crawler_instance.frontier
+    state = frontier.get_state()
+    logger.info('Execution %s frontier stats: %s', execution.id, frontier.stats())
+    if 'failed' in state:
+        execution.status = 'failed'
+    elif state.get('stopped') == 'superseded':
+        execution.status = 'cancelled'
+    elif 'stopped' in state:
+        execution.status = 'budget_exhausted'
+    else:
+        execution.status = 'completed'
+    execution.end_time = timezone.now()
+    set_progress(execution, crawler_instance)
+    execution.save()
+    frontier.delete()
+    SiteCrawlLock(execution.website_record_id, state.get('lock_token')).release()
+
+
+def find_resumable_execution(website_record):
+    """
+    Find the latest execution of the website that was interrupted and can be resumed.
+
+    Failed executions with a checkpoint are resumable. So are running ones
+    whose checkpoint has not been refreshed for CRAWLER_CHECKPOINT_STALE_AFTER
+    seconds, as the worker that ran them is gone. An execution is resumed at
+    most CRAWLER_MAX_RESUMES times, so that an error that happens on every
+    attempt does not resume it forever. After that it is given up.
+    
+    Args:
+        website_record: The WebsiteRecord object representing the website to crawl.
+    
+    Returns:
+        The Execution object, or None if there is nothing to resume.
+    """
+    stale_after = getattr(settings, 'CRAWLER_CHECKPOINT_STALE_AFTER', 180)
+    max_resumes = getattr(settings, 'CRAWLER_MAX_RESUMES', 3)
+    execution = Execution.objects.filter(
+        website_record=website_record, deleting=False,
+    ).select_related('checkpoint').order_by('-id').first()
+    if execution is None or not hasattr(execution, 'checkpoint'):
+        return None
+    if execution.status == 'running':
+        age = (timezone.now() - execution.checkpoint.updated_at).total_seconds()
+        if age < stale_after:
+            return None
+    elif execution.status != 'failed':
+        return None
+
+    if execution.num_resumes >= max_resumes:
+        give_up_execution(execution)
+        return None
+    execution.num_resumes += 1
+    Execution.objects.filter(id=execution.id).update(num_resumes=execution.num_resumes)
+    return execution
+
+
+def give_up_execution(execution):
+    """
+    Leave an interrupted execution that can no longer be resumed as failed.
+
+    Its checkpoint is deleted, so the next crawl of the website starts a new execution.
+    
+    Args:
+        execution: The Execution object.
+    """
+    logger.warning('Execution %s was resumed %s times, giving up', execution.id, execution.num_resumes)
+    execution.status = 'failed'
+    execution.end_time = timezone.now()
+    execution.save()
+    CrawlCheckpoint.objects.filter(execution=execution).delete()
+
+
 def create_new_execution(website_record):
     """
     Create a new execution for the website crawling process.
@@ -50,30 +307,59 @@ def create_new_execution(website_record):
     return execution
 
 
+def create_crawler(website_record):
+    """
+    Create the crawler for the engine selected by the CRAWLER_ENGINE setting.
+    
+    Args:
+        website_record: The WebsiteRecord object representing the website to crawl.
+    
+    Returns:
+        The Crawler or AsyncCrawler instance.
+    """
+    engine = getattr(settings, 'CRAWLER_ENGINE', 'threads')
+    return CRAWLER_ENGINES[engine](website_record)
+
+
 def execute_crawl(crawler_instance, url, ex_id):
     """
     Execute the crawling process using the Crawler instance.
+
+    Crawlers of the asyncio engine are driven by a fresh event loop.
     
     Args:
         crawler_instance: The Crawler instance for crawling the website.
         url: The starting URL for the crawling process.
         ex_id: The ID of the execution associated with the crawling process.
     """
-    crawler_instance.crawl(url, ex_id)
+    if asyncio.iscoroutinefunction(crawler_instance.crawl):
+        asyncio.run(crawler_instance.crawl(url, ex_id))
+    else:
+        crawler_instance.crawl(url, ex_id)
 
 
 def update_execution(execution, crawler_instance):
     """
     Update the execution details after the crawling process is completed.
+
+    Executions stopped by the crawl budget keep their partial results
+    and end in the 'budget_exhausted' status, superseded ones in 'cancelled'.
     
     Args:
         execution: The Execution object associated with the crawling process.
         crawler_instance: The Crawler instance used for crawling.
     """
-    execution.status = 'completed'
+    if crawler_instance.budget.exhausted == 'superseded':
+        execution.status = 'cancelled'
+    elif crawler_instance.budget.exhausted:
+        execution.status = 'budget_exhausted'
+    else:
+        execution.status = 'completed'
     execution.end_time = timezone.now()
-    execution.num_sites_crawled = crawler_instance.num_crawled
+    set_progress(execution, crawler_instance)
+    execution.host_stats = crawler_instance.throttle.stats()
     execution.save()
+    CrawlCheckpoint.objects.filter(execution=execution).delete()
 
 
 def handle_crawl_error(execution, crawler_instance):
@@ -87,5 +373,74 @@ def handle_crawl_error(execution, crawler_instance):
     execution.status = 'failed'
     execution.start_time = make_aware(datetime.now())
     execution.end_time = None
-    execution.num_sites_crawled = crawler_instance.num_crawled
+    set_progress(execution, crawler_instance)
+    execution.host_stats = crawler_instance.throttle.stats()
     execution.save()
+
+
+def set_progress(execution, crawler_instance):
+    """
+    Copy the final progress counters of the crawler to the execution.
+    
+    Args:
+        execution: The Execution object associated with the crawling process.
+        crawler_instance: The Crawler instance used for crawling.
+    """
+    for name, value in crawler_instance.get_progress(final=True).items():
+        setattr(execution, name, value)
+    execution.progress_updated_at = timezone.now()
+
+
+@shared_task
+def prune_old_executions(dry_run=False):
+    """
+    Task deleting the executions that the retention policy does not keep.
+
+    Args:
+        dry_run: Only report what would be deleted.
+
+    Returns:
+        The report of prune_executions.
+    """
+    report = prune_executions(dry_run=dry_run)
+    logger.info('%s executions: %s', 'Would prune' if dry_run else 'Pruned', report)
+    return report
+
+
+@shared_task(bind=True, acks_late=True, max_retries=None)
+def delete_records(self, deletion_id):
+    """
+    Task deleting a website record or an execution marked for deletion.
+
+    The deletion holds the crawl lock of the website, so that no crawl writes
+    the pages being deleted. While the website is crawled, the task is retried
+    every CRAWLER_DELETION_RETRY_DELAY seconds, and a crawl of the deleted
+    records is asked to stop.
+
+    Args:
+        deletion_id: The ID of the Deletion object.
+
+    Returns:
+        The ID of the deletion.
+    """
+    deletion = Deletion.objects.get(id=deletion_id)
+    if deletion.status == 'completed':
+        return deletion_id
+    lock = SiteCrawlLock(deletion.website_record_id)
+    if not lock.acquire():
+        if deletion.target == 'website_record' or Execution.objects.filter(
+            id=deletion.target_id, status__in=('pending', 'running'),
+        ).exists():
+            lock.supersede()
+        raise self.retry(countdown=getattr(settings, 'CRAWLER_DELETION_RETRY_DELAY', 10))
+
+    with lock:
+        try:
+            run_deletion(deletion)
+        except Exception as e:
+            Deletion.objects.filter(id=deletion_id).update(
+                status='failed', error=str(e), end_time=timezone.now(),
+            )
+            raise e
+    logger.info('Deletion %s of %s %s done', deletion_id, deletion.target, deletion.target_id)
+    return deletion_id
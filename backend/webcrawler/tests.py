@@ -0,0 +1,978 @@
+import threading
+import time
+import unittest
+import uuid
+import gzip
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import redis
+from asgiref.sync import async_to_sync
+from celery.exceptions import Retry
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+from api.models import WebsiteRecord, Execution, CrawledPage, CrawlCheckpoint, DeletedPage, Link
+from .async_crawler import AsyncCrawler
+from .budget import CrawlBudget
+from .checkpoint import save_checkpoint
+from .crawler import Crawler
+from .extraction import extract_title_and_links, extract_with_lxml, extract_with_soup
+from .frontier import Frontier
+from .http_client import HttpClient
+from .management.commands.benchmark_extraction import FIXTURES_DIR
+from .redis_frontier import RedisFrontier, get_redis
+from .retention import RetentionPolicy, prune_executions
+from .site_lock import SiteCrawlLock
+from .sitemap import find_sitemaps, iter_site_urls
+from .tasks import crawl_batch, crawl_website, defer_crawl, find_resumable_execution, update_execution
+from .throttle import HostConcurrencyController
+from .writer import PageWriter
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    """
+    Serves the pages of the test site. The page at /slow answers after one second,
+    the others after `delay` seconds, and /streamed is sent without a Content-Length.
+    The pages in validators are sent with these ETag and Last-Modified headers and
+    answered with 304 Not Modified when a request carries a matching validator.
+    The highest number of requests served at the same time is kept in max_active,
+    the requested paths in requested and the conditional headers of the last
+    request of each path in conditional_headers.
+    """
+    lock = threading.Lock()
+    delay = 0
+    active = 0
+    max_active = 0
+    requested = set()
+    conditional_headers = {}
+    conditions = {'If-None-Match': 'ETag', 'If-Modified-Since': 'Last-Modified'}
+    validators = {}
+    pages = {
+        '/': '<title>Home</title><a href="/a">a</a><a href="/slow">slow</a><a href="/b">b</a>',
+        '/a': '<title>A</title><a href="/">home</a>',
+        '/b': '<title>B</title>',
+        '/slow': '<title>Slow</title>',
+        '/files': (
+            '<title>Files</title><a href="/data">data</a><a href="/big">big</a>'
+            '<a href="/streamed">streamed</a><a href="/report.pdf">report</a>'
+        ),
+        '/big': '<title>Big</title>' + 'x' * 2000,
+        '/streamed': '<title>Streamed</title>' + 'x' * 2000,
+        '/data': '{}',
+        '/report.pdf': '{}',
+    }
+    content_types = {
+        '/data': 'application/json',
+        '/report.pdf': 'application/pdf',
+    }
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+            cls.requested.add(self.path)
+        try:
+            self.send_page()
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+    def send_page(self):
+        page = self.pages.get(self.path)
+        if page is None:
+            self.send_error(404)
+            return
+        validators = self.validators.get(self.path, {})
+        received = {name: self.headers[name] for name in self.conditions if name in self.headers}
+        with self.lock:
+            self.conditional_headers[self.path] = received
+        body = page if isinstance(page, bytes) else page.encode()
+        time.sleep(1 if self.path == '/slow' else self.delay)
+        if any(validators.get(self.conditions[name]) == value for name, value in received.items()):
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', self.content_types.get(self.path, 'text/html; charset=utf-8'))
+        for name, value in validators.items():
+            self.send_header(name, value)
+        if self.path != '/streamed':
+            self.send_header('Content-Length', str(len(body)))
+        else:
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class KeepAliveSiteHandler(SiteHandler):
+    """
+    Serves the test site over HTTP/1.1, keeping connections open between requests.
+    """
+    protocol_version = 'HTTP/1.1'
+
+
+class ExtractionTests(SimpleTestCase):
+    def test_lxml_and_soup_extract_the_same_title_and_links_from_the_fixtures(self):
+        fixtures = sorted(FIXTURES_DIR.glob('*.html'))
+        self.assertTrue(fixtures)
+        for path in fixtures:
+            with self.subTest(path.name):
+                html = path.read_text(encoding='utf-8', errors='replace')
+                self.assertEqual(extract_with_lxml(html), extract_with_soup(html))
+
+    def test_documents_lxml_cannot_parse_fall_back_to_soup(self):
+        # A lone surrogate cannot be encoded for lxml.
+        html = '<title>Broken</title>\ud800<a href="/a">a</a>'
+        with self.assertRaises(ValueError):
+            extract_with_lxml(html)
+
+        with mock.patch('webcrawler.extraction.extract_with_soup', wraps=extract_with_soup) as fallback:
+            self.assertEqual(extract_title_and_links(html, 'lxml'), ('Broken', ['/a']))
+        fallback.assert_called_once_with(html)
+
+
+class SiteServerMixin:
+    """
+    Runs the test site on a local port for the duration of the test case.
+    """
+    handler = SiteHandler
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), cls.handler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def create_website_record(self, **kwargs):
+        return WebsiteRecord.objects.create(
+            url=f'{self.base_url}/',
+            boundary_regexp=rf'{self.base_url}/.*',
+            periodicity='day',
+            label='test',
+            active=False,
+            tags=[],
+            **kwargs,
+        )
+
+
+@override_settings(CRAWLER_PUBLISH_EVENTS=False, CRAWLER_REQUEST_TIMEOUT=0.2, CRAWLER_CHECKPOINT_INTERVAL=0)
+class CrawlErrorTests(SiteServerMixin, TransactionTestCase):
+    def crawl(self, engine):
+        website_record = self.create_website_record()
+        execution = Execution.objects.create(website_record=website_record)
+        crawler = engine(website_record)
+        if engine is AsyncCrawler:
+            async_to_sync(crawler.crawl)(website_record.url, execution.id)
+        else:
+            crawler.crawl(website_record.url, execution.id)
+        return crawler
+
+    def assert_crawl_finished(self, crawler):
+        titles = dict(CrawledPage.objects.values_list('url', 'title'))
+        self.assertEqual(titles[f'{self.base_url}/a'], 'A')
+        self.assertEqual(titles[f'{self.base_url}/b'], 'B')
+        self.assertIsNone(titles[f'{self.base_url}/slow'])
+        self.assertEqual(crawler.num_crawled, 3)
+        self.assertEqual(crawler.num_failed, 1)
+        self.assertEqual(crawler.get_progress()['num_pages_failed'], 1)
+
+    def test_timed_out_page_does_not_fail_the_crawl(self):
+        self.assert_crawl_finished(self.crawl(Crawler))
+
+    def test_timed_out_page_does_not_fail_the_async_crawl(self):
+        self.assert_crawl_finished(self.crawl(AsyncCrawler))
+
+
+@override_settings(CRAWLER_PUBLISH_EVENTS=False, CRAWLER_CHECKPOINT_INTERVAL=0, CRAWLER_MAX_BODY_SIZE=1000)
+class ContentGatingTests(SiteServerMixin, TransactionTestCase):
+    def crawl(self, engine):
+        SiteHandler.requested.clear()
+        website_record = self.create_website_record()
+        execution = Execution.objects.create(website_record=website_record)
+        crawler = engine(website_record)
+        if engine is AsyncCrawler:
+            async_to_sync(crawler.crawl)(f'{self.base_url}/files', execution.id)
+        else:
+            crawler.crawl(f'{self.base_url}/files', execution.id)
+        return crawler
+
+    def assert_bodies_rejected(self, crawler):
+        pages = {
+            url[len(self.base_url):]: (title, status_code)
+            for url, title, status_code in CrawledPage.objects.values_list('url', 'title', 'status_code')
+        }
+        self.assertEqual(pages['/files'], ('Files', 200))
+        for path in ('/data', '/big', '/streamed'):
+            self.assertEqual(pages[path], (None, 200))
+        self.assertNotIn('/report.pdf', SiteHandler.requested)
+        self.assertEqual(crawler.num_crawled, 4)
+        self.assertEqual(crawler.num_failed, 0)
+
+    def test_non_html_and_oversized_bodies_are_rejected(self):
+        self.assert_bodies_rejected(self.crawl(Crawler))
+
+    def test_non_html_and_oversized_bodies_are_rejected_by_the_async_crawl(self):
+        self.assert_bodies_rejected(self.crawl(AsyncCrawler))
+
+
+@override_settings(CRAWLER_PUBLISH_EVENTS=False)
+class SitemapTests(SiteServerMixin, TransactionTestCase):
+    # Nothing listens on this port, so its requests fail
+    unreachable_url = 'http://127.0.0.1:1'
+
+    def setUp(self):
+        pages = gzip.compress(f'''<?xml version="1.0" encoding="UTF-8"?>
+            <urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+              <url><loc>{self.base_url}/a</loc><lastmod>2020-01-01</lastmod></url>
+              <url><loc>{self.base_url}/b</loc><lastmod>2030-01-01T00:00:00+00:00</lastmod></url>
+              <url><loc>https://other.example.com/</loc></url>
+              <url><loc>{self.base_url}/c</loc></url>
+            </urlset>'''.encode())
+        index = f'''<?xml version="1.0" encoding="UTF-8"?>
+            <sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+              <sitemap><loc>{self.unreachable_url}/sitemap.xml</loc></sitemap>
+              <sitemap><loc>{self.base_url}/pages.xml.gz</loc></sitemap>
+              <sitemap><loc>{self.base_url}/missing.xml</loc></sitemap>
+            </sitemapindex>'''
+        robots = 'User-agent: *\nDisallow:\nSitemap: /sitemap_index.xml\n'
+        patcher = mock.patch.dict(
+            SiteHandler.pages, {'/robots.txt': robots, '/sitemap_index.xml': index, '/pages.xml.gz': pages}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get_site_urls(self, start_url, modified_since=None):
+        with HttpClient(1) as client:
+            return list(iter_site_urls(client, start_url, modified_since))
+
+    def test_sitemaps_are_listed_by_robots_txt(self):
+        with HttpClient(1) as client:
+            self.assertEqual(find_sitemaps(client, f'{self.base_url}/a'), [f'{self.base_url}/sitemap_index.xml'])
+
+    def test_nested_gzipped_sitemaps_are_read(self):
+        self.assertEqual(
+            self.get_site_urls(self.base_url),
+            [f'{self.base_url}/a', f'{self.base_url}/b', 'https://other.example.com/', f'{self.base_url}/c'],
+        )
+
+    def test_entries_modified_before_the_previous_crawl_are_skipped(self):
+        modified_since = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        self.assertEqual(
+            self.get_site_urls(self.base_url, modified_since),
+            [f'{self.base_url}/b', 'https://other.example.com/', f'{self.base_url}/c'],
+        )
+
+    def test_unreachable_site_has_no_entries(self):
+        with HttpClient(1) as client:
+            self.assertEqual(find_sitemaps(client, self.unreachable_url), [f'{self.unreachable_url}/sitemap.xml'])
+        self.assertEqual(self.get_site_urls(self.unreachable_url), [])
+
+    def test_entries_outside_the_boundary_are_not_queued(self):
+        website_record = self.create_website_record(use_sitemaps=True)
+        execution = Execution.objects.create(website_record=website_record)
+        crawler = Crawler(website_record)
+
+        crawler.seed_from_sitemaps(website_record.url, execution)
+
+        queued = set()
+        while crawler.frontier:
+            queued.add(crawler.frontier.pop())
+        self.assertEqual(queued, {(f'{self.base_url}/{path}', 1) for path in 'abc'})
+
+
+@override_settings(CRAWLER_PUBLISH_EVENTS=False, CRAWLER_CHECKPOINT_INTERVAL=0, CRAWLER_HOST_INITIAL_CONCURRENCY=4)
+class ConcurrentCrawlTests(SiteServerMixin, TransactionTestCase):
+    def test_pages_are_fetched_concurrently(self):
+        SiteHandler.max_active = 0
+        SiteHandler.delay = 0.2
+        self.addCleanup(setattr, SiteHandler, 'delay', 0)
+        website_record = self.create_website_record()
+        execution = Execution.objects.create(website_record=website_record)
+
+        crawler = Crawler(website_record, concurrency=4)
+        crawler.crawl(website_record.url, execution.id)
+
+        # /a, /b and /slow are fetched at the same time
+        self.assertGreater(SiteHandler.max_active, 1)
+        self.assertEqual(crawler.num_crawled, 4)
+        titles = {url[len(self.base_url):]: title for url, title in CrawledPage.objects.values_list('url', 'title')}
+        self.assertEqual(titles, {'/': 'Home', '/a': 'A', '/b': 'B', '/slow': 'Slow'})
+
+
+class CrawlBudgetTests(SimpleTestCase):
+    def create_budget(self, **limits):
+        return CrawlBudget(WebsiteRecord(**{
+            'max_pages': None, 'max_depth': None, 'max_bytes': None, 'max_duration': None, **limits
+        }))
+
+    def test_unbounded_budget_is_never_exhausted(self):
+        budget = self.create_budget()
+        budget.add_page()
+        budget.add_bytes(10 ** 9)
+
+        self.assertTrue(budget.allows_depth(100))
+        self.assertFalse(budget.is_exhausted())
+
+    def test_page_and_byte_limits(self):
+        budget = self.create_budget(max_pages=2, max_bytes=100)
+        budget.add_page()
+        budget.add_bytes(99)
+        self.assertFalse(budget.is_exhausted())
+
+        budget.add_bytes(1)
+        self.assertTrue(budget.is_exhausted())
+        budget.add_page()
+        self.assertEqual(budget.exhausted, 'max_bytes')
+
+    def test_depth_and_duration_limits(self):
+        budget = self.create_budget(max_depth=1, max_duration=60)
+        self.assertTrue(budget.allows_depth(1))
+        self.assertFalse(budget.allows_depth(2))
+        self.assertFalse(budget.is_exhausted())
+
+        budget.restore({'num_pages': 0, 'num_bytes': 0, 'elapsed': 60})
+        self.assertTrue(budget.is_exhausted())
+        self.assertEqual(budget.exhausted, 'max_duration')
+
+    def test_stop_keeps_the_first_reason(self):
+        budget = self.create_budget()
+        budget.stop('superseded')
+        budget.stop('max_pages')
+
+        self.assertTrue(budget.is_exhausted())
+        self.assertEqual(budget.exhausted, 'superseded')
+
+
+@override_settings(CRAWLER_PUBLISH_EVENTS=False, CRAWLER_CHECKPOINT_INTERVAL=0)
+class BudgetCrawlTests(SiteServerMixin, TransactionTestCase):
+    def crawl(self, **limits):
+        website_record = self.create_website_record(**limits)
+        execution = Execution.objects.create(website_record=website_record)
+        crawler = Crawler(website_record, concurrency=1)
+        crawler.crawl(website_record.url, execution.id)
+        update_execution(execution, crawler)
+        execution.refresh_from_db()
+        return execution
+
+    def test_crawl_stops_at_max_pages(self):
+        execution = self.crawl(max_pages=2)
+
+        self.assertEqual(execution.status, 'budget_exhausted')
+        crawled = CrawledPage.objects.exclude(title=None).values_list('url', flat=True)
+        self.assertEqual(len(crawled), 2)
+        self.assertIn(f'{self.base_url}/', crawled)
+
+    def test_links_deeper_than_max_depth_are_not_crawled(self):
+        execution = self.crawl(max_depth=0)
+
+        self.assertEqual(execution.status, 'completed')
+        crawled = CrawledPage.objects.exclude(title=None).values_list('url', flat=True)
+        self.assertEqual(list(crawled), [f'{self.base_url}/'])
+
+
+@override_settings(CRAWLER_PUBLISH_EVENTS=False, CRAWLER_CHECKPOINT_INTERVAL=0)
+class ConnectionReuseTests(SiteServerMixin, TransactionTestCase):
+    handler = KeepAliveSiteHandler
+
+    def test_connections_are_reused_across_pages(self):
+        website_record = self.create_website_record()
+        execution = Execution.objects.create(website_record=website_record)
+        for engine in (Crawler, AsyncCrawler):
+            with self.subTest(engine.__name__):
+                crawler = engine(website_record, concurrency=1)
+                if engine is AsyncCrawler:
+                    async_to_sync(crawler.crawl)(website_record.url, execution.id)
+                else:
+                    crawler.crawl(website_record.url, execution.id)
+                stats = crawler.http_stats()
+                self.assertEqual(stats['requests'], 4)
+                self.assertGreater(stats['pool_hits'], 0)
+
+
+@override_settings(CRAWLER_PUBLISH_EVENTS=False, CRAWLER_CHECKPOINT_INTERVAL=0, CRAWLER_PROGRESS_INTERVAL=0)
+class ProgressTests(SiteServerMixin, TransactionTestCase):
+    def test_progress_counters_are_written_while_crawling(self):
+        website_record = self.create_website_record()
+        execution = Execution.objects.create(website_record=website_record)
+        rows = []
+
+        def read_execution_row(execution):
+            rows.append(Execution.objects.values(
+                'num_sites_crawled', 'num_pages_queued', 'num_bytes', 'progress_updated_at',
+            ).get(id=execution.id))
+
+        with mock.patch('webcrawler.crawler.publish_execution', side_effect=read_execution_row):
+            Crawler(website_record, concurrency=1).crawl(website_record.url, execution.id)
+
+        # The first report follows the home page, whose three links are still queued.
+        self.assertEqual(rows[0]['num_sites_crawled'], 1)
+        self.assertEqual(rows[0]['num_pages_queued'], 3)
+        self.assertEqual(rows[0]['num_bytes'], len(SiteHandler.pages['/']))
+        self.assertIsNotNone(rows[0]['progress_updated_at'])
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[-1]['num_pages_queued'], 0)
+        num_bytes = sum(len(SiteHandler.pages[path]) for path in ('/', '/a', '/b', '/slow'))
+        self.assertEqual(rows[-1]['num_bytes'], num_bytes)
+        self.assertLess(rows[0]['progress_updated_at'], rows[-1]['progress_updated_at'])
+
+
+@override_settings(CRAWLER_PUBLISH_EVENTS=False, CRAWLER_CHECKPOINT_INTERVAL=0)
+class UnchangedPageTests(SiteServerMixin, TransactionTestCase):
+    def crawl(self, website_record):
+        execution = Execution.objects.create(website_record=website_record)
+        crawler = Crawler(website_record)
+        crawler.crawl(website_record.url, execution.id)
+        update_execution(execution, crawler)
+        execution.refresh_from_db()
+        return execution
+
+    def test_unchanged_pages_are_not_parsed_again(self):
+        website_record = self.create_website_record()
+        first = self.crawl(website_record)
+        self.assertEqual((first.num_pages_reprocessed, first.num_pages_skipped), (4, 0))
+        pages = {page.url: page for page in CrawledPage.objects.all()}
+        links = list(Link.objects.order_by('id').values_list('id', 'from_page_id', 'to_page_id'))
+
+        with mock.patch.object(CrawledPage, 'bulk_set_links', wraps=CrawledPage.bulk_set_links) as bulk_set_links:
+            second = self.crawl(website_record)
+
+        self.assertEqual((second.num_pages_reprocessed, second.num_pages_skipped), (0, 4))
+        self.assertEqual(second.num_sites_crawled, 4)
+        self.assertFalse(any(call.args[0] for call in bulk_set_links.call_args_list))
+        self.assertEqual(list(Link.objects.order_by('id').values_list('id', 'from_page_id', 'to_page_id')), links)
+        for page in CrawledPage.objects.all():
+            self.assertEqual(page.execution_id, first.id)
+            self.assertEqual(page.updated_at, pages[page.url].updated_at)
+            self.assertGreater(page.crawl_time, pages[page.url].crawl_time)
+
+    @mock.patch.dict(SiteHandler.conditional_headers)
+    @mock.patch.dict(SiteHandler.validators, {
+        '/': {'ETag': '"home-1"'},
+        '/a': {'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT'},
+    })
+    def test_recrawl_sends_the_stored_validators(self):
+        website_record = self.create_website_record()
+        self.crawl(website_record)
+        self.assertEqual(SiteHandler.conditional_headers['/'], {})
+        SiteHandler.requested.clear()
+
+        second = self.crawl(website_record)
+
+        self.assertEqual(SiteHandler.conditional_headers['/'], {'If-None-Match': '"home-1"'})
+        self.assertEqual(
+            SiteHandler.conditional_headers['/a'], {'If-Modified-Since': 'Wed, 21 Oct 2015 07:28:00 GMT'}
+        )
+        self.assertEqual(SiteHandler.conditional_headers['/b'], {})
+        # The links stored for the home page are followed although its body was not sent.
+        self.assertEqual(SiteHandler.requested, {'/', '/a', '/b', '/slow'})
+        self.assertEqual((second.status, second.num_sites_crawled, second.num_pages_skipped), ('completed', 4, 4))
+        home = CrawledPage.objects.get(url=f'{self.base_url}/')
+        self.assertEqual((home.status_code, home.title, home.etag), (304, 'Home', '"home-1"'))
+
+
+@override_settings(CRAWLER_PUBLISH_EVENTS=False, CRAWLER_CHECKPOINT_INTERVAL=0, CRAWLER_GRAPH_DELTA_OVERLAP=0)
+class RecrawlDeltaTests(SiteServerMixin, TransactionTestCase):
+    QUERY = '''
+        query ($since: String, $webPages: [ID!]) {
+          delta(since: $since, webPages: $webPages) { cursor nodes { url } removed }
+        }
+    '''
+
+    def setUp(self):
+        self.website_record = self.create_website_record()
+
+    def crawl(self):
+        execution = Execution.objects.create(website_record=self.website_record)
+        Crawler(self.website_record).crawl(self.website_record.url, execution.id)
+
+    def get_delta(self, since=None):
+        variables = {'since': since, 'webPages': [self.website_record.id]}
+        response = self.client.post(
+            '/api/graphql/', {'query': self.QUERY, 'variables': variables}, content_type='application/json'
+        )
+        self.assertNotIn('errors', response.json())
+        return response.json()['data']['delta']
+
+    def test_recrawl_of_an_unchanged_site_has_an_empty_delta(self):
+        self.crawl()
+        cursor = self.get_delta()['cursor']
+
+        self.crawl()
+
+        self.assertEqual(self.get_delta(cursor), {'cursor': mock.ANY, 'nodes': [], 'removed': []})
+
+    def test_recrawl_returns_the_pages_whose_title_changed(self):
+        self.crawl()
+        cursor = self.get_delta()['cursor']
+
+        with mock.patch.dict(SiteHandler.pages, {'/b': '<title>New B</title>'}):
+            self.crawl()
+
+        self.assertEqual(self.get_delta(cursor)['nodes'], [{'url': f'{self.base_url}/b'}])
+
+
+@override_settings(CRAWLER_PUBLISH_EVENTS=False, CRAWLER_CHECKPOINT_INTERVAL=0, CRAWLER_MAX_RESUMES=2)
+class ResumeTests(SiteServerMixin, TransactionTestCase):
+    def create_interrupted_execution(self, status='failed', num_resumes=0):
+        """
+        Creates an execution interrupted after crawling the home page, with /b left in its frontier.
+        """
+        website_record = self.create_website_record()
+        execution = Execution.objects.create(website_record=website_record, status=status, num_resumes=num_resumes)
+        crawler = Crawler(website_record)
+        crawler.frontier.push(f'{self.base_url}/')
+        crawler.frontier.pop()
+        crawler.frontier.push(f'{self.base_url}/b', 1)
+        state = {
+            'frontier': crawler.frontier.snapshot(),
+            'budget': crawler.budget.snapshot(),
+            'num_crawled': 1,
+            'num_skipped': 0,
+            'num_reprocessed': 0,
+            'num_failed': 0,
+        }
+        save_checkpoint(execution, state, time.monotonic())
+        return execution
+
+    def test_failed_execution_is_resumed_from_its_checkpoint(self):
+        execution = self.create_interrupted_execution()
+        start_time = execution.start_time
+
+        self.assertEqual(find_resumable_execution(execution.website_record), execution)
+        crawler = Crawler(execution.website_record)
+        crawler.crawl(execution.website_record.url, execution.id)
+
+        execution.refresh_from_db()
+        self.assertEqual(execution.num_resumes, 1)
+        self.assertEqual(execution.start_time, start_time)
+        self.assertEqual(list(CrawledPage.objects.values_list('url', flat=True)), [f'{self.base_url}/b'])
+        self.assertEqual(crawler.num_crawled, 2)
+
+    def test_running_execution_is_resumed_once_its_checkpoint_is_stale(self):
+        execution = self.create_interrupted_execution(status='running')
+
+        self.assertIsNone(find_resumable_execution(execution.website_record))
+        with self.settings(CRAWLER_CHECKPOINT_STALE_AFTER=0):
+            self.assertEqual(find_resumable_execution(execution.website_record), execution)
+
+    def test_execution_is_given_up_after_max_resumes(self):
+        execution = self.create_interrupted_execution(num_resumes=2)
+
+        self.assertIsNone(find_resumable_execution(execution.website_record))
+
+        execution.refresh_from_db()
+        self.assertEqual(execution.status, 'failed')
+        self.assertIsNotNone(execution.end_time)
+        self.assertFalse(CrawlCheckpoint.objects.filter(execution=execution).exists())
+        self.assertIsNone(find_resumable_execution(execution.website_record))
+
+
+@override_settings(CRAWLER_PUBLISH_EVENTS=False, CRAWLER_SNAPSHOTS=False)
+class PageWriterTests(TransactionTestCase):
+    def setUp(self):
+        website_record = WebsiteRecord.objects.create(
+            url='https://example.com/',
+            boundary_regexp='https://example.com/.*',
+            periodicity='day',
+            label='example',
+            active=False,
+            tags=[],
+        )
+        self.execution = Execution.objects.create(website_record=website_record)
+
+    def wait_for_pages(self, count, timeout=5):
+        deadline = time.monotonic() + timeout
+        while CrawledPage.objects.count() < count and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return CrawledPage.objects.count()
+
+    def test_full_batch_is_saved_before_the_flush_interval(self):
+        with PageWriter(self.execution, batch_size=2, flush_interval=60) as writer:
+            writer.put('https://example.com/', {'title': 'Home'}, None)
+            writer.put('https://example.com/a', {'title': 'A'}, None)
+            self.assertEqual(self.wait_for_pages(2), 2)
+
+            writer.put('https://example.com/b', {'title': 'B'}, None)
+            time.sleep(0.2)
+            self.assertEqual(CrawledPage.objects.count(), 2)
+        self.assertEqual(CrawledPage.objects.count(), 3)
+
+    def test_partial_batch_is_saved_after_the_flush_interval(self):
+        with PageWriter(self.execution, batch_size=100, flush_interval=0.1) as writer:
+            writer.put('https://example.com/', {'title': 'Home'}, None)
+            self.assertEqual(self.wait_for_pages(1), 1)
+
+    def test_sync_saves_queued_pages_and_links(self):
+        with PageWriter(self.execution, batch_size=100, flush_interval=60) as writer:
+            writer.put('https://example.com/', {'title': 'Home'}, {'https://example.com/a'})
+            writer.put('https://example.com/a', {'title': 'A'}, set())
+            writer.sync()
+
+            titles = dict(CrawledPage.objects.values_list('url', 'title'))
+            self.assertEqual(titles, {'https://example.com/': 'Home', 'https://example.com/a': 'A'})
+            self.assertEqual(
+                list(Link.objects.values_list('from_page__url', 'to_page__url')),
+                [('https://example.com/', 'https://example.com/a')],
+            )
+
+    def test_writer_error_is_raised_on_close(self):
+        writer = PageWriter(self.execution, batch_size=1, flush_interval=60)
+        with mock.patch.object(CrawledPage, 'bulk_save_pages', side_effect=RuntimeError('database is gone')):
+            writer.put('https://example.com/', {'title': 'Home'}, None)
+            with self.assertRaisesMessage(RuntimeError, 'database is gone'):
+                writer.close()
+        with self.assertRaises(RuntimeError):
+            writer.put('https://example.com/a', {'title': 'A'}, None)
+
+
+class RedisMixin:
+    """
+    Runs the test case against the Redis server of the crawler, and skips it if there is none.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        try:
+            get_redis().ping()
+        except redis.ConnectionError:
+            raise unittest.SkipTest('Redis is not available')
+        super().setUpClass()
+
+
+class RedisFrontierTests(RedisMixin, SimpleTestCase):
+    def setUp(self):
+        self.frontier = RedisFrontier(get_redis(), f'test-{uuid.uuid4().hex}', r'https://example\.com/.*')
+        self.frontier.start()
+        self.addCleanup(self.frontier.delete)
+
+    def test_urls_of_a_task_are_settled_once(self):
+        self.frontier.extend(['https://example.com/a'])
+        self.assertEqual(self.frontier.schedule(), (1, False))
+        claimed = self.frontier.claim(10)
+
+        self.assertEqual(self.frontier.schedule(claimed, 'task'), (0, True))
+        self.assertTrue(self.frontier.is_settled('task'))
+        self.assertEqual(self.frontier.schedule(claimed, 'task'), (0, False))
+
+    def test_urls_of_a_lost_task_are_queued_again(self):
+        self.frontier.extend(['https://example.com/a', 'https://example.com/b'])
+        self.assertEqual(self.frontier.schedule(batch_size=2), (1, False))
+        self.frontier.claim(2)
+
+        # The task is delivered again and ends without claiming anything
+        self.assertEqual(self.frontier.schedule((), 'task', batch_size=2), (1, False))
+        self.assertEqual(
+            sorted(self.frontier.claim(2)), [('https://example.com/a', 0), ('https://example.com/b', 0)]
+        )
+
+    @override_settings(CRAWLER_BATCH_LEASE=0)
+    def test_urls_whose_lease_expired_are_queued_again(self):
+        self.frontier.lease = 0
+        self.frontier.extend(['https://example.com/a', 'https://example.com/b'])
+
+        self.assertEqual(self.frontier.claim(1), [('https://example.com/a', 0)])
+        self.assertEqual(self.frontier.claim(2), [('https://example.com/b', 0), ('https://example.com/a', 0)])
+        self.assertEqual(self.frontier.get_state()['pages'], '2')
+
+
+class SiteCrawlLockTests(RedisMixin, SimpleTestCase):
+    def setUp(self):
+        self.website_id = f'test-{uuid.uuid4().hex}'
+        self.holder = self.create_lock()
+        self.assertTrue(self.holder.acquire())
+
+    def create_lock(self, **kwargs):
+        lock = SiteCrawlLock(self.website_id, **kwargs)
+        self.addCleanup(lock.client.delete, lock.lock_key, lock.cancel_key, lock.pending_key)
+        return lock
+
+    def create_task(self, retries=0):
+        task = mock.Mock()
+        task.request.retries = retries
+        task.retry.return_value = Retry()
+        return task
+
+    def test_lock_is_held_by_one_trigger(self):
+        other = self.create_lock()
+        self.assertFalse(other.acquire())
+
+        other.release()
+        self.assertFalse(other.acquire())
+        self.assertTrue(self.holder.refresh())
+
+        self.holder.release()
+        self.assertFalse(self.holder.refresh())
+        self.assertTrue(other.acquire())
+
+    def test_superseded_holder_is_cancelled(self):
+        self.create_lock().supersede()
+        self.assertTrue(self.holder.is_cancelled())
+
+        self.holder.release()
+        self.assertTrue(self.create_lock().acquire())
+        self.assertFalse(self.holder.is_cancelled())
+
+    def test_heartbeat_stops_a_superseded_crawl(self):
+        cancelled = threading.Event()
+        holder = self.create_lock(token=self.holder.token, lease=1)
+        holder.start_heartbeat(cancelled.set)
+        self.addCleanup(holder.stop_heartbeat)
+
+        self.create_lock().supersede()
+        self.assertTrue(cancelled.wait(timeout=5))
+
+    def test_one_trigger_waits_for_the_lock(self):
+        waiting, other = self.create_lock(), self.create_lock()
+        self.assertTrue(waiting.claim_pending(False))
+        self.assertFalse(other.claim_pending(False))
+        self.assertTrue(waiting.claim_pending(True))
+
+        waiting.clear_pending()
+        self.assertTrue(other.claim_pending(False))
+
+    @override_settings(CRAWLER_OVERLAP_POLICY='skip')
+    def test_skip_policy_drops_the_trigger(self):
+        task = self.create_task()
+        self.assertEqual(defer_crawl(task, self.website_id, self.create_lock()), self.website_id)
+        task.retry.assert_not_called()
+
+    @override_settings(CRAWLER_OVERLAP_POLICY='queue')
+    def test_queue_policy_retries_one_trigger(self):
+        with self.assertRaises(Retry):
+            defer_crawl(self.create_task(), self.website_id, self.create_lock())
+        with self.assertRaises(Retry):
+            defer_crawl(self.create_task(retries=1), self.website_id, self.create_lock())
+        self.assertEqual(defer_crawl(self.create_task(), self.website_id, self.create_lock()), self.website_id)
+        self.assertFalse(self.holder.is_cancelled())
+
+    @override_settings(CRAWLER_OVERLAP_POLICY='supersede')
+    def test_supersede_policy_cancels_the_running_crawl(self):
+        with self.assertRaises(Retry):
+            defer_crawl(self.create_task(), self.website_id, self.create_lock())
+        self.assertTrue(self.holder.is_cancelled())
+
+
+@override_settings(CRAWLER_PUBLISH_EVENTS=False, CRAWLER_OVERLAP_POLICY='skip')
+class CrawlOverlapTests(RedisMixin, SiteServerMixin, TransactionTestCase):
+    def test_crawl_of_a_locked_website_is_skipped(self):
+        website_record = self.create_website_record()
+        lock = SiteCrawlLock(website_record.id)
+        self.assertTrue(lock.acquire())
+        self.addCleanup(lock.release)
+
+        crawl_website.apply(args=[website_record.id], throw=True)
+
+        self.assertFalse(Execution.objects.filter(website_record=website_record).exists())
+
+
+@override_settings(
+    CRAWLER_PUBLISH_EVENTS=False, CRAWLER_DISTRIBUTED=True, CRAWLER_BATCH_SIZE=1, CRAWLER_MAX_BATCH_TASKS=2
+)
+class DistributedCrawlTests(RedisMixin, SiteServerMixin, TransactionTestCase):
+    def test_batch_tasks_crawl_the_website(self):
+        website_record = self.create_website_record()
+        queued = []
+        with mock.patch.object(crawl_batch, 'delay', side_effect=lambda *args: queued.append(args)):
+            crawl_website.apply(args=[website_record.id], throw=True)
+            max_queued = 0
+            # Queued batch tasks run one by one, as if on several workers
+            while queued:
+                max_queued = max(max_queued, len(queued))
+                crawl_batch.apply(args=queued.pop(0), throw=True)
+
+        self.assertEqual(max_queued, 2)
+        execution = Execution.objects.get(website_record=website_record)
+        self.assertEqual(execution.status, 'completed')
+        self.assertEqual(execution.num_sites_crawled, 4)
+        titles = {url[len(self.base_url):]: title for url, title in CrawledPage.objects.values_list('url', 'title')}
+        self.assertEqual(titles, {'/': 'Home', '/a': 'A', '/b': 'B', '/slow': 'Slow'})
+        lock = SiteCrawlLock(website_record.id)
+        self.assertTrue(lock.acquire())
+        lock.release()
+
+    def test_budget_of_exactly_the_number_of_pages_completes_the_execution(self):
+        website_record = self.create_website_record(max_pages=4)
+        queued = []
+        with mock.patch.object(crawl_batch, 'delay', side_effect=lambda *args: queued.append(args)):
+            crawl_website.apply(args=[website_record.id], throw=True)
+            while queued:
+                crawl_batch.apply(args=queued.pop(0), throw=True)
+
+        execution = Execution.objects.get(website_record=website_record)
+        self.assertEqual((execution.status, execution.num_sites_crawled), ('completed', 4))
+
+    def test_failed_start_releases_the_lock_and_fails_the_execution(self):
+        website_record = self.create_website_record()
+
+        with mock.patch('webcrawler.tasks.dispatch_batches', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                crawl_website.apply(args=[website_record.id], throw=True)
+
+        execution = Execution.objects.get(website_record=website_record)
+        self.assertEqual(execution.status, 'failed')
+        self.assertIsNotNone(execution.end_time)
+        lock = SiteCrawlLock(website_record.id)
+        self.assertTrue(lock.acquire())
+        lock.release()
+
+
+class HostConcurrencyControllerTests(SimpleTestCase):
+    def setUp(self):
+        self.controller = HostConcurrencyController(max_limit=4, initial_limit=2, target_latency=1.0)
+
+    def fill(self, host='example.com'):
+        """
+        Takes every free slot of the host and returns their number.
+        """
+        taken = 0
+        while self.controller.try_acquire(host) == 0:
+            taken += 1
+        return taken
+
+    def test_fast_responses_raise_the_limit_up_to_max_limit(self):
+        self.assertEqual(self.fill(), 2)
+        self.controller.release('example.com', 0.1, 200)
+        self.controller.release('example.com', 0.1, 200)
+        self.assertAlmostEqual(self.controller.hosts['example.com'].limit, 2.9)
+        self.assertEqual(self.fill(), 2)
+
+        for _ in range(20):
+            self.controller.release('example.com', 0.1, 200)
+            self.controller.try_acquire('example.com')
+        self.assertEqual(self.controller.stats()['example.com']['limit'], 4)
+
+    def test_slow_responses_keep_the_limit(self):
+        self.fill()
+        self.controller.release('example.com', 2.0, 200)
+        self.assertEqual(self.controller.hosts['example.com'].limit, 2)
+
+    def test_errors_halve_the_limit_down_to_one(self):
+        self.fill()
+        self.controller.release('example.com', 0.1, 503)
+        self.assertEqual(self.controller.hosts['example.com'].limit, 1)
+        self.controller.release('example.com', 0.1, None)
+        self.assertEqual(self.controller.hosts['example.com'].limit, 1)
+        self.assertEqual(self.fill(), 1)
+
+    def test_retry_after_pauses_the_host(self):
+        self.fill()
+        self.controller.release('example.com', 0.1, 429, retry_after='30')
+
+        wait = self.controller.try_acquire('example.com')
+        self.assertGreater(wait, 29)
+        self.assertLessEqual(wait, 30)
+        self.assertEqual(self.controller.try_acquire('other.com'), 0)
+
+
+class RetentionPolicyTests(SimpleTestCase):
+    now = datetime(2024, 6, 30, 12, tzinfo=timezone.utc)
+
+    def select_pruned(self, policy, *ages, statuses=()):
+        """
+        Returns the pruned positions of executions started the given numbers of days ago, most recent first.
+        """
+        executions = [
+            (index, self.now - timedelta(days=age), statuses[index] if index < len(statuses) else 'completed')
+            for index, age in enumerate(ages)
+        ]
+        return policy.select_pruned(executions, self.now)
+
+    def test_policy_without_rules_keeps_everything(self):
+        self.assertEqual(self.select_pruned(RetentionPolicy(), 0, 100, 1000), [])
+
+    def test_keep_last(self):
+        self.assertEqual(self.select_pruned(RetentionPolicy(keep_last=2), 0, 1, 2, 3), [2, 3])
+
+    def test_keep_within(self):
+        self.assertEqual(self.select_pruned(RetentionPolicy(keep_within=7), 1, 5, 8, 10), [2, 3])
+
+    def test_keep_daily_keeps_the_last_execution_of_every_day(self):
+        policy = RetentionPolicy(keep_within=1, keep_daily=True)
+        self.assertEqual(self.select_pruned(policy, 0, 2, 2.1, 3, 3.1), [2, 4])
+
+    def test_max_age_overrides_keep_daily_but_not_keep_last(self):
+        policy = RetentionPolicy(keep_last=2, keep_daily=True, max_age=30)
+        self.assertEqual(self.select_pruned(policy, 40, 50, 60, 70), [2, 3])
+
+    def test_newest_and_running_executions_are_kept(self):
+        policy = RetentionPolicy(max_age=30)
+        self.assertEqual(self.select_pruned(policy, 40, 50, 60, statuses=['completed', 'running']), [2])
+
+
+@override_settings(CRAWLER_PUBLISH_EVENTS=False)
+class PruneExecutionsTests(TestCase):
+    def setUp(self):
+        self.website_record = WebsiteRecord.objects.create(
+            url='https://example.com/',
+            boundary_regexp='https://example.com/.*',
+            periodicity='day',
+            label='example',
+            active=False,
+            tags=[],
+        )
+        now = datetime.now(timezone.utc)
+        self.executions = []
+        self.pages = []
+        for age in (0, 50, 100):
+            execution = Execution.objects.create(website_record=self.website_record, status='completed')
+            Execution.objects.filter(id=execution.id).update(start_time=now - timedelta(days=age))
+            page = CrawledPage.objects.create(url=f'https://example.com/{age}', execution=execution)
+            CrawledPage.objects.filter(id=page.id).update(crawl_time=now - timedelta(days=age))
+            self.executions.append(execution)
+            self.pages.append(page)
+        Link.objects.create(from_page=self.pages[1], to_page=self.pages[2])
+        self.policy = RetentionPolicy(keep_last=1, max_age=90)
+
+    def test_pages_of_pruned_executions_are_moved_or_deleted(self):
+        report = prune_executions(self.policy)
+
+        self.assertEqual(list(Execution.objects.values_list('id', flat=True)), [self.executions[0].id])
+        self.assertEqual(
+            dict(CrawledPage.objects.values_list('url', 'execution_id')),
+            {'https://example.com/0': self.executions[0].id, 'https://example.com/50': self.executions[0].id},
+        )
+        self.assertFalse(Link.objects.exists())
+        self.assertEqual(
+            list(DeletedPage.objects.values_list('url', 'website_record_id')),
+            [('https://example.com/100', self.website_record.id)],
+        )
+        self.assertEqual(
+            {name: report[name] for name in ('executions', 'pages_moved', 'pages_deleted', 'links_deleted')},
+            {'executions': 2, 'pages_moved': 1, 'pages_deleted': 1, 'links_deleted': 1},
+        )
+
+    def test_dry_run_deletes_nothing(self):
+        report = prune_executions(self.policy, dry_run=True)
+
+        self.assertEqual(report, prune_executions(self.policy, dry_run=True))
+        self.assertEqual(report['executions'], 2)
+        self.assertEqual(report['pages_deleted'], 1)
+        self.assertEqual(Execution.objects.count(), 3)
+        self.assertEqual(CrawledPage.objects.count(), 3)
+        self.assertEqual(Link.objects.count(), 1)
+
+
+class FrontierTests(SimpleTestCase):
+    def test_urls_of_the_same_page_are_queued_once(self):
+        frontier = Frontier(r'https://example\.com.*')
+        frontier.extend(['https://example.com', 'https://example.com/', 'https://example.com:443/#top'])
+        frontier.extend(['https://example.com/a', 'https://example.com/a'], depth=1)
+
+        self.assertEqual(frontier.pop(), ('https://example.com', 0))
+        self.assertEqual(frontier.pop(), ('https://example.com/a', 1))
+        self.assertFalse(frontier)
+        self.assertEqual(frontier.stats()['duplicates'], 3)
@@ -0,0 +1,172 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+BACKOFF_STATUS_CODES = {429, 503}
+
+
+def parse_retry_after(value):
+    """
+    Parse the value of a Retry-After header.
+
+    Args:
+        value: The header value, either a number of seconds or an HTTP date.
+
+    Returns:
+        The number of seconds to wait, or None if the value cannot be parsed.
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - timezone.now()).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class HostState:
+    """
+    Concurrency limit and recent latencies of a single host.
+    """
+
+    def __init__(self, limit, history):
+        self.limit = limit
+        self.in_flight = 0
+        self.latencies = deque(maxlen=history)
+        self.retry_at = 0.0
+
+
+class HostConcurrencyController:
+    """
+    Adaptive per-host concurrency limits (AIMD).
+
+    Every host starts at `initial_limit` requests in flight. Each fast,
+    successful response raises the limit additively by 1/limit, i.e. by about
+    one per round of requests. A 429 or 503 response, a timeout or a
+    connection error halves it. Retry-After headers pause the host entirely
+    until the given time.
+    """
+
+    def __init__(self, max_limit, initial_limit=None, target_latency=None, history=20):
+        """
+        Initialize the HostConcurrencyController object.
+
+        Args:
+            max_limit: The upper bound of the per-host limit.
+            initial_limit: The limit of a newly seen host.
+                Defaults to the CRAWLER_HOST_INITIAL_CONCURRENCY setting.
+            target_latency: Responses slower than this many seconds do not raise the limit.
+                Defaults to the CRAWLER_HOST_TARGET_LATENCY setting.
+            history: Number of recent latencies kept per host.
+        """
+        self.max_limit = max_limit
+        self.initial_limit = min(initial_limit or getattr(settings, 'CRAWLER_HOST_INITIAL_CONCURRENCY', 2), max_limit)
+        self.target_latency = target_latency or getattr(settings, 'CRAWLER_HOST_TARGET_LATENCY', 1.0)
+        self.history = history
+        self.hosts = {}
+        self.condition = threading.Condition()
+
+    def get_host(self, host):
+        state = self.hosts.get(host)
+        if state is None:
+            state = self.hosts[host] = HostState(self.initial_limit, self.history)
+        return state
+
+    def try_acquire(self, host):
+        """
+        Take a request slot of the specified host if one is free.
+
+        Args:
+            host: The host name.
+
+        Returns:
+            0 if a slot was taken, the number of seconds until the host may be
+            contacted again if it asked to retry later, or None if all slots are busy.
+        """
+        with self.condition:
+            state = self.get_host(host)
+            wait = state.retry_at - time.monotonic()
+            if wait > 0:
+                return wait
+            if state.in_flight < int(state.limit):
+                state.in_flight += 1
+                return 0
+            return None
+
+    def acquire(self, host):
+        """
+        Take a request slot of the specified host, blocking until one is free.
+
+        Args:
+            host: The host name.
+        """
+        with self.condition:
+            while True:
+                wait = self.try_acquire(host)
+                if wait == 0:
+                    return
+                self.condition.wait(timeout=wait)
+
+    async def acquire_async(self, host):
+        """
+        Take a request slot of the specified host without blocking the event loop.
+
+        Args:
+            host: The host name.
+        """
+        while True:
+            wait = self.try_acquire(host)
+            if wait == 0:
+                return
+            await asyncio.sleep(wait or 0.05)
+
+    def release(self, host, latency, status_code=None, retry_after=None):
+        """
+        Return a request slot and adapt the host's limit to the outcome.
+
+        Args:
+            host: The host name.
+            latency: The duration of the request in seconds.
+            status_code: The HTTP status of the response, or None if the
+                request timed out or failed.
+            retry_after: The value of the Retry-After header, if any.
+        """
+        with self.condition:
+            state = self.get_host(host)
+            state.in_flight -= 1
+            state.latencies.append(latency)
+
+            if status_code is None or status_code in BACKOFF_STATUS_CODES:
+                state.limit = max(state.limit / 2, 1.0)
+            elif status_code < 500 and latency <= self.target_latency:
+                state.limit = min(state.limit + 1 / state.limit, self.max_limit)
+
+            delay = parse_retry_after(retry_after)
+            if delay:
+                state.retry_at = max(state.retry_at, time.monotonic() + delay)
+
+            self.condition.notify_all()
+
+    def stats(self):
+        """
+        Return the current limit and recent latencies of every host.
+
+        Returns:
+            A dict mapping each host to its limit and latencies in milliseconds.
+        """
+        with self.condition:
+            return {
+                host: {
+                    'limit': int(state.limit),
+                    'latencies_ms': [round(latency * 1000) for latency in state.latencies],
+                }
+                for host, state in self.hosts.items()
+            }
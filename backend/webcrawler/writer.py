@@ -0,0 +1,188 @@
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from api.models import CrawledPage, PageSnapshot, create_snapshot_partitions
+from .events import publish_pages
+
+
+class PageWriter:
+    """
+    Write-behind persistence of crawled pages.
+
+    Fetch workers put page records on a bounded queue and return immediately.
+    A dedicated thread saves them in batches once `batch_size` records are
+    waiting or `flush_interval` seconds have passed. When the database falls
+    behind, the queue fills up and put blocks the workers.
+    """
+
+    STOP = object()
+    # Stands for the links of a page touched by `touch`
+    UNCHANGED = object()
+
+    def __init__(self, execution, batch_size=None, flush_interval=None, max_queued=None):
+        """
+        Initialize the PageWriter object and start its writer thread.
+
+        Args:
+            execution: The Execution object the pages belong to.
+            batch_size: Number of pages saved per batch.
+                Defaults to the CRAWLER_WRITE_BATCH_SIZE setting.
+            flush_interval: Maximum number of seconds a page waits before it is saved.
+                Defaults to the CRAWLER_WRITE_FLUSH_INTERVAL setting.
+            max_queued: Number of pages that can wait for the writer before put blocks.
+                Defaults to the CRAWLER_WRITE_QUEUE_SIZE setting.
+        """
+        self.execution = execution
+        self.batch_size = batch_size or getattr(settings, 'CRAWLER_WRITE_BATCH_SIZE', 100)
+        self.flush_interval = flush_interval or getattr(settings, 'CRAWLER_WRITE_FLUSH_INTERVAL', 2.0)
+        self.queue = queue.Queue(maxsize=max_queued or getattr(settings, 'CRAWLER_WRITE_QUEUE_SIZE', 1000))
+        self.snapshots = getattr(settings, 'CRAWLER_SNAPSHOTS', True)
+        self.error = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.close()
+        except Exception:
+            if exc_type is None:
+                raise
+
+    def put(self, url, fields, links):
+        """
+        Queue a crawled page for saving, blocking while the queue is full.
+
+        Args:
+            url: The URL of the crawled page.
+            fields: Dict of the CrawledPage field values to store, e.g. the title.
+            links: The set of valid links extracted from the page,
+                or None to keep the links stored by a previous crawl.
+
+        Raises:
+            The exception that stopped the writer thread, if any.
+        """
+        self.enqueue((url, fields, links))
+
+    def touch(self, url, fields):
+        """
+        Queue a new crawl of an unchanged page, blocking while the queue is full.
+
+        Only the crawl time and the specified fields of the page are saved,
+        it keeps its execution, update time and links.
+
+        Args:
+            url: The URL of the crawled page.
+            fields: Dict of the CrawledPage field values to store, e.g. the status code.
+
+        Raises:
+            The exception that stopped the writer thread, if any.
+        """
+        self.enqueue((url, fields, self.UNCHANGED))
+
+    def sync(self):
+        """
+        Block until every page queued so far has been saved.
+
+        Raises:
+            The exception that stopped the writer thread, if any.
+        """
+        saved = threading.Event()
+        self.enqueue(saved)
+        while not saved.wait(timeout=0.5):
+            if self.error is not None:
+                raise self.error
+
+    def enqueue(self, record):
+        while True:
+            if self.error is not None:
+                raise self.error
+            try:
+                self.queue.put(record, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def close(self):
+        """
+        Save all queued pages and stop the writer thread.
+
+        Raises:
+            The exception that stopped the writer thread, if any.
+        """
+        while self.thread.is_alive():
+            try:
+                self.queue.put(self.STOP, timeout=0.5)
+                break
+            except queue.Full:
+                continue
+        self.thread.join()
+
+        if self.error is not None:
+            raise self.error
+
+    def run(self):
+        """
+        Writer thread loop collecting records into batches and saving them.
+        """
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        try:
+            if self.snapshots:
+                # The first execution of a range of IDs creates its partitions
+                create_snapshot_partitions(self.execution.id)
+            while True:
+                try:
+                    record = self.queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    record = None
+
+                if record is self.STOP:
+                    self.flush(batch)
+                    return
+                if isinstance(record, threading.Event):
+                    self.flush(batch)
+                    batch = []
+                    record.set()
+                elif record is not None:
+                    batch.append(record)
+
+                if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                    self.flush(batch)
+                    batch = []
+                    deadline = time.monotonic() + self.flush_interval
+        except Exception as e:
+            self.error = e
+        finally:
+            connection.close()
+
+    def flush(self, batch):
+        """
+        Save a batch of crawled pages together with their links, add them to
+        the snapshot of the execution and publish them.
+
+        Args:
+            batch: A list of (url, fields, links) records.
+        """
+        if not batch:
+            return
+
+        saved = [record for record in batch if record[2] is not self.UNCHANGED]
+        pages = CrawledPage.bulk_save_pages({url: fields for url, fields, _ in saved}, self.execution)
+        CrawledPage.bulk_set_links(
+            {pages[url]: links for url, _, links in saved if links is not None},
+            self.execution,
+        )
+        pages.update(CrawledPage.bulk_touch_pages(
+            {url: fields for url, fields, links in batch if links is self.UNCHANGED}
+        ))
+        links_by_url = {url: None if links is self.UNCHANGED else links for url, _, links in batch if url in pages}
+        if self.snapshots:
+            PageSnapshot.bulk_save_snapshot(self.execution, pages, links_by_url)
+        publish_pages(self.execution, pages, links_by_url)
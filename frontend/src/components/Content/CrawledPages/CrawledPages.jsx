@@ -16,41 +16,47 @@ import { useParams } from 'react-router-dom';
 import dagre from 'dagre';
 
 const BASE_URL = "http://127.0.0.1:8000/api/graphql/";
+const EVENTS_URL = "http://127.0.0.1:8000/api/events";
 
 const nodeTypes = {
   customNode: CustomNodeComponent,
 };
 
 /**
- * Fetches data for a given website.
+ * Fetches the changes of the graph of a given website since a cursor.
  *
  * @param {string} website - The website to fetch data for.
- * @returns {Promise<object>} - The fetched data.
+ * @param {string|null} cursor - The cursor of the previous fetch, or null to fetch all pages.
+ * @returns {Promise<object>} - The new cursor, the changed pages and the URLs of the removed pages.
  */
-const fetchData = async (website) => {
+const fetchDelta = async (website, cursor) => {
   const query = `
-    query {
-      nodes(webPages: "${website}") {
-        url
-        title
-        crawlTime
-        links {
+    query($since: String) {
+      delta(webPages: "${website}", since: $since) {
+        cursor
+        nodes {
           url
           title
+          crawlTime
+          links {
+            url
+            title
+          }
+          owner {
+            identifier
+            regexp
+          }
         }
-        owner {
-          identifier
-          regexp
-        }
+        removed
       }
     }
   `;
 
-  const response = await axios.post(BASE_URL, { query }, {
+  const response = await axios.post(BASE_URL, { query, variables: { since: cursor } }, {
     headers: { 'Content-Type': 'application/json' }
   });
 
-  return response.data.data;
+  return response.data.data.delta;
 };
 
 /**
@@ -281,22 +287,33 @@ const CrawledPages = () => {
 
   // Effect hook for fetching and updating the graph data
   useEffect(() => {
-    // Fetch the data first, and then set state
+    // Crawled pages by URL, updated by the pushed events in live mode
+    let pagesByUrl = new Map();
+    let cursor = null;
+
+    const renderGraph = () => {
+      const filteredNodesData = Array.from(pagesByUrl.values());
+
+      if (viewMode === "website") {
+        const { fetchedNodes, fetchedEdges, newHashMap } = constructWebsiteView(filteredNodesData);
+        setNodes(fetchedNodes);
+        setEdges(fetchedEdges);
+        setHashMap(newHashMap);
+      } else if (viewMode === "domain") {
+        const { fetchedNodes, fetchedEdges } = constructDomainView(filteredNodesData);
+        setNodes(fetchedNodes);
+        setEdges(fetchedEdges);
+      }
+    };
+
+    // Fetch the pages changed since the previous fetch, and then set state
     const loadGraph = async () => {
       try {
-        const data = await fetchData(website);
-        const filteredNodesData = data.nodes;
-
-        if (viewMode === "website") {
-          const { fetchedNodes, fetchedEdges, newHashMap } = constructWebsiteView(filteredNodesData);
-          setNodes(fetchedNodes);
-          setEdges(fetchedEdges);
-          setHashMap(newHashMap);
-        } else if (viewMode === "domain") {
-          const { fetchedNodes, fetchedEdges } = constructDomainView(filteredNodesData);
-          setNodes(fetchedNodes);
-          setEdges(fetchedEdges);
-        }
+        const delta = await fetchDelta(website, cursor);
+        delta.removed.forEach(url => pagesByUrl.delete(url));
+        delta.nodes.forEach(node => pagesByUrl.set(node.url, node));
+        cursor = delta.cursor;
+        renderGraph();
       } catch (error) {
         console.error(error);
       }
@@ -305,14 +322,34 @@ const CrawledPages = () => {
     // Update immediately
     loadGraph();
 
-    let intervalId;
+    let eventSource;
     if (mode === "live") {
-      // Update periodically if in live mode
-      intervalId = setInterval(loadGraph, 2000); // Adjust this to the desired refresh rate
+      // Merge the pages saved by a running crawl as the server pushes them
+      eventSource = new EventSource(`${EVENTS_URL}/website_records/${website}/`);
+      eventSource.addEventListener('pages', (event) => {
+        const { owner, pages } = JSON.parse(event.data);
+        pages.forEach(page => {
+          const previous = pagesByUrl.get(page.url);
+          pagesByUrl.set(page.url, {
+            ...page,
+            // Links are left out when the page did not change
+            links: page.links ?? previous?.links ?? [],
+            owner,
+          });
+        });
+        renderGraph();
+      });
+      // Catch up with changes that were not pushed once an execution ends
+      eventSource.addEventListener('execution', (event) => {
+        const execution = JSON.parse(event.data);
+        if (execution.status !== 'running' && execution.status !== 'pending') {
+          loadGraph();
+        }
+      });
     }
 
-    // Clear interval when mode or website changes
-    return () => clearInterval(intervalId);
+    // Close the event stream when mode or website changes
+    return () => eventSource?.close();
   }, [website, mode, viewMode]);
 
   /**
@@ -11,14 +11,13 @@ const base_url = 'http://127.0.0.1:8000/api';
 const fetchWebsiteRecords = async () => {
   try {
     let allWebsiteRecords = [];
-    let hasMore = true;
-    let page = 1;
+    let url = `${base_url}/website_records/?page_size=100`;
 
-    while (hasMore) {
-      const response = await axios.get(`${base_url}/website_records/?page=${page}`);
+    // Follow the cursor links until the last page
+    while (url) {
+      const response = await axios.get(url);
       allWebsiteRecords = [...allWebsiteRecords, ...response.data.results];
-      hasMore = response.data.next !== null;
-      page += 1;
+      url = response.data.next;
     }
 
     return allWebsiteRecords;
@@ -27,6 +27,17 @@ const ExecutionDetails = () => {
     };
 
     fetchExecutionDetails();
+
+    // Follow the status and progress of the execution while it runs
+    const eventSource = new EventSource('http://127.0.0.1:8000/api/events/executions/');
+    eventSource.addEventListener('execution', (event) => {
+      const data = JSON.parse(event.data);
+      if (String(data.id) === String(id)) {
+        setExecution(data);
+      }
+    });
+
+    return () => eventSource.close();
   }, [id]);
 
   /**
@@ -36,7 +47,7 @@ const ExecutionDetails = () => {
     try {
       await axios.delete(`${BASE_URL}/delete/${id}/`);
       // Perform any additional actions after successful deletion
-      alert('Execution was deleted successfully');
+      alert('Execution is being deleted');
       navigate('/executions');
     } catch (error) {
       console.error('Error deleting execution:', error);
@@ -63,6 +74,18 @@ const ExecutionDetails = () => {
           <div className="execution-details__field">
             <strong>Number of Sites Crawled:</strong> {execution.num_sites_crawled}
           </div>
+          <div className="execution-details__field">
+            <strong>Pages Queued:</strong> {execution.num_pages_queued}
+          </div>
+          <div className="execution-details__field">
+            <strong>Pages Failed:</strong> {execution.num_pages_failed}
+          </div>
+          <div className="execution-details__field">
+            <strong>Bytes Downloaded:</strong> {execution.num_bytes}
+          </div>
+          <div className="execution-details__field">
+            <strong>Pages/sec:</strong> {execution.pages_per_second}
+          </div>
           <div className="execution-details__field">
             <strong>Website Record:</strong> {execution.website_record}
           </div>
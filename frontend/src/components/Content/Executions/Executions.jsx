@@ -5,20 +5,32 @@ import axios from 'axios';
 const base_url = 'http://127.0.0.1:8000/api';
 const recordsPerPage = 5;
 
+/**
+ * Extracts the cursor from a 'next' or 'previous' page link.
+ * @param {string|null} link - The page link returned by the API.
+ * @returns {string|null} The cursor, or null if there is no such page.
+ */
+const getCursor = (link) => (link ? new URL(link).searchParams.get('cursor') ?? '' : null);
+
 /**
  * Fetches executions from the API.
  * @param {string} label - The label to filter the executions by.
  * @param {string} sort - The field to sort the executions by.
- * @param {number} page - The page number.
+ * @param {string} cursor - The cursor of the page, or '' for the first page.
  * @param {number} page_size - The number of records per page.
- * @returns {Promise<{ count: number, results: any[] }>} The fetched executions.
+ * @returns {Promise<{ count: number, next: string|null, previous: string|null, results: any[] }>}
+ * The fetched executions, their approximate count and the cursors of the next and previous pages.
  */
-const fetchExecutions = async (label='', sort='start_time', page=1, page_size=recordsPerPage) => {
+const fetchExecutions = async (label='', sort='start_time', cursor='', page_size=recordsPerPage) => {
   try {
-    const response = await axios.get(`${base_url}/executions/?label=${label}&sort=${sort}&page=${page}&page_size=${page_size}`);
+    const response = await axios.get(`${base_url}/executions/`, {
+      params: { label, sort, cursor, page_size, count: 'approximate' },
+    });
     const data = response.data;
     return {
       count: data.count,
+      next: getCursor(data.next),
+      previous: getCursor(data.previous),
       results: data.results
     };
   } catch (error) {
@@ -81,14 +93,13 @@ const processWebsiteRecords = async (records) => {
 const fetchAllWebsiteRecords = async () => {
   try {
     let allWebsiteRecords = [];
-    let hasMore = true;
-    let page = 1;
+    let url = `${base_url}/website_records/?page_size=100`;
 
-    while (hasMore) {
-      const response = await axios.get(`${base_url}/website_records/?page=${page}`);
+    // Follow the cursor links until the last page
+    while (url) {
+      const response = await axios.get(url);
       allWebsiteRecords = [...allWebsiteRecords, ...response.data.results];
-      hasMore = response.data.next !== null;
-      page += 1;
+      url = response.data.next;
     }
 
     return allWebsiteRecords;
@@ -110,6 +121,9 @@ const Executions = () => {
   const [sortedBy, setSortedBy] = useState('start_time');
   const [selectedValueDialog, setSelectedValueDialog] = useState('none');
   const [currentPage, setCurrentPage] = useState(1);
+  const [cursor, setCursor] = useState('');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [previousCursor, setPreviousCursor] = useState(null);
   const [totalRecords, setTotalRecords] = useState(0);
   const [websiteRecords, setWebsiteRecords] = useState({});
 
@@ -117,13 +131,15 @@ const Executions = () => {
    * Fetches and processes the execution data.
    */
   const fetchAndProcessData = useCallback(async () => {
-    const fetchedData = await fetchExecutions(filterLabel, sortedBy, currentPage);
+    const fetchedData = await fetchExecutions(filterLabel, sortedBy, cursor);
     if (fetchedData) {
       setTotalRecords(fetchedData.count);
+      setNextCursor(fetchedData.next);
+      setPreviousCursor(fetchedData.previous);
       const processedData = await processWebsiteRecords(fetchedData.results);
       setRecords(processedData);
     }
-  }, [filterLabel, sortedBy, currentPage]);
+  }, [filterLabel, sortedBy, cursor]);
 
   /**
    * Creates a new execution.
@@ -141,7 +157,8 @@ const Executions = () => {
 
   useEffect(() => {
     setCurrentPage(1);
-  }, [filterLabel]);
+    setCursor('');
+  }, [filterLabel, sortedBy]);
 
   useEffect(() => {
     const setUniqueLabelsFromRecords = async () => {
@@ -195,20 +212,19 @@ const Executions = () => {
     setIsDialogOpen(true);
   };
 
-    // Calculate pagination values
-    const totalPages = Math.ceil(totalRecords / recordsPerPage);
+    // Calculate pagination values, the count being approximate
+    const totalPages = Math.max(Math.ceil(totalRecords / recordsPerPage), currentPage);
 
   /**
    * Handles the page change event.
-   * @param {number} page - The new page number.
+   * @param {number} page - The new page number, next to the current one.
    */
   const handlePageChange = (page) => {
-
-    if(currentPage <= totalPages){
+    const pageCursor = page > currentPage ? nextCursor : previousCursor;
+    if (pageCursor !== null) {
         setCurrentPage(page);
+        setCursor(pageCursor);
     }
-
-    // setCurrentPage(page);
   };
 
   return (
@@ -288,14 +304,14 @@ const Executions = () => {
         </p>
         <button
           className="pagination-button"
-          disabled={currentPage === 1}
+          disabled={previousCursor === null}
           onClick={() => handlePageChange(currentPage - 1)}
         >
           Previous
         </button>
         <button
           className="pagination-button"
-          disabled={currentPage === totalPages}
+          disabled={nextCursor === null}
           onClick={() => handlePageChange(currentPage + 1)}
         >
           Next
@@ -5,33 +5,36 @@ import axios from 'axios';
 const base_url = 'http://127.0.0.1:8000/api';
 const recordsPerPage = 5;
 
+/**
+ * Extracts the cursor from a 'next' or 'previous' page link.
+ * @param {string|null} link - The page link returned by the API.
+ * @returns {string|null} The cursor, or null if there is no such page.
+ */
+const getCursor = (link) => (link ? new URL(link).searchParams.get('cursor') ?? '' : null);
+
 /**
  * Fetches website records with associated execution data from the API.
- * @param {number} currentPage - The current page number.
+ * @param {string} cursor - The cursor of the page, or '' for the first page.
  * @param {number} pageSize - The number of records per page.
  * @param {string} sortBy - The field to sort the records by.
  * @param {string} filterLabel - The label to filter the records by.
  * @param {string} filterUrl - The URL to filter the records by.
  * @param {Array<string>} filterTags - The tags to filter the records by.
  * @returns {Promise<Object|null>} A Promise that resolves to an object containing the fetched website records and associated execution data,
- * along with the current page number and total number of pages, or null if an error occurs.
+ * along with the cursors of the next and previous pages and the approximate number of pages, or null if an error occurs.
  */
-const fetchWebsiteRecords = async (currentPage = 1, pageSize = recordsPerPage, sortBy = 'url', filterLabel = '', filterUrl = '', filterTags = []) => {
+const fetchWebsiteRecords = async (cursor = '', pageSize = recordsPerPage, sortBy = 'url', filterLabel = '', filterUrl = '', filterTags = []) => {
   try {
 
     const allExecutions = [];
-    let numberOfPage = 1;
+    let executionsUrl = `${base_url}/executions/?page_size=100`;
 
-    while (true) {
-      const executions = await axios.get(`${base_url}/executions/?page=${numberOfPage}`);
+    while (executionsUrl) {
+      const executions = await axios.get(executionsUrl);
 
       allExecutions.push(...executions.data.results);
 
-      if (executions.data.next !== null) {
-        numberOfPage++;
-      } else {
-        break;
-      }
+      executionsUrl = executions.data.next;
     }
 
     const uniqueExecutions = {};
@@ -47,7 +50,8 @@ const fetchWebsiteRecords = async (currentPage = 1, pageSize = recordsPerPage, s
 
     const response = await axios.get(`${base_url}/website_records/`, {
       params: {
-        page: currentPage,
+        cursor,
+        count: 'approximate',
         page_size: pageSize,
         sort: sortBy,
         label: filterLabel,
@@ -77,7 +81,8 @@ const fetchWebsiteRecords = async (currentPage = 1, pageSize = recordsPerPage, s
     return {
       // results: combinedArray,
       results: mergedRecords,
-      current: currentPage,
+      next: getCursor(response.data.next),
+      previous: getCursor(response.data.previous),
       total_pages: Math.ceil(response.data.count / pageSize),
     };
   } catch (error) {
@@ -95,6 +100,9 @@ const WebsiteRecords = () => {
   const [websiteRecords, setWebsiteRecords] = useState([]);
   const [sortedBy, setSortedBy] = useState('url');
   const [currentPage, setCurrentPage] = useState(1);
+  const [cursor, setCursor] = useState('');
+  const [nextCursor, setNextCursor] = useState(null);
+  const [previousCursor, setPreviousCursor] = useState(null);
   const [totalPages, setTotalPages] = useState(0);
   const [filterLabel, setFilterLabel] = useState('');
   const [filterUrl, setFilterUrl] = useState('');
@@ -109,17 +117,24 @@ const WebsiteRecords = () => {
      */
     const fetchData = async () => {
       const websiteRecordsData = await fetchWebsiteRecords(
-        currentPage, recordsPerPage, sortedBy, filterLabel, filterUrl, filterTags
+        cursor, recordsPerPage, sortedBy, filterLabel, filterUrl, filterTags
       );
       if (websiteRecordsData) {
         setWebsiteRecords(websiteRecordsData.results);
-        setCurrentPage(websiteRecordsData.current);
+        setNextCursor(websiteRecordsData.next);
+        setPreviousCursor(websiteRecordsData.previous);
         setTotalPages(websiteRecordsData.total_pages);
       }
     };
 
     fetchData();
-  }, [sortedBy, currentPage, filterLabel, filterUrl, filterTags]);
+  }, [sortedBy, cursor, filterLabel, filterUrl, filterTags]);
+
+  // Start again from the first page when the sorting or the filters change
+  useEffect(() => {
+    setCurrentPage(1);
+    setCursor('');
+  }, [sortedBy, filterLabel, filterUrl, filterTags]);
 
    /**
    * Renders an icon indicating the sorting direction for a field.
@@ -131,22 +146,15 @@ const WebsiteRecords = () => {
   };
 
   /**
-   * Handles the page change event and fetches the corresponding website records.
-   * @param {number} page - The page number to navigate to.
-   * @returns {Promise<void>} A Promise that resolves when the data is fetched and state is updated.
+   * Handles the page change event. The website records of the page are fetched by the effect above.
+   * @param {number} page - The page number to navigate to, next to the current one.
    */
-  const handlePageChange = async (page) => {
-
-    if(currentPage <= totalPages){
+  const handlePageChange = (page) => {
+    const pageCursor = page > currentPage ? nextCursor : previousCursor;
+    if (pageCursor !== null) {
         setCurrentPage(page);
-        const websiteRecordsData = await fetchWebsiteRecords(
-          page, recordsPerPage, sortedBy, filterLabel, filterUrl, filterTags
-        );
-        if (websiteRecordsData) {
-          setWebsiteRecords(websiteRecordsData.results);
-        }
+        setCursor(pageCursor);
     }
-   
   };
 
 
@@ -158,7 +166,7 @@ const WebsiteRecords = () => {
   const handleFilterLabelChange = async (event) => {
     setFilterLabel(event.target.value);
     const websiteRecordsData = await fetchWebsiteRecords(
-      currentPage, recordsPerPage, sortedBy, event.target.value, filterUrl, filterTags
+      '', recordsPerPage, sortedBy, event.target.value, filterUrl, filterTags
     );
     if (websiteRecordsData) {
       setWebsiteRecords(websiteRecordsData.results);
@@ -174,7 +182,7 @@ const WebsiteRecords = () => {
   const handleFilterUrlChange = async (event) => {
     setFilterUrl(event.target.value);
     const websiteRecordsData = await fetchWebsiteRecords(
-      currentPage, recordsPerPage, sortedBy, filterLabel, event.target.value, filterTags
+      '', recordsPerPage, sortedBy, filterLabel, event.target.value, filterTags
     );
     if (websiteRecordsData) {
       setWebsiteRecords(websiteRecordsData.results);
@@ -194,7 +202,7 @@ const WebsiteRecords = () => {
     if (inputValue === '') {
       setFilterTags([]);
       const websiteRecordsData = await fetchWebsiteRecords(
-        currentPage, recordsPerPage, sortedBy, filterLabel, filterUrl
+        '', recordsPerPage, sortedBy, filterLabel, filterUrl
       );
       if (websiteRecordsData) {
         setWebsiteRecords(websiteRecordsData.results);
@@ -204,7 +212,7 @@ const WebsiteRecords = () => {
       const tags = inputValue.split(",").map((tag) => tag.trim());
       setFilterTags(tags);
       const websiteRecordsData = await fetchWebsiteRecords(
-        currentPage, recordsPerPage, sortedBy, filterLabel, filterUrl, tags
+        '', recordsPerPage, sortedBy, filterLabel, filterUrl, tags
       );
       if (websiteRecordsData) {
         setWebsiteRecords(websiteRecordsData.results);
@@ -259,18 +267,18 @@ const WebsiteRecords = () => {
   </div>
   <div className="pagination">	
     <p>	
-      Page {currentPage} of {totalPages}	
+      Page {currentPage} of {Math.max(totalPages, currentPage)}	
     </p>	
     <button	
       className="pagination-button"	
-      disabled={currentPage === 1}	
+      disabled={previousCursor === null}	
       onClick={() => handlePageChange(currentPage - 1)}	
     >	
       Previous	
     </button>	
     <button	
       className="pagination-button"	
-      disabled={currentPage === totalPages}	
+      disabled={nextCursor === null}	
       onClick={() => handlePageChange(currentPage + 1)}	
     >	
       Next	
@@ -47,13 +47,13 @@ const WebsiteRecordsDetail = () => {
   /**
    * Handles the delete action for the website record.
    * Sends a delete request to the API and performs additional actions after successful deletion.
-   * @returns {Promise<void>} A Promise that resolves when the website record is deleted.
+   * @returns {Promise<void>} A Promise that resolves when the deletion of the website record has started.
    */
   const handleDelete = async () => {
     try {
       await axios.delete(`${BASE_URL}/delete/${id}/`);
       // Perform any additional actions after successful deletion
-      alert('Website Record was deleted successfully');
+      alert('Website Record is being deleted');
       navigate('/websiteRecords');
     } catch (error) {
       console.error('Error deleting website record:', error);